@@ -0,0 +1,33 @@
+"""
+ASGI config for core project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Django serves every HTTP request except the live event stream; WebSocket
+connections on ``/ws`` and the SSE stream are handled by ``core.live``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+
+django_application = get_asgi_application()
+
+from core import live  # noqa: E402  (needs the app registry loaded above)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        if scope['path'].rstrip('/') == '/ws':
+            await live.websocket_app(scope, receive, send)
+        else:
+            await send({'type': 'websocket.close', 'code': 4404})
+        return
+    if scope['type'] == 'http' and scope['path'] == '/api/dashboard/live/':
+        await live.sse_app(scope, receive, send)
+        return
+    await django_application(scope, receive, send)
@@ -0,0 +1,222 @@
+"""
+Live dashboard push over WebSockets (``/ws``) and Server-Sent Events
+(``/api/dashboard/live/``).
+
+Services publish tenant-scoped JSON events to the Redis channel
+``katkat:live:<schema>``. New orders, stock changes and stat deltas come
+from the saleor outbox relay. Each ASGI worker process holds a single
+pattern subscription on ``katkat:live:*`` and fans messages out to the
+connections of that tenant in memory. However many dashboards are open,
+Redis sees one subscriber per worker and Postgres sees no polling.
+
+Browsers cannot set headers on WebSocket or EventSource requests, so a
+client first POSTs ``{"tenant": <tenant id>}`` to
+``/api/dashboard/live/ticket/`` with its usual JWT header. It gets a
+stream ticket that is valid for ``LIVE_TICKET_TTL`` seconds and for one
+connection, e.g. ``/ws?ticket=<ticket>``. Only the ticket ever appears in
+a URL, and so in access logs, never the access token.
+
+The SSE app is served outside Django's middleware, so it answers CORS
+preflights and sets the CORS headers itself, from the same
+``django-cors-headers`` settings.
+
+Each connection has a bounded queue, and a client that falls behind loses
+its oldest events instead of holding memory.
+"""
+
+import asyncio
+import json
+import logging
+import re
+import secrets
+from collections import defaultdict
+from urllib.parse import parse_qs
+
+import redis
+import redis.asyncio as aioredis
+from corsheaders.conf import conf as cors_conf
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = 'katkat:live:'
+TICKET_KEY = 'katkat:live-ticket:{}'
+
+
+class Hub:
+    """One Redis subscription per process, fanned out to local connections"""
+
+    def __init__(self):
+        self.subscribers = defaultdict(set)
+        self._listener = None
+
+    def subscribe(self, schema_name):
+        queue = asyncio.Queue(maxsize=settings.LIVE_QUEUE_SIZE)
+        self.subscribers[schema_name].add(queue)
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+        return queue
+
+    def unsubscribe(self, schema_name, queue):
+        queues = self.subscribers.get(schema_name)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[schema_name]
+
+    def dispatch(self, schema_name, data):
+        for queue in list(self.subscribers.get(schema_name, ())):
+            if queue.full():
+                # Slow client: drop its oldest event rather than grow without bound
+                queue.get_nowait()
+            queue.put_nowait(data)
+
+    async def _listen(self):
+        while True:
+            client = aioredis.Redis.from_url(settings.REDIS_URL)
+            try:
+                pubsub = client.pubsub()
+                await pubsub.psubscribe(f'{CHANNEL_PREFIX}*')
+                async for message in pubsub.listen():
+                    if message['type'] != 'pmessage':
+                        continue
+                    schema_name = message['channel'].decode()[len(CHANNEL_PREFIX):]
+                    self.dispatch(schema_name, message['data'].decode())
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Live event subscription lost, reconnecting")
+                await asyncio.sleep(1)
+            finally:
+                await client.close()
+
+
+hub = Hub()
+
+
+def issue_ticket(schema_name):
+    """Single-use ticket for one live connection to the tenant's events"""
+    ticket = secrets.token_urlsafe(32)
+    client = redis.Redis.from_url(settings.REDIS_URL)
+    client.set(TICKET_KEY.format(ticket), schema_name, nx=True, ex=settings.LIVE_TICKET_TTL)
+    return ticket
+
+
+async def authorize(query_string):
+    """Schema the connection's ticket was issued for, else None; uses the ticket up"""
+    ticket = parse_qs(query_string.decode()).get('ticket', [None])[0]
+    if not ticket:
+        return None
+    client = aioredis.Redis.from_url(settings.REDIS_URL)
+    try:
+        schema_name = await client.getdel(TICKET_KEY.format(ticket))
+    finally:
+        await client.close()
+    return schema_name.decode() if schema_name is not None else None
+
+
+def cors_headers(scope):
+    """CORS response headers for the request's origin, as CorsMiddleware would set them"""
+    origin = dict(scope['headers']).get(b'origin', b'').decode()
+    if not origin:
+        return []
+    allowed = (
+        cors_conf.CORS_ALLOW_ALL_ORIGINS
+        or origin in cors_conf.CORS_ALLOWED_ORIGINS
+        or any(re.match(pattern, origin) for pattern in cors_conf.CORS_ALLOWED_ORIGIN_REGEXES)
+    )
+    if not allowed:
+        return []
+    headers = [(b'vary', b'origin')]
+    if cors_conf.CORS_ALLOW_ALL_ORIGINS and not cors_conf.CORS_ALLOW_CREDENTIALS:
+        headers.append((b'access-control-allow-origin', b'*'))
+    else:
+        headers.append((b'access-control-allow-origin', origin.encode()))
+    if cors_conf.CORS_ALLOW_CREDENTIALS:
+        headers.append((b'access-control-allow-credentials', b'true'))
+    return headers
+
+
+async def websocket_app(scope, receive, send):
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+    schema_name = await authorize(scope['query_string'])
+    if schema_name is None:
+        await send({'type': 'websocket.close', 'code': 4401})
+        return
+    await send({'type': 'websocket.accept'})
+
+    queue = hub.subscribe(schema_name)
+
+    async def client_gone():
+        # We only push; incoming frames are ignored until the client disconnects
+        while (await receive())['type'] != 'websocket.disconnect':
+            pass
+
+    disconnected = asyncio.ensure_future(client_gone())
+    try:
+        while not disconnected.done():
+            try:
+                data = await asyncio.wait_for(queue.get(), settings.LIVE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                data = json.dumps({'type': 'ping'})
+            await send({'type': 'websocket.send', 'text': data})
+    except OSError:
+        pass
+    finally:
+        hub.unsubscribe(schema_name, queue)
+        disconnected.cancel()
+
+
+async def sse_app(scope, receive, send):
+    cors = cors_headers(scope)
+    if scope['method'] == 'OPTIONS':
+        if cors:
+            cors += [
+                (b'access-control-allow-methods', b'GET, OPTIONS'),
+                (b'access-control-allow-headers', ', '.join(cors_conf.CORS_ALLOW_HEADERS).encode()),
+            ]
+            if cors_conf.CORS_PREFLIGHT_MAX_AGE:
+                cors.append((b'access-control-max-age', str(cors_conf.CORS_PREFLIGHT_MAX_AGE).encode()))
+        await send({'type': 'http.response.start', 'status': 200, 'headers': cors})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    schema_name = await authorize(scope['query_string'])
+    if schema_name is None:
+        await send({
+            'type': 'http.response.start', 'status': 401,
+            'headers': [(b'content-type', b'application/json')] + cors,
+        })
+        await send({'type': 'http.response.body', 'body': b'{"error": "Unauthorized"}'})
+        return
+
+    await send({
+        'type': 'http.response.start', 'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ] + cors,
+    })
+    queue = hub.subscribe(schema_name)
+
+    async def client_gone():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    disconnected = asyncio.ensure_future(client_gone())
+    try:
+        while not disconnected.done():
+            try:
+                data = await asyncio.wait_for(queue.get(), settings.LIVE_HEARTBEAT_SECONDS)
+                chunk = f'data: {data}\n\n'
+            except asyncio.TimeoutError:
+                chunk = ': ping\n\n'
+            await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+    except OSError:
+        pass
+    finally:
+        hub.unsubscribe(schema_name, queue)
+        disconnected.cancel()
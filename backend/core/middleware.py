@@ -1,7 +1,11 @@
+import time
+
 from django.utils.deprecation import MiddlewareMixin
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 
+from . import telemetry
+
 class CSRFExemptMiddleware(MiddlewareMixin):
     """Middleware to exempt API endpoints from CSRF protection"""
     
@@ -10,4 +14,20 @@ class CSRFExemptMiddleware(MiddlewareMixin):
         if request.path.startswith('/api/'):
             # Exempt from CSRF
             setattr(request, '_dont_enforce_csrf_checks', True)
-        return None 
\ No newline at end of file
+        return None 
+
+class LatencyMiddleware:
+    """Record request latency per URL route for the health endpoint"""
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        
+        match = getattr(request, 'resolver_match', None)
+        endpoint = f"{request.method} /{match.route}" if match else f"{request.method} (unmatched)"
+        telemetry.record(endpoint, elapsed_ms)
+        return response
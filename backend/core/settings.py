@@ -39,6 +39,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.LatencyMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'tenants.middleware.TenantMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -71,6 +72,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'core.wsgi.application'
+ASGI_APPLICATION = 'core.asgi.application'
 
 # Database
 DATABASES = {
@@ -172,6 +174,36 @@ SIMPLE_JWT = {
 # Redis settings
 REDIS_URL = config('REDIS_URL', default='redis://redis:6379/0')
 
+# Cache (shared across workers so fan-out results are computed once)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'katkat',
+    }
+}
+
+# Platform-wide dashboard stats fan out over tenant schemas
+DASHBOARD_FANOUT_WORKERS = config('DASHBOARD_FANOUT_WORKERS', default=8, cast=int)
+DASHBOARD_FANOUT_CHUNK_SIZE = 200  # schemas per UNION ALL query
+DASHBOARD_FANOUT_STATEMENT_TIMEOUT_MS = 10000
+
+# Dashboard endpoints serve cached values and refresh them in the
+# background once they are older than FRESH (stale-while-revalidate)
+DASHBOARD_CACHE_FRESH_SECONDS = 15
+DASHBOARD_CACHE_STALE_SECONDS = 10 * 60
+
+# Apps whose tables live in every tenant schema; `manage.py migrate_tenants`
+# applies their migrations to each schema
+TENANT_APPS = ['products', 'orders']
+TENANT_MIGRATION_WORKERS = config('TENANT_MIGRATION_WORKERS', default=4, cast=int)
+
+# Tenants on these plans get no schema of their own: their rows live in the
+# tables of SHARED_TENANT_SCHEMA, scoped by tenant_id (tenants.scoping).
+# `manage.py promote_tenant` moves one into its own schema
+SHARED_TENANT_SCHEMA = 'tenants_shared'
+SHARED_TENANT_PLANS = ['free']
+
 # Celery settings
 CELERY_BROKER_URL = REDIS_URL
 CELERY_RESULT_BACKEND = REDIS_URL
@@ -179,6 +211,27 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# The saleor worker shares the broker and consumes 'celery', so this
+# service's tasks get a queue of their own
+CELERY_TASK_DEFAULT_QUEUE = 'backend'
+
+# Tenant schemas are provisioned by the saleor worker, which consumes this
+# queue and reports back with tenants.tasks.schema_provisioned; this
+# service's worker only creates the default records
+PROVISIONING_QUEUE = 'provisioning'
+# Unfinished jobs without progress for this long may be retried
+PROVISIONING_STALE_SECONDS = 15 * 60
+
+# Live dashboard push (core.live)
+LIVE_QUEUE_SIZE = 100  # events buffered per connection before the oldest are dropped
+LIVE_HEARTBEAT_SECONDS = 25
+LIVE_TICKET_TTL = 30  # seconds a stream ticket stays usable
+
+# Health endpoint probes
+HEALTH_CACHE_SECONDS = 5
+HEALTH_PROBE_TIMEOUT = 2  # seconds
+HEALTH_CONNECTION_USAGE_WARN = 80  # % of max_connections reported as degraded
+LATENCY_SAMPLES = 1000  # request timings kept per endpoint
 
 # Tenant settings
 TENANT_MODEL = "tenants.Tenant"
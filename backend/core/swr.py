@@ -0,0 +1,67 @@
+"""
+Stale-while-revalidate caching on the Django cache.
+
+Entries stay fresh for ``fresh_for`` seconds and can then be served stale
+for another ``stale_for`` seconds. The first request to see a stale entry
+takes a short lock with ``cache.add`` and recomputes it on a background
+thread. That request and every later one get the stale value right
+away. On a cold miss, only the lock holder computes. The others wait
+for its result instead of all hitting the database at once; if it fails,
+one of them takes the lock over.
+
+``compute`` runs outside the request on a fresh database connection, so
+it must not rely on request state such as the tenant search_path.
+"""
+
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+LOCK_TIMEOUT = 30  # seconds; a crashed refresh releases its lock after this
+POLL_INTERVAL = 0.1  # seconds between a cold miss's checks for another worker's result
+
+
+def store(key, value, fresh_for, stale_for):
+    """Put a freshly computed value in the cache"""
+    cache.set(key, {'value': value, 'fresh_until': time.time() + fresh_for}, fresh_for + stale_for)
+
+
+def _refresh(key, compute, fresh_for, stale_for):
+    try:
+        store(key, compute(), fresh_for, stale_for)
+    except Exception:
+        logger.exception("Background refresh of %s failed", key)
+    finally:
+        cache.delete(f'{key}:lock')
+        connection.close()
+
+
+def get_or_compute(key, compute, fresh_for, stale_for):
+    """Return the cached value of ``key``, refreshing it as described above"""
+    entry = cache.get(key)
+    if entry is not None:
+        if entry['fresh_until'] < time.time() and cache.add(f'{key}:lock', 1, LOCK_TIMEOUT):
+            threading.Thread(
+                target=_refresh, args=(key, compute, fresh_for, stale_for), daemon=True,
+            ).start()
+        return entry['value']
+
+    while not cache.add(f'{key}:lock', 1, LOCK_TIMEOUT):
+        # Someone else is computing it; wait for their result rather than
+        # computing it too. If they fail, the lock goes and one waiter takes over
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry['value']
+
+    try:
+        value = compute()
+        store(key, value, fresh_for, stale_for)
+        return value
+    finally:
+        cache.delete(f'{key}:lock')
@@ -0,0 +1,56 @@
+"""
+In-process request latency telemetry.
+
+``LatencyMiddleware`` records how long each request took, keyed by the
+matched URL route (so ``orders/<uuid>`` is one endpoint, not thousands).
+Each endpoint keeps its last ``LATENCY_SAMPLES`` timings in a ring
+buffer. The numbers describe this worker process only, which is what
+the health endpoint reports.
+"""
+
+import threading
+from collections import defaultdict, deque
+
+from django.conf import settings
+
+_lock = threading.Lock()
+_samples = defaultdict(lambda: deque(maxlen=settings.LATENCY_SAMPLES))
+
+
+def record(endpoint, milliseconds):
+    with _lock:
+        _samples[endpoint].append(milliseconds)
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def overall_percentile(fraction):
+    """Percentile over every endpoint's samples, or None before any request"""
+    with _lock:
+        ordered = sorted(value for values in _samples.values() for value in values)
+    if not ordered:
+        return None
+    return round(percentile(ordered, fraction), 1)
+
+
+def latency_summary(limit=20):
+    """p50/p95/p99 per endpoint, busiest endpoints first"""
+    with _lock:
+        snapshot = {endpoint: sorted(values) for endpoint, values in _samples.items() if values}
+
+    summary = []
+    for endpoint, ordered in snapshot.items():
+        summary.append({
+            'endpoint': endpoint,
+            'samples': len(ordered),
+            'p50_ms': round(percentile(ordered, 0.50), 1),
+            'p95_ms': round(percentile(ordered, 0.95), 1),
+            'p99_ms': round(percentile(ordered, 0.99), 1),
+            'max_ms': round(ordered[-1], 1),
+        })
+    summary.sort(key=lambda row: row['samples'], reverse=True)
+    return summary[:limit]
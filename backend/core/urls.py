@@ -8,6 +8,7 @@ urlpatterns = [
     path('api/auth/', include('users.urls')),
     path('api/storefronts/', include('storefronts.urls')),
     path('api/dashboard/', include('dashboard.urls')),
+    path('api/tenants/', include('tenants.urls')),
     path('api/', include('api.urls')),
 ]
 
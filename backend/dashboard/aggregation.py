@@ -0,0 +1,139 @@
+"""
+Platform-wide order statistics across tenant schemas.
+
+Every tenant keeps its orders in its own schema, so a plain ``Order``
+query only sees whichever schema is on the search_path. This module lists
+the active tenant schemas that actually have an ``orders`` table, splits
+them into chunks, and sends each chunk as one ``UNION ALL`` query. The
+chunks run on a bounded thread pool, each on its own database
+connection. Per-tenant rows are merged into platform totals; the
+dashboard view caches them with stale-while-revalidate.
+
+Shared-table tenants (see ``tenants.scoping``) all keep their orders in
+``SHARED_TENANT_SCHEMA``. That schema's part of a chunk is grouped by
+tenant_id, so it still yields one row per tenant.
+
+A chunk that fails (for example a schema dropped mid-run) is retried
+schema by schema, so one broken tenant only drops itself from the totals.
+It is reported under ``failed_schemas``.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from tenants.models import Tenant
+
+logger = logging.getLogger(__name__)
+
+
+def order_schemas():
+    """Active tenant schemas, and the shared schema, that have an orders table"""
+    active = set(
+        Tenant.objects.filter(is_active=True, isolation='schema').values_list('schema_name', flat=True)
+    )
+    active.add(settings.SHARED_TENANT_SCHEMA)
+    with connection.cursor() as cursor:
+        cursor.execute('''
+            SELECT n.nspname
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE c.relname = 'orders' AND c.relkind IN ('r', 'p')
+        ''')
+        return sorted(row[0] for row in cursor.fetchall() if row[0] in active)
+
+
+def chunk_query(schemas, since):
+    """One UNION ALL over the given schemas: (schema, orders, revenue, recent_orders)"""
+    parts = []
+    params = []
+    for schema in schemas:
+        if schema == settings.SHARED_TENANT_SCHEMA:
+            parts.append(f'''
+                SELECT t.schema_name, count(*), coalesce(sum(o.total_amount), 0),
+                       count(*) FILTER (WHERE o.created_at >= %s)
+                FROM {connection.ops.quote_name(schema)}.orders o
+                JOIN public.tenants t ON t.id = o.tenant_id
+                WHERE t.is_active
+                GROUP BY t.schema_name
+            ''')
+            params.append(since)
+            continue
+        parts.append(f'''
+            SELECT %s, count(*), coalesce(sum(total_amount), 0),
+                   count(*) FILTER (WHERE created_at >= %s)
+            FROM {connection.ops.quote_name(schema)}.orders
+        ''')
+        params.extend([schema, since])
+    return ' UNION ALL '.join(parts), params
+
+
+def _run(schemas, since):
+    sql, params = chunk_query(schemas, since)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SET LOCAL statement_timeout = %s', [settings.DASHBOARD_FANOUT_STATEMENT_TIMEOUT_MS])
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def query_chunk(schemas, since):
+    """Rows for a chunk of schemas, plus the schemas that could not be read"""
+    try:
+        try:
+            return _run(schemas, since), []
+        except Exception:
+            logger.warning("Order stats for %d schemas failed, retrying one by one", len(schemas), exc_info=True)
+
+        rows, failed = [], []
+        for schema in schemas:
+            try:
+                rows.extend(_run([schema], since))
+            except Exception:
+                logger.exception("Failed to read order stats of %s", schema)
+                failed.append(schema)
+        return rows, failed
+    finally:
+        # Each pool thread opened its own connection; close it with the thread's work
+        connection.close()
+
+
+def collect():
+    """Query every tenant schema and merge the results"""
+    schemas = order_schemas()
+    since = timezone.now() - timedelta(days=7)
+    size = settings.DASHBOARD_FANOUT_CHUNK_SIZE
+    chunks = [schemas[i:i + size] for i in range(0, len(schemas), size)]
+
+    total_orders = 0
+    total_revenue = Decimal('0')
+    recent_orders = 0
+    per_tenant = []
+    failed = []
+    with ThreadPoolExecutor(max_workers=settings.DASHBOARD_FANOUT_WORKERS) as pool:
+        for rows, chunk_failed in pool.map(lambda chunk: query_chunk(chunk, since), chunks):
+            failed.extend(chunk_failed)
+            for schema, orders, revenue, recent in rows:
+                total_orders += orders
+                total_revenue += revenue
+                recent_orders += recent
+                per_tenant.append((schema, orders, revenue))
+
+    per_tenant.sort(key=lambda row: row[2], reverse=True)
+    return {
+        'total_orders': total_orders,
+        'total_revenue': float(total_revenue),
+        'recent_orders': recent_orders,
+        'tenants_counted': len(per_tenant),
+        'failed_schemas': failed,
+        'top_tenants': [
+            {'schema_name': schema, 'orders': orders, 'revenue': float(revenue)}
+            for schema, orders, revenue in per_tenant[:10]
+        ],
+        'generated_at': timezone.now().isoformat(),
+    }
+
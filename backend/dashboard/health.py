@@ -0,0 +1,153 @@
+"""
+Probes behind the dashboard health endpoint.
+
+Each probe measures something real: timed database and Redis round
+trips, database connection usage against ``max_connections``, this
+process's memory and CPU, the Celery queue backlog and request latency
+percentiles (see ``core.telemetry``). Results are kept in-process for
+``HEALTH_CACHE_SECONDS``, so frequent polling does not turn the health
+check into load of its own.
+"""
+
+import os
+import resource
+import threading
+import time
+
+import redis
+from django.conf import settings
+from django.db import connection
+
+from core.telemetry import latency_summary, overall_percentile
+
+PROCESS_STARTED = time.time()
+
+_lock = threading.Lock()
+_cached = None
+_cached_at = 0.0
+_last_cpu = None
+
+
+def _timed(probe):
+    """Run a probe, returning its result with status and response time"""
+    start = time.perf_counter()
+    try:
+        result = probe() or {}
+        result['status'] = 'ok'
+    except Exception as e:
+        result = {'status': 'error', 'error': str(e)}
+    result['response_time'] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+def probe_database():
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+        cursor.execute('''
+            SELECT count(*), current_setting('max_connections')::int
+            FROM pg_stat_activity
+            WHERE datname = current_database()
+        ''')
+        used, maximum = cursor.fetchone()
+    return {
+        'connections': used,
+        'max_connections': maximum,
+        'connection_usage': round(100.0 * used / maximum, 1),
+    }
+
+
+def probe_redis():
+    client = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=settings.HEALTH_PROBE_TIMEOUT)
+    try:
+        client.ping()
+        # Celery's default queue is a plain Redis list on the broker
+        return {'celery_queue_depth': client.llen(settings.CELERY_TASK_DEFAULT_QUEUE)}
+    finally:
+        client.close()
+
+
+def memory_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    # ru_maxrss is the peak, in KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def memory_percent(rss_mb):
+    """This process's resident memory as % of the machine's, or None if unknown"""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemTotal:'):
+                    return round(100.0 * rss_mb * 1024 / int(line.split()[1]), 1)
+    except OSError:
+        pass
+    return None
+
+
+def cpu_percent():
+    """CPU used by this process since the previous probe, as % of one core"""
+    global _last_cpu
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    sample = (time.monotonic(), usage.ru_utime + usage.ru_stime)
+    previous, _last_cpu = _last_cpu, sample
+    if previous is None or sample[0] <= previous[0]:
+        return None
+    return round(100.0 * (sample[1] - previous[1]) / (sample[0] - previous[0]), 1)
+
+
+def collect():
+    database = _timed(probe_database)
+    redis_probe = _timed(probe_redis)
+
+    if database['status'] != 'ok':
+        overall = 'unhealthy'
+    elif redis_probe['status'] != 'ok' or database.get('connection_usage', 0) >= settings.HEALTH_CONNECTION_USAGE_WARN:
+        overall = 'degraded'
+    else:
+        overall = 'healthy'
+
+    uptime = int(time.time() - PROCESS_STARTED)
+    rss_mb = memory_rss_mb()
+    cpu = cpu_percent()
+    return {
+        'status': overall,
+        'services': {
+            'database': database,
+            'redis': redis_probe,
+            # This process answered, so the API is up; median over recent requests
+            'api': {'status': 'ok', 'response_time': overall_percentile(0.50)},
+        },
+        # Top-level fields read by the dashboard page
+        'uptime': uptime,
+        'memory_usage': memory_percent(rss_mb),
+        'cpu_usage': cpu,
+        'process': {
+            'pid': os.getpid(),
+            'uptime': uptime,
+            'memory_rss_mb': rss_mb,
+            'cpu_percent': cpu,
+        },
+        'celery': {
+            'queue': settings.CELERY_TASK_DEFAULT_QUEUE,
+            'queue_depth': redis_probe.get('celery_queue_depth'),
+        },
+        'latency': latency_summary(),
+        'checked_at': time.time(),
+    }
+
+
+def health_report():
+    """Latest probe results, re-running the probes at most every HEALTH_CACHE_SECONDS"""
+    global _cached, _cached_at
+    with _lock:
+        if _cached is None or time.monotonic() - _cached_at >= settings.HEALTH_CACHE_SECONDS:
+            _cached = collect()
+            _cached_at = time.monotonic()
+        return _cached
@@ -0,0 +1,135 @@
+"""
+Order count and revenue per time bucket for dashboard charts.
+
+Buckets are hours, days, ISO weeks or months in the tenant's
+``TenantSettings.timezone``. They are computed with ``date_trunc`` over
+the tenant's ``orders`` table, which is a range scan on the created_at
+index. Once a bucket has closed, its orders can no longer change, so it
+is cached for CLOSED_BUCKET_TTL per (schema, timezone, interval, start). Repeat
+requests only query from the oldest uncached bucket onwards, usually
+just the current one.
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncHour, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from orders.models import Order
+
+INTERVALS = {
+    'hour': TruncHour,
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+DEFAULT_SPAN = {
+    'hour': timedelta(hours=48),
+    'day': timedelta(days=30),
+    'week': timedelta(weeks=26),
+    'month': timedelta(days=365),
+}
+MAX_BUCKETS = 1000
+CLOSED_BUCKET_TTL = 90 * 24 * 60 * 60
+
+
+def tenant_timezone(tenant):
+    """The tenant's configured timezone, falling back to UTC"""
+    try:
+        return ZoneInfo(tenant.settings.timezone)
+    except (ObjectDoesNotExist, ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo('UTC')
+
+
+def truncate(moment, interval):
+    """Start of the bucket containing a naive local datetime"""
+    if interval == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == 'day':
+        return day
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def next_bucket(start, interval):
+    if interval == 'hour':
+        return start + timedelta(hours=1)
+    if interval == 'day':
+        return start + timedelta(days=1)
+    if interval == 'week':
+        return start + timedelta(weeks=1)
+    years, month = divmod(start.month, 12)
+    return start.replace(year=start.year + years, month=month + 1)
+
+
+def bucket_starts(start, end, interval):
+    """Naive local bucket starts covering [start, end)"""
+    starts = []
+    bucket = truncate(start, interval)
+    while bucket < end:
+        starts.append(bucket)
+        if len(starts) > MAX_BUCKETS:
+            raise ValueError(f"At most {MAX_BUCKETS} buckets can be requested")
+        bucket = next_bucket(bucket, interval)
+    return starts
+
+
+def _cache_key(schema_name, zone, interval, start):
+    return f'timeseries:{schema_name}:{zone.key}:{interval}:{start.isoformat()}'
+
+
+def order_timeseries(schema_name, zone, interval, start, end):
+    """[{'start', 'orders', 'revenue'}] per bucket; start/end are naive local times"""
+    if interval not in INTERVALS:
+        raise ValueError(f"interval must be one of {', '.join(INTERVALS)}")
+
+    starts = bucket_starts(start, end, interval)
+    now = timezone.now().astimezone(zone).replace(tzinfo=None)
+    keys = {bucket: _cache_key(schema_name, zone, interval, bucket) for bucket in starts}
+    cached = cache.get_many(keys.values())
+
+    values = {}
+    missing = []
+    for bucket in starts:
+        if keys[bucket] in cached:
+            values[bucket] = cached[keys[bucket]]
+        else:
+            missing.append(bucket)
+
+    if missing:
+        # One grouped query from the oldest bucket we don't have yet
+        rows = (
+            Order.objects
+            .filter(
+                created_at__gte=missing[0].replace(tzinfo=zone),
+                created_at__lt=next_bucket(starts[-1], interval).replace(tzinfo=zone),
+            )
+            .annotate(bucket=INTERVALS[interval]('created_at', tzinfo=zone))
+            .values('bucket')
+            .annotate(orders=Count('id'), revenue=Sum('total_amount'))
+        )
+        fetched = {
+            row['bucket'].astimezone(zone).replace(tzinfo=None): (row['orders'], str(row['revenue'] or Decimal('0')))
+            for row in rows
+        }
+
+        closed = {}
+        for bucket in missing:
+            values[bucket] = fetched.get(bucket, (0, '0'))
+            if next_bucket(bucket, interval) <= now:
+                closed[keys[bucket]] = values[bucket]
+        if closed:
+            cache.set_many(closed, CLOSED_BUCKET_TTL)
+
+    return [{
+        'start': bucket.replace(tzinfo=zone).isoformat(),
+        'orders': values[bucket][0],
+        'revenue': float(values[bucket][1]),
+    } for bucket in starts]
@@ -4,5 +4,7 @@ from . import views
 urlpatterns = [
     path('stats/', views.dashboard_stats, name='dashboard_stats'),
     path('activity/', views.dashboard_activity, name='dashboard_activity'),
+    path('timeseries/', views.dashboard_timeseries, name='dashboard_timeseries'),
     path('health/', views.dashboard_health, name='dashboard_health'),
+    path('live/ticket/', views.live_ticket, name='live_ticket'),
 ] 
\ No newline at end of file
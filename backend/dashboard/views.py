@@ -2,13 +2,84 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import Count, Sum
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta
 from tenants.models import Tenant
+from tenants.scoping import use_tenant
 from storefronts.models import Storefront
 from orders.models import Order
 from products.models import Product
+from core import live, swr
+from .aggregation import collect
+from .health import health_report
+from .timeseries import DEFAULT_SPAN, order_timeseries, tenant_timezone
+
+
+def compute_dashboard_stats():
+    """Platform totals for the dashboard (cached by dashboard_stats)"""
+    # Get basic counts
+    total_tenants = Tenant.objects.count()
+    total_storefronts = Storefront.objects.count()
+
+    # Orders live in the tenant schemas; aggregate across all of them
+    order_stats = collect()
+
+    # Get recent activity counts
+    last_7_days = timezone.now() - timedelta(days=7)
+    recent_tenants = Tenant.objects.filter(created_at__gte=last_7_days).count()
+
+    return {
+        'total_tenants': total_tenants,
+        'total_storefronts': total_storefronts,
+        'total_orders': order_stats['total_orders'],
+        'total_revenue': order_stats['total_revenue'],
+        'recent_orders': order_stats['recent_orders'],
+        'recent_tenants': recent_tenants,
+        'top_tenants': order_stats['top_tenants'],
+        'failed_schemas': order_stats['failed_schemas'],
+        'generated_at': order_stats['generated_at'],
+    }
+
+
+def compute_dashboard_activity(tenant):
+    """Recent orders, tenants and storefronts (cached by dashboard_activity)"""
+    # Runs on a background thread too, which has no tenant middleware
+    with use_tenant(tenant):
+        # Get recent orders
+        recent_orders = Order.objects.order_by('-created_at')[:10]
+        orders_data = [{
+            'id': str(order.id),
+            'order_number': order.order_number,
+            'customer_name': order.customer_name or 'Anonymous',
+            'total_amount': float(order.total_amount),
+            'status': order.status,
+            'created_at': order.created_at.isoformat(),
+        } for order in recent_orders]
+
+    # Get recent tenants
+    recent_tenants = Tenant.objects.order_by('-created_at')[:5]
+    tenants_data = [{
+        'id': str(tenant.id),
+        'name': tenant.name,
+        'created_at': tenant.created_at.isoformat(),
+    } for tenant in recent_tenants]
+
+    # Get recent storefronts
+    recent_storefronts = Storefront.objects.select_related('tenant').order_by('-created_at')[:5]
+    storefronts_data = [{
+        'id': str(storefront.id),
+        'store_name': storefront.store_name,
+        'tenant_name': storefront.tenant.name if storefront.tenant else 'Unknown',
+        'created_at': storefront.created_at.isoformat(),
+    } for storefront in recent_storefronts]
+
+    return {
+        'recent_orders': orders_data,
+        'recent_tenants': tenants_data,
+        'recent_storefronts': storefronts_data,
+    }
 
 
 @api_view(['GET'])
@@ -16,27 +87,11 @@ from products.models import Product
 def dashboard_stats(request):
     """Get dashboard statistics"""
     try:
-        # Get basic counts
-        total_tenants = Tenant.objects.count()
-        total_storefronts = Storefront.objects.count()
-        total_orders = Order.objects.count()
-        total_revenue = Order.objects.aggregate(
-            total=Sum('total_amount')
-        )['total'] or 0
-
-        # Get recent activity counts
-        last_7_days = timezone.now() - timedelta(days=7)
-        recent_orders = Order.objects.filter(created_at__gte=last_7_days).count()
-        recent_tenants = Tenant.objects.filter(created_at__gte=last_7_days).count()
-
-        return Response({
-            'total_tenants': total_tenants,
-            'total_storefronts': total_storefronts,
-            'total_orders': total_orders,
-            'total_revenue': float(total_revenue),
-            'recent_orders': recent_orders,
-            'recent_tenants': recent_tenants,
-        })
+        stats = swr.get_or_compute(
+            'dashboard:stats', compute_dashboard_stats,
+            settings.DASHBOARD_CACHE_FRESH_SECONDS, settings.DASHBOARD_CACHE_STALE_SECONDS,
+        )
+        return Response(stats)
     except Exception as e:
         return Response(
             {'error': str(e)}, 
@@ -49,38 +104,53 @@ def dashboard_stats(request):
 def dashboard_activity(request):
     """Get recent activity data"""
     try:
-        # Get recent orders
-        recent_orders = Order.objects.order_by('-created_at')[:10]
-        orders_data = [{
-            'id': str(order.id),
-            'order_number': order.order_number,
-            'customer_name': order.customer_name or 'Anonymous',
-            'total_amount': float(order.total_amount),
-            'status': order.status,
-            'created_at': order.created_at.isoformat(),
-        } for order in recent_orders]
+        tenant = getattr(request, 'tenant', None)
+        schema_name = getattr(request, 'tenant_schema', 'public')
+        activity = swr.get_or_compute(
+            f'dashboard:activity:{schema_name}',
+            lambda: compute_dashboard_activity(tenant),
+            settings.DASHBOARD_CACHE_FRESH_SECONDS, settings.DASHBOARD_CACHE_STALE_SECONDS,
+        )
+        return Response(activity)
+    except Exception as e:
+        return Response(
+            {'error': str(e)}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dashboard_timeseries(request):
+    """Get order counts and revenue per hour/day/week/month for the tenant"""
+    try:
+        tenant = getattr(request, 'tenant', None)
+        if tenant is None:
+            return Response(
+                {'error': 'Tenant context required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        # Get recent tenants
-        recent_tenants = Tenant.objects.order_by('-created_at')[:5]
-        tenants_data = [{
-            'id': str(tenant.id),
-            'name': tenant.name,
-            'created_at': tenant.created_at.isoformat(),
-        } for tenant in recent_tenants]
-
-        # Get recent storefronts
-        recent_storefronts = Storefront.objects.select_related('tenant').order_by('-created_at')[:5]
-        storefronts_data = [{
-            'id': str(storefront.id),
-            'store_name': storefront.store_name,
-            'tenant_name': storefront.tenant.name if storefront.tenant else 'Unknown',
-            'created_at': storefront.created_at.isoformat(),
-        } for storefront in recent_storefronts]
+        zone = tenant_timezone(tenant)
+        interval = request.GET.get('interval', 'day')
+        now = timezone.now().astimezone(zone).replace(tzinfo=None)
+        try:
+            end = datetime.fromisoformat(request.GET['end']) if 'end' in request.GET else now
+            start = (
+                datetime.fromisoformat(request.GET['start']) if 'start' in request.GET
+                else end - DEFAULT_SPAN.get(interval, DEFAULT_SPAN['day'])
+            )
+            # Bounds are wall-clock times in the tenant's timezone
+            end = end.astimezone(zone).replace(tzinfo=None) if end.tzinfo else end
+            start = start.astimezone(zone).replace(tzinfo=None) if start.tzinfo else start
+            buckets = order_timeseries(request.tenant_schema, zone, interval, start, end)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({
-            'recent_orders': orders_data,
-            'recent_tenants': tenants_data,
-            'recent_storefronts': storefronts_data,
+            'interval': interval,
+            'timezone': zone.key,
+            'buckets': buckets,
         })
     except Exception as e:
         return Response(
@@ -94,27 +164,8 @@ def dashboard_activity(request):
 def dashboard_health(request):
     """Get system health status"""
     try:
-        # Mock health data for now
-        health_data = {
-            'status': 'healthy',
-            'services': {
-                'database': {
-                    'status': 'ok',
-                    'response_time': 15
-                },
-                'redis': {
-                    'status': 'ok',
-                    'response_time': 5
-                },
-                'api': {
-                    'status': 'ok',
-                    'response_time': 25
-                }
-            },
-            'uptime': 86400,  # 24 hours in seconds
-            'memory_usage': 45.2,
-            'cpu_usage': 12.8
-        }
+        # Probes are cached for a few seconds, so polling stays cheap
+        health_data = health_report()
 
         return Response(health_data)
     except Exception as e:
@@ -122,3 +173,20 @@ def dashboard_health(request):
             {'error': str(e)}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def live_ticket(request):
+    """Issue a single-use ticket for the live event stream of a tenant"""
+    try:
+        tenant = Tenant.objects.get(id=request.data.get('tenant'), is_active=True)
+    except (Tenant.DoesNotExist, ValueError, ValidationError):
+        return Response({'error': 'Tenant not found'}, status=status.HTTP_404_NOT_FOUND)
+    if not (request.user.is_staff or tenant.owner_id == request.user.id):
+        return Response({'error': 'Tenant not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response({
+        'ticket': live.issue_ticket(tenant.schema_name),
+        'expires_in': settings.LIVE_TICKET_TTL,
+    }, status=status.HTTP_201_CREATED)
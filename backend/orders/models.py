@@ -1,9 +1,10 @@
 from django.db import models
-import uuid
+from core.ids import uuid7
 from products.models import Product
+from tenants.scoping import TenantScopedModel
 
 
-class Order(models.Model):
+class Order(TenantScopedModel):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('processing', 'Processing'),
@@ -12,8 +13,8 @@ class Order(models.Model):
         ('cancelled', 'Cancelled'),
     ]
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    order_number = models.CharField(max_length=20, unique=True)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    order_number = models.CharField(max_length=20)
     customer_name = models.CharField(max_length=200)
     customer_email = models.EmailField()
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
@@ -23,13 +24,26 @@ class Order(models.Model):
     
     class Meta:
         db_table = 'orders'
+        indexes = [
+            # Range scans on created_at for the time-series endpoint
+            models.Index(fields=['-created_at', '-id'], name='orders_created_idx'),
+            models.Index(fields=['tenant', '-created_at', '-id'], name='orders_tenant_created_idx'),
+        ]
+        constraints = [
+            # Order numbers are unique per tenant, in a schema or the shared table
+            models.UniqueConstraint(
+                fields=['order_number'], condition=models.Q(tenant__isnull=True),
+                name='orders_order_number_uniq',
+            ),
+            models.UniqueConstraint(fields=['tenant', 'order_number'], name='orders_tenant_order_number_uniq'),
+        ]
     
     def __str__(self):
         return f"Order {self.order_number}"
 
 
-class OrderItem(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+class OrderItem(TenantScopedModel):
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.IntegerField()
@@ -37,6 +51,9 @@ class OrderItem(models.Model):
     
     class Meta:
         db_table = 'order_items'
+        indexes = [
+            models.Index(fields=['tenant'], name='order_items_tenant_idx'),
+        ]
     
     def __str__(self):
         return f"{self.quantity}x {self.product.name}" 
\ No newline at end of file
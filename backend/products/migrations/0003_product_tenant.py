@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0005_tenant_isolation'),
+        ('products', '0002_alter_product_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='tenant',
+            field=models.ForeignKey(blank=True, db_constraint=False, editable=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='tenants.tenant'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['tenant'], name='products_tenant_idx'),
+        ),
+    ]
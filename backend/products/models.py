@@ -1,9 +1,10 @@
 from django.db import models
-import uuid
+from core.ids import uuid7
+from tenants.scoping import TenantScopedModel
 
 
-class Product(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+class Product(TenantScopedModel):
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     name = models.CharField(max_length=200)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -15,6 +16,9 @@ class Product(models.Model):
     
     class Meta:
         db_table = 'products'
+        indexes = [
+            models.Index(fields=['tenant'], name='products_tenant_idx'),
+        ]
     
     def __str__(self):
-        return self.name 
\ No newline at end of file
+        return self.name
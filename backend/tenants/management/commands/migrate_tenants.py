@@ -0,0 +1,121 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.utils import timezone
+
+from tenants.models import Tenant, TenantMigrationState
+from tenants.schema_migrations import migrate_schema, target_nodes
+
+
+class Command(BaseCommand):
+    help = "Apply pending tenant app migrations to every tenant schema in parallel"
+
+    def add_arguments(self, parser):
+        parser.add_argument('schemas', nargs='*', help='Tenant schemas (default: all tenants and the shared schema)')
+        parser.add_argument(
+            '--workers', type=int, default=settings.TENANT_MIGRATION_WORKERS,
+            help='Schemas migrated at once, one process and connection each',
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Also run schemas that already succeeded at the current target',
+        )
+        parser.add_argument(
+            '--fake-initial', action='store_true',
+            help='Mark initial migrations applied where their tables already exist',
+        )
+
+    def handle(self, *args, **options):
+        target = [f'{app}.{name}' for app, name in target_nodes()]
+        tenants = Tenant.objects.filter(isolation='schema')
+        if options['schemas']:
+            tenants = tenants.filter(schema_name__in=options['schemas'])
+        tenant_ids = dict(tenants.values_list('schema_name', 'id'))
+
+        with connection.cursor() as cursor:
+            # The shared tables of small tenants are migrated like one more schema
+            shared = settings.SHARED_TENANT_SCHEMA
+            if not options['schemas'] or shared in options['schemas']:
+                cursor.execute(f'CREATE SCHEMA IF NOT EXISTS "{shared}";')
+                tenant_ids[shared] = None
+            cursor.execute('SELECT nspname FROM pg_namespace WHERE nspname = ANY(%s)', [list(tenant_ids)])
+            existing = {row[0] for row in cursor.fetchall()}
+        missing = sorted(set(tenant_ids) - existing)
+        if missing:
+            self.stdout.write(self.style.WARNING(f"Skipping {len(missing)} tenants without a schema: {', '.join(missing[:10])}"))
+
+        # Resume: schemas that already reached this target are done
+        done = set()
+        if not options['force']:
+            done = set(TenantMigrationState.objects.filter(
+                schema_name__in=existing, status='succeeded', target=target,
+            ).values_list('schema_name', flat=True))
+        todo = sorted(existing - done)
+        self.stdout.write(
+            f"Target: {', '.join(target) or '(no tenant migrations)'}\n"
+            f"{len(todo)} schemas to migrate, {len(done)} already up to date, {options['workers']} workers"
+        )
+        if not todo:
+            return
+
+        TenantMigrationState.objects.bulk_create(
+            [TenantMigrationState(schema_name=schema, tenant_id=tenant_ids[schema]) for schema in todo],
+            ignore_conflicts=True,
+        )
+        TenantMigrationState.objects.filter(schema_name__in=todo).update(
+            status='running', target=target, error='', started_at=timezone.now(), finished_at=None,
+        )
+
+        # Forked workers must not share the parent's database connection
+        connections.close_all()
+        started = time.monotonic()
+        results = []
+        with ProcessPoolExecutor(
+            max_workers=max(1, options['workers']),
+            mp_context=multiprocessing.get_context('fork'),
+        ) as pool:
+            futures = [pool.submit(migrate_schema, schema, options['fake_initial']) for schema in todo]
+            for count, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                results.append(result)
+                self.record(result)
+                self.report(count, len(todo), result)
+
+        self.summarize(results, time.monotonic() - started)
+
+    def record(self, result):
+        TenantMigrationState.objects.filter(schema_name=result['schema_name']).update(
+            status=result['status'],
+            applied=result['applied'],
+            error=result.get('error', ''),
+            duration=result['duration'],
+            finished_at=timezone.now(),
+        )
+
+    def report(self, count, total, result):
+        line = f"[{count}/{total}] {result['schema_name']}: "
+        if result['status'] == 'succeeded':
+            self.stdout.write(line + self.style.SUCCESS(
+                f"{len(result['applied'])} applied in {result['duration']:.2f}s"
+            ))
+        else:
+            self.stdout.write(line + self.style.ERROR(f"failed after {result['duration']:.2f}s: {result['error']}"))
+
+    def summarize(self, results, elapsed):
+        durations = sorted(result['duration'] for result in results)
+        failed = [result['schema_name'] for result in results if result['status'] == 'failed']
+        self.stdout.write(
+            f"\nMigrated {len(results) - len(failed)}/{len(results)} schemas in {elapsed:.1f}s "
+            f"(median {durations[len(durations) // 2]:.2f}s, max {durations[-1]:.2f}s per schema)"
+        )
+        slowest = sorted(results, key=lambda result: result['duration'], reverse=True)[:5]
+        self.stdout.write("Slowest: " + ', '.join(f"{result['schema_name']} {result['duration']:.2f}s" for result in slowest))
+        if failed:
+            raise CommandError(
+                f"{len(failed)} schemas failed ({', '.join(failed[:10])}); "
+                f"run the command again to retry them"
+            )
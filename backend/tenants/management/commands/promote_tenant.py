@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from orders.models import Order, OrderItem
+from products.models import Product
+from tenants.models import Tenant
+from tenants.schema_migrations import migrate_schema
+
+# Parents before children, so foreign keys hold while copying
+MODELS = [Product, Order, OrderItem]
+
+
+class Command(BaseCommand):
+    help = "Move a shared-table tenant into its own schema"
+
+    def add_arguments(self, parser):
+        parser.add_argument('schema_name', help='Schema name of the tenant to promote')
+
+    def handle(self, *args, **options):
+        try:
+            tenant = Tenant.objects.get(schema_name=options['schema_name'])
+        except Tenant.DoesNotExist:
+            raise CommandError(f"Tenant {options['schema_name']} does not exist")
+        if tenant.isolation != 'shared':
+            raise CommandError(f"Tenant {tenant.schema_name} already has its own schema")
+
+        # Create the schema and its tables first, outside the copy transaction
+        with connection.cursor() as cursor:
+            cursor.execute(f'CREATE SCHEMA IF NOT EXISTS "{tenant.schema_name}";')
+        result = migrate_schema(tenant.schema_name)
+        if result['status'] != 'succeeded':
+            raise CommandError(f"Migrating {tenant.schema_name} failed: {result['error']}")
+
+        copied = self.move_rows(tenant)
+        self.stdout.write(self.style.SUCCESS(
+            f"Promoted {tenant.schema_name}: " + ', '.join(f'{count} {table}' for table, count in copied.items())
+        ))
+
+    def move_rows(self, tenant):
+        """Copy the tenant's rows into its schema and switch it over, atomically"""
+        shared = connection.ops.quote_name(settings.SHARED_TENANT_SCHEMA)
+        target = connection.ops.quote_name(tenant.schema_name)
+        tables = [model._meta.db_table for model in MODELS]
+        copied = {}
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Blocks writes of every shared tenant until commit; reads go on
+            cursor.execute(
+                f"LOCK TABLE {', '.join(f'{shared}.{table}' for table in tables)} IN SHARE ROW EXCLUSIVE MODE"
+            )
+            for model in MODELS:
+                table = model._meta.db_table
+                columns = [field.column for field in model._meta.concrete_fields]
+                # tenant_id is NULL in a tenant's own schema
+                select = ', '.join('NULL' if column == 'tenant_id' else column for column in columns)
+                cursor.execute(f'''
+                    INSERT INTO {target}.{table} ({', '.join(columns)})
+                    SELECT {select} FROM {shared}.{table} WHERE tenant_id = %s
+                ''', [tenant.id])
+                copied[table] = cursor.rowcount
+
+            for table in reversed(tables):
+                cursor.execute(f'DELETE FROM {shared}.{table} WHERE tenant_id = %s', [tenant.id])
+
+            Tenant.objects.filter(id=tenant.id).update(isolation='schema')
+        return copied
@@ -2,6 +2,7 @@ from django.db import connection
 from django.http import JsonResponse
 from django.conf import settings
 from .models import Tenant, ApiKey
+from .scoping import current_tenant
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,6 +15,7 @@ class TenantMiddleware:
         self.get_response = get_response
     
     def __call__(self, request):
+        token = None
         try:
             # Extract tenant information
             tenant = self.get_tenant_from_request(request)
@@ -21,7 +23,9 @@ class TenantMiddleware:
             if tenant:
                 # Set tenant context
                 request.tenant = tenant
-                self.set_tenant_schema(tenant.schema_name)
+                self.set_tenant_schema(tenant.search_schema)
+                # Scopes the tenant models to this tenant's rows in shared mode
+                token = current_tenant.set(tenant)
                 
                 # Add tenant info to request for logging/debugging
                 request.tenant_schema = tenant.schema_name
@@ -38,7 +42,11 @@ class TenantMiddleware:
             request.tenant_schema = 'public'
             request.tenant_id = None
         
-        response = self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                current_tenant.reset(token)
         
         # Add CORS headers for tenant-specific requests
         if hasattr(request, 'tenant') and request.tenant:
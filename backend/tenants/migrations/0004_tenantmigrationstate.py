@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0003_provisioningjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TenantMigrationState',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('schema_name', models.CharField(max_length=63, unique=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('target', models.JSONField(blank=True, default=list)),
+                ('applied', models.JSONField(blank=True, default=list)),
+                ('error', models.TextField(blank=True)),
+                ('duration', models.FloatField(blank=True, null=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('tenant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='migration_states', to='tenants.tenant')),
+            ],
+            options={
+                'db_table': 'tenant_migration_states',
+                'ordering': ['schema_name'],
+            },
+        ),
+    ]
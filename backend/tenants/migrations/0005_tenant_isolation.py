@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0004_tenantmigrationstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tenant',
+            name='isolation',
+            field=models.CharField(choices=[('schema', 'Own schema'), ('shared', 'Shared tables')], default='schema', max_length=10),
+        ),
+    ]
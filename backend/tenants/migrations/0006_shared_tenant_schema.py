@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def create_shared_tables(apps, schema_editor):
+    """Create SHARED_TENANT_SCHEMA with the tenant apps' tables as of this migration
+
+    The tables and their history are taken from the same project state, so
+    ``migrate_tenants`` carries on from here with the tenant apps' later
+    migrations. A schema it already migrated is left alone.
+    """
+    connection = schema_editor.connection
+    schema = connection.ops.quote_name(settings.SHARED_TENANT_SCHEMA)
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT to_regclass('{schema}.django_migrations') IS NOT NULL")
+        if cursor.fetchone()[0]:
+            return
+        cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {schema};')
+        cursor.execute(f'SET LOCAL search_path TO {schema}, public;')
+    try:
+        # A separate editor, so its deferred indexes and foreign keys run
+        # while the search_path still points at the shared schema
+        with connection.schema_editor(atomic=False) as editor:
+            for app_label in settings.TENANT_APPS:
+                for model in apps.get_app_config(app_label).get_models():
+                    editor.create_model(model)
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL search_path TO public;')
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE {schema}.django_migrations (LIKE public.django_migrations INCLUDING ALL);'
+        )
+        cursor.execute(
+            f'INSERT INTO {schema}.django_migrations (app, name, applied) '
+            f'SELECT app, name, applied FROM public.django_migrations;'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0005_tenant_isolation'),
+        ('products', '0003_product_tenant'),
+        ('orders', '0004_order_tenant_orderitem_tenant'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_shared_tables, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,7 @@ import uuid
 import hashlib
 import secrets
 from datetime import datetime, timedelta
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
@@ -22,6 +23,12 @@ class Tenant(models.Model):
     subdomain = models.CharField(max_length=100, blank=True, null=True)
     owner = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='tenants', null=True, blank=True)
     
+    # Small tenants share tables in SHARED_TENANT_SCHEMA (see tenants.scoping)
+    isolation = models.CharField(max_length=10, choices=[
+        ('schema', 'Own schema'),
+        ('shared', 'Shared tables'),
+    ], default='schema')
+    
     # Tenant status
     is_active = models.BooleanField(default=True)
     is_verified = models.BooleanField(default=False)
@@ -60,8 +67,15 @@ class Tenant(models.Model):
     def save(self, *args, **kwargs):
         if not self.schema_name:
             self.schema_name = self.name.lower().replace(' ', '_').replace('-', '_')
+        if self._state.adding and self.plan_type in settings.SHARED_TENANT_PLANS:
+            self.isolation = 'shared'
         super().save(*args, **kwargs)
     
+    @property
+    def search_schema(self):
+        """Schema holding this tenant's products and orders"""
+        return settings.SHARED_TENANT_SCHEMA if self.isolation == 'shared' else self.schema_name
+    
     @property
     def is_trial_active(self):
         if not self.trial_ends_at:
@@ -210,4 +224,67 @@ class TenantSettings(models.Model):
         db_table = 'tenant_settings'
     
     def __str__(self):
-        return f"{self.tenant.name} Settings" 
\ No newline at end of file
+        return f"{self.tenant.name} Settings" 
+
+class ProvisioningJob(models.Model):
+    """Asynchronous provisioning of a tenant's schema and default records"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='provisioning_jobs', null=True, blank=True)
+    schema_name = models.CharField(max_length=63)
+    options = models.JSONField(default=dict, blank=True)
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    steps = models.JSONField(default=list, blank=True)  # completed steps, in order
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'tenant_provisioning_jobs'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.schema_name} provisioning ({self.status})"
+
+
+class TenantMigrationState(models.Model):
+    """Outcome of the last ``migrate_tenants`` run on one tenant schema"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tenant = models.ForeignKey(Tenant, on_delete=models.SET_NULL, related_name='migration_states', null=True, blank=True)
+    schema_name = models.CharField(max_length=63, unique=True)
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    target = models.JSONField(default=list, blank=True)  # leaf migrations the schema was brought to
+    applied = models.JSONField(default=list, blank=True)  # migrations applied by the last run
+    error = models.TextField(blank=True)
+    duration = models.FloatField(null=True, blank=True)  # seconds
+    
+    # Timestamps
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'tenant_migration_states'
+        ordering = ['schema_name']
+    
+    def __str__(self):
+        return f"{self.schema_name} migrations ({self.status})"
@@ -0,0 +1,148 @@
+"""
+Asynchronous tenant provisioning.
+
+Signup only writes the tenant row and a ``ProvisioningJob``, then returns
+the job id, so its latency does not depend on provisioning cost. The work
+runs in Celery:
+
+1. ``tenants.tasks.provision_tenant`` creates the default storefront,
+   theme, storefront settings and tenant settings.
+2. It creates the tenant's schema in this service's database and applies
+   the tenant apps' migrations to it, as ``migrate_tenants`` would. The
+   saleor worker's schema lives in saleor's own database, so without this
+   the tenant's products and orders would resolve to ``public``.
+3. It hands the schema work to the saleor worker on ``PROVISIONING_QUEUE``.
+   The job row lives in this service's database, so the message carries
+   the job id, schema name and options. That worker claims or clones the
+   tenant schema and creates the optional sample data.
+4. The saleor worker reports back with ``tenants.tasks.schema_provisioned``,
+   which marks the job succeeded and activates the tenant, or marks it
+   failed.
+
+Shared-table tenants (see ``tenants.scoping``) need no schema, so steps 2
+to 4 are skipped: the job is completed here and the tenant activated.
+
+Every step checks what already exists before creating anything, so a
+retried or resubmitted job picks up where it stopped. Clients poll
+``/api/tenants/provisioning/<job id>/``.
+"""
+
+from datetime import timedelta
+
+from celery import current_app
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from storefronts.models import Storefront, StorefrontSettings, Theme
+from .models import ProvisioningJob, TenantSettings
+from .schema_migrations import migrate_schema
+
+SCHEMA_TASK = 'django_project.tasks.provision_schema'
+
+
+def submit(tenant, **options):
+    """Create a provisioning job for a tenant and queue it after commit"""
+    job = ProvisioningJob.objects.create(tenant=tenant, schema_name=tenant.schema_name, options=options)
+    enqueue(job)
+    return job
+
+
+def enqueue(job):
+    from .tasks import provision_tenant
+    transaction.on_commit(lambda: provision_tenant.delay(str(job.id)))
+
+
+def is_stale(job):
+    """Whether an unfinished job has made no progress for PROVISIONING_STALE_SECONDS
+
+    A lost task or a saleor worker killed mid-job leaves it unfinished for good.
+    """
+    return (
+        job.status in ('pending', 'running')
+        and job.updated_at < timezone.now() - timedelta(seconds=settings.PROVISIONING_STALE_SECONDS)
+    )
+
+
+def resubmit(job):
+    """Queue a failed or stale job again; completed steps are skipped"""
+    job.status = 'pending'
+    job.error = ''
+    job.finished_at = None
+    job.save(update_fields=['status', 'error', 'finished_at', 'updated_at'])
+    enqueue(job)
+
+
+def mark_step(job, step):
+    if step not in job.steps:
+        job.steps.append(step)
+    job.save(update_fields=['steps', 'updated_at'])
+
+
+def create_defaults(job):
+    """Default storefront, theme and settings records of the job's tenant"""
+    tenant = job.tenant
+    with transaction.atomic():
+        storefront, _ = Storefront.objects.get_or_create(
+            tenant=tenant,
+            defaults={'store_name': tenant.name},
+        )
+        Theme.objects.get_or_create(storefront=storefront)
+        StorefrontSettings.objects.get_or_create(storefront=storefront)
+        TenantSettings.objects.get_or_create(tenant=tenant)
+    mark_step(job, 'defaults')
+
+
+def create_schema(job):
+    """The tenant's schema and tenant app tables in this service's database"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE SCHEMA IF NOT EXISTS "{job.schema_name}";')
+    result = migrate_schema(job.schema_name)
+    if result['status'] != 'succeeded':
+        raise RuntimeError(f"Migrating {job.schema_name} failed: {result['error']}")
+    mark_step(job, 'backend_schema')
+
+
+def hand_off(job):
+    """Send the schema work to the saleor worker, which owns the tenant DDL"""
+    job.status = 'running'
+    job.save(update_fields=['status', 'updated_at'])
+    current_app.send_task(
+        SCHEMA_TASK, args=[str(job.id), job.schema_name, job.options],
+        queue=settings.PROVISIONING_QUEUE,
+    )
+
+
+def complete(job, steps=()):
+    """Activate the job's tenant and mark the job succeeded"""
+    with transaction.atomic():
+        job.tenant.is_active = True
+        job.tenant.save(update_fields=['is_active', 'updated_at'])
+        job.steps = [step for step in job.steps if step not in steps] + list(steps)
+        job.status = 'succeeded'
+        job.error = ''
+        job.finished_at = timezone.now()
+        job.save(update_fields=['steps', 'status', 'error', 'finished_at', 'updated_at'])
+
+
+def record_failure(job, error, final):
+    job.attempts += 1
+    job.error = str(error)
+    job.status = 'failed' if final else 'pending'
+    job.finished_at = timezone.now() if final else None
+    job.save(update_fields=['attempts', 'error', 'status', 'finished_at', 'updated_at'])
+
+
+def serialize(job):
+    return {
+        'id': str(job.id),
+        'tenant_id': str(job.tenant_id) if job.tenant_id else None,
+        'schema_name': job.schema_name,
+        'status': job.status,
+        'steps': job.steps,
+        'attempts': job.attempts,
+        'error': job.error or None,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'status_url': f'/api/tenants/provisioning/{job.id}/',
+    }
@@ -0,0 +1,70 @@
+"""
+Applying migrations of the tenant apps (``TENANT_APPS``) to one tenant
+schema. ``manage.py migrate_tenants`` runs this across every schema in a
+process pool.
+
+Each schema records its own migration history in its own
+``django_migrations`` table, the first one on its search_path. The
+shared apps' rows are copied in from ``public`` first, so dependencies on
+them count as applied. Otherwise migrating a tenant app would also create
+the shared tables inside the tenant schema.
+"""
+
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.migrations.loader import MigrationLoader
+
+
+def target_nodes():
+    """Latest migration of every tenant app, as (app, name) pairs"""
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    return sorted(node for node in loader.graph.leaf_nodes() if node[0] in settings.TENANT_APPS)
+
+
+def prepare_history(cursor, schema_name):
+    cursor.execute(
+        f'CREATE TABLE IF NOT EXISTS "{schema_name}".django_migrations '
+        f'(LIKE public.django_migrations INCLUDING ALL);'
+    )
+    cursor.execute(f'''
+        INSERT INTO "{schema_name}".django_migrations (app, name, applied)
+        SELECT p.app, p.name, p.applied
+        FROM public.django_migrations p
+        WHERE p.app <> ALL(%s)
+          AND NOT EXISTS (
+              SELECT 1 FROM "{schema_name}".django_migrations t
+              WHERE t.app = p.app AND t.name = p.name
+          )
+    ''', [list(settings.TENANT_APPS)])
+
+
+def migrate_schema(schema_name, fake_initial=False):
+    """Apply pending tenant app migrations to one schema; returns a result dict
+
+    Runs in a pool worker, so failures are returned rather than raised.
+    """
+    started = time.monotonic()
+    result = {'schema_name': schema_name, 'applied': []}
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'SET search_path TO "{schema_name}", public;')
+            prepare_history(cursor, schema_name)
+
+        executor = MigrationExecutor(connection)
+        targets = [node for node in executor.loader.graph.leaf_nodes() if node[0] in settings.TENANT_APPS]
+        plan = executor.migration_plan(targets)
+        executor.migrate(targets, plan=plan, fake_initial=fake_initial)
+
+        result['applied'] = [f'{migration.app_label}.{migration.name}' for migration, _ in plan]
+        result['status'] = 'succeeded'
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = f'{type(e).__name__}: {e}'
+    finally:
+        # The next schema gets a fresh session and search_path
+        connection.close()
+    result['duration'] = time.monotonic() - started
+    return result
@@ -0,0 +1,115 @@
+"""
+Row-level scoping for tenants in shared-table mode.
+
+Tenants on a plan in ``SHARED_TENANT_PLANS`` get no schema of their own.
+Their products, orders and order items live in the tables of one
+shared schema (``SHARED_TENANT_SCHEMA``), keyed by a ``tenant_id``
+column. Catalog size, connection warm-up and migration time then stay
+flat however many small tenants sign up. In a tenant's own schema the
+column is NULL.
+
+The active tenant is held in a context variable, set by
+``TenantMiddleware`` for requests and by ``use_tenant`` elsewhere. Every
+tenant model uses ``TenantScopedManager``. While a shared-mode tenant is
+active, its querysets are filtered on that tenant_id and new rows are
+stamped with it. Raw SQL bypasses this and must filter on tenant_id
+itself.
+
+Isolation is decided once, when ``Tenant.save`` creates the tenant. The
+shared schema and its tables are created by migration
+``tenants.0006_shared_tenant_schema`` and kept up to date by
+``migrate_tenants``. Provisioning fails a shared tenant whose tables are
+missing, since its rows would otherwise fall through the search_path
+into the ``public`` tables.
+
+``manage.py promote_tenant`` moves a tenant that outgrew the shared
+tables into its own schema.
+"""
+
+import contextvars
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, models
+
+current_tenant = contextvars.ContextVar('current_tenant', default=None)
+
+
+def shared_tenant_id():
+    """Id of the active tenant if it lives in the shared tables, else None"""
+    tenant = current_tenant.get()
+    if tenant is not None and tenant.isolation == 'shared':
+        return tenant.id
+    return None
+
+
+def shared_tables_ready():
+    """Whether the shared schema holds every tenant table yet"""
+    schema = connection.ops.quote_name(settings.SHARED_TENANT_SCHEMA)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT to_regclass('{schema}.products') IS NOT NULL"
+            f" AND to_regclass('{schema}.orders') IS NOT NULL"
+            f" AND to_regclass('{schema}.order_items') IS NOT NULL"
+        )
+        return cursor.fetchone()[0]
+
+
+@contextmanager
+def use_tenant(tenant):
+    """Run a block as ``tenant`` (or as no tenant, on the public schema)
+
+    Threads and tasks do not inherit the request's context, so anything
+    reading tenant rows outside the request must go through this.
+    """
+    token = current_tenant.set(tenant)
+    schema_name = tenant.search_schema if tenant else 'public'
+    with connection.cursor() as cursor:
+        cursor.execute(f'SET search_path TO "{schema_name}", public;')
+    try:
+        yield
+    finally:
+        current_tenant.reset(token)
+        with connection.cursor() as cursor:
+            cursor.execute('SET search_path TO public;')
+
+
+class TenantScopedQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create skips save(), so stamp the rows here
+        objs = list(objs)
+        tenant_id = shared_tenant_id()
+        if tenant_id is not None:
+            for obj in objs:
+                if obj.tenant_id is None:
+                    obj.tenant_id = tenant_id
+        return super().bulk_create(objs, *args, **kwargs)
+
+
+class TenantScopedManager(models.Manager.from_queryset(TenantScopedQuerySet)):
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        tenant_id = shared_tenant_id()
+        if tenant_id is not None:
+            queryset = queryset.filter(tenant_id=tenant_id)
+        return queryset
+
+
+class TenantScopedModel(models.Model):
+    """Base of the models stored per tenant, in a schema or the shared tables"""
+    # No database constraint: thousands of schemas referencing public.tenants
+    # would make every tenant delete check all of them
+    tenant = models.ForeignKey(
+        'tenants.Tenant', on_delete=models.DO_NOTHING, db_constraint=False,
+        null=True, blank=True, editable=False, related_name='+',
+    )
+
+    objects = TenantScopedManager()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if self.tenant_id is None:
+            self.tenant_id = shared_tenant_id()
+        super().save(*args, **kwargs)
@@ -0,0 +1,52 @@
+import logging
+
+from celery import shared_task
+from django.conf import settings
+
+from . import provisioning
+from .models import ProvisioningJob
+from .scoping import shared_tables_ready
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, ignore_result=True, max_retries=5)
+def provision_tenant(self, job_id):
+    """Create a tenant's default records and schema, then hand the saleor schema work off
+
+    Shared-table tenants have no schema work; their job completes here.
+    """
+    job = ProvisioningJob.objects.select_related('tenant').get(id=job_id)
+    if job.status == 'succeeded':
+        return
+
+    try:
+        if 'defaults' not in job.steps:
+            provisioning.create_defaults(job)
+        if job.tenant.isolation == 'shared':
+            if not shared_tables_ready():
+                raise RuntimeError(f"The tables of {settings.SHARED_TENANT_SCHEMA} do not exist; run migrate")
+            provisioning.complete(job)
+        else:
+            if 'backend_schema' not in job.steps:
+                provisioning.create_schema(job)
+            provisioning.hand_off(job)
+    except Exception as e:
+        logger.exception("Failed to provision tenant %s", job.schema_name)
+        final = self.request.retries >= self.max_retries
+        provisioning.record_failure(job, e, final)
+        if not final:
+            raise self.retry(exc=e, countdown=2 ** self.request.retries)
+
+
+@shared_task(ignore_result=True)
+def schema_provisioned(job_id, steps=(), error=None):
+    """Outcome of the saleor worker's schema work for a job (see provisioning.hand_off)"""
+    job = ProvisioningJob.objects.select_related('tenant').get(id=job_id)
+    if job.status == 'succeeded':
+        return
+    if error:
+        # The saleor worker has already used up its retries
+        provisioning.record_failure(job, error, final=True)
+    else:
+        provisioning.complete(job, steps)
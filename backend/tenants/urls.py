@@ -0,0 +1,7 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('provisioning/<str:job_id>/', views.provisioning_status, name='provisioning_status'),
+    path('provisioning/<str:job_id>/retry/', views.retry_provisioning, name='retry_provisioning'),
+]
@@ -0,0 +1,46 @@
+from django.core.exceptions import ValidationError
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from . import provisioning
+from .models import ProvisioningJob
+
+
+def get_job(request, job_id):
+    """The job if it exists and belongs to the user's tenant, else None"""
+    try:
+        job = ProvisioningJob.objects.select_related('tenant').get(id=job_id)
+    except (ProvisioningJob.DoesNotExist, ValidationError):
+        return None
+    if request.user.is_staff or (job.tenant and job.tenant.owner_id == request.user.id):
+        return job
+    return None
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def provisioning_status(request, job_id):
+    """Progress of a tenant provisioning job"""
+    job = get_job(request, job_id)
+    if job is None:
+        return Response({'error': 'Provisioning job not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(provisioning.serialize(job))
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def retry_provisioning(request, job_id):
+    """Resubmit a failed or stale provisioning job"""
+    job = get_job(request, job_id)
+    if job is None:
+        return Response({'error': 'Provisioning job not found'}, status=status.HTTP_404_NOT_FOUND)
+    if job.status != 'failed' and not provisioning.is_stale(job):
+        return Response(
+            {'error': f"Job is {job.status}, only failed or stale jobs can be retried"},
+            status=status.HTTP_409_CONFLICT,
+        )
+    
+    provisioning.resubmit(job)
+    return Response(provisioning.serialize(job), status=status.HTTP_202_ACCEPTED)
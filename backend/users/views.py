@@ -10,6 +10,7 @@ from django.utils.decorators import method_decorator
 from .models import User
 from .serializers import UserRegistrationSerializer, UserSerializer
 from tenants.models import Tenant
+from tenants import provisioning
 
 
 class UserRegistrationView(generics.CreateAPIView):
@@ -33,14 +34,18 @@ class UserRegistrationView(generics.CreateAPIView):
                 tenant_name = f"{base_name} ({counter})"
                 counter += 1
             
+            # Activated by the provisioning job once its schema (or shared rows) exist
             tenant = Tenant.objects.create(
                 name=tenant_name,
                 subdomain=f"{user.username.lower().replace('@', '').replace('.', '')}",
                 plan_type='free',
-                is_active=True,
+                is_active=False,
                 owner=user
             )
             
+            # Schema, storefront and settings are created in the background
+            job = provisioning.submit(tenant, sample_data=True)
+            
             return Response({
                 'message': 'User registered successfully',
                 'user': UserSerializer(user).data,
@@ -48,7 +53,8 @@ class UserRegistrationView(generics.CreateAPIView):
                     'id': tenant.id,
                     'name': tenant.name,
                     'subdomain': tenant.subdomain
-                }
+                },
+                'provisioning': provisioning.serialize(job)
             }, status=status.HTTP_201_CREATED)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -2,21 +2,22 @@
 import os
 import sys
 import django
-from django.core.management import call_command
-from django.db import connection
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings_poc")
 django.setup()
 
+from django_project import provisioning  # noqa: E402  (needs django.setup())
+
 if len(sys.argv) != 2:
     print("Usage: create_tenant.py <tenant_slug>")
     sys.exit(1)
 
 tenant = sys.argv[1]
 
-with connection.cursor() as cur:
-    cur.execute(f'CREATE SCHEMA IF NOT EXISTS "{tenant}";')
+if provisioning.schema_exists(tenant):
+    print(f"Schema '{tenant}' already exists.")
+    sys.exit(1)
 
-# Run all migrations in the new schema
-call_command("migrate", "--schema", tenant, "--noinput")
+# Copy the prebuilt tenant template into the new schema
+provisioning.clone(tenant)
 print(f"✅  Tenant '{tenant}' created.") 
\ No newline at end of file
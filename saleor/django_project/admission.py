@@ -0,0 +1,138 @@
+"""
+Admission control for storefront checkout.
+
+Each tenant may run at most ``CHECKOUT_MAX_CONCURRENCY`` checkouts against
+Postgres at once. A request that gets a slot is placed inline as before.
+Once the slots are taken, or while older requests are still queued, the
+request is appended to a per-tenant Redis list and answered with a ticket.
+A single Celery drainer per tenant (``tasks.process_checkout_queue``) then
+takes queued orders in FIFO order. It hands each one to a thread pool as
+soon as it holds a slot for it, so a backlog drains at the full
+concurrency limit. Clients poll the ticket; the endpoint never blocks
+and tells them when to poll again with Retry-After.
+
+Slots are sorted-set members scored by acquisition time. A slot that a
+crashed process never released expires after ``CHECKOUT_SLOT_TTL`` seconds.
+"""
+
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .redis_client import get_redis
+
+QUEUE_KEY = 'katkat:checkout:queue:{}'
+SLOTS_KEY = 'katkat:checkout:slots:{}'
+DRAINER_KEY = 'katkat:checkout:drainer:{}'
+TICKET_KEY = 'katkat:checkout:ticket:{}'
+
+# Drop expired slots, then take one if the tenant is under its limit. With
+# respect_queue set, requests never overtake ones already waiting in line.
+ACQUIRE_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', tonumber(ARGV[1]) - tonumber(ARGV[2]))
+if ARGV[5] == '1' and redis.call('LLEN', KEYS[2]) > 0 then
+    return 0
+end
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[3]) then
+    redis.call('ZADD', KEYS[1], ARGV[1], ARGV[4])
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+
+class QueueFull(Exception):
+    pass
+
+
+def acquire_slot(schema_name, respect_queue=True):
+    """Try to take a checkout slot; returns its token or None"""
+    token = uuid.uuid4().hex
+    acquired = get_redis().eval(
+        ACQUIRE_SCRIPT, 2,
+        SLOTS_KEY.format(schema_name), QUEUE_KEY.format(schema_name),
+        time.time(), settings.CHECKOUT_SLOT_TTL, settings.CHECKOUT_MAX_CONCURRENCY,
+        token, '1' if respect_queue else '0',
+    )
+    return token if acquired else None
+
+
+def wait_for_slot(schema_name, timeout=None):
+    """Block until a slot frees up (used by the drainer, which is first in line)"""
+    deadline = time.monotonic() + (timeout or settings.CHECKOUT_SLOT_TTL)
+    while time.monotonic() < deadline:
+        token = acquire_slot(schema_name, respect_queue=False)
+        if token:
+            return token
+        time.sleep(0.05)
+    return None
+
+
+def release_slot(schema_name, token):
+    get_redis().zrem(SLOTS_KEY.format(schema_name), token)
+
+
+def _store_ticket(ticket, record):
+    get_redis().set(
+        TICKET_KEY.format(ticket),
+        json.dumps(record, cls=DjangoJSONEncoder),
+        ex=settings.CHECKOUT_TICKET_TTL,
+    )
+
+
+def enqueue(schema_name, data):
+    """Put a checkout in the tenant's queue; returns (ticket, position)"""
+    redis_client = get_redis()
+    queue_key = QUEUE_KEY.format(schema_name)
+    if redis_client.llen(queue_key) >= settings.CHECKOUT_QUEUE_MAX:
+        raise QueueFull(schema_name)
+
+    ticket = uuid.uuid4().hex
+    _store_ticket(ticket, {'schema': schema_name, 'state': 'queued', 'queued_at': time.time()})
+    position = redis_client.rpush(queue_key, json.dumps({'ticket': ticket, 'data': data}))
+    if position == 1:
+        from .tasks import process_checkout_queue
+        process_checkout_queue.delay(schema_name)
+    return ticket, position
+
+
+def pop(schema_name):
+    item = get_redis().lpop(QUEUE_KEY.format(schema_name))
+    return json.loads(item) if item else None
+
+
+def queue_length(schema_name):
+    return get_redis().llen(QUEUE_KEY.format(schema_name))
+
+
+def queued_schemas():
+    """Tenants with a non-empty checkout queue"""
+    prefix = QUEUE_KEY.format('')
+    return [key.decode()[len(prefix):] for key in get_redis().scan_iter(match=f'{prefix}*')]
+
+
+def claim_drainer(schema_name):
+    return bool(get_redis().set(DRAINER_KEY.format(schema_name), 1, nx=True, ex=settings.CHECKOUT_DRAINER_TTL))
+
+
+def refresh_drainer(schema_name):
+    get_redis().expire(DRAINER_KEY.format(schema_name), settings.CHECKOUT_DRAINER_TTL)
+
+
+def release_drainer(schema_name):
+    get_redis().delete(DRAINER_KEY.format(schema_name))
+
+
+def complete(ticket, schema_name, status, body):
+    """Record the outcome of a queued checkout"""
+    _store_ticket(ticket, {'schema': schema_name, 'state': 'done', 'status': status, 'result': body})
+
+
+def get_ticket(ticket):
+    """Current record of a ticket, or None once it has expired"""
+    raw = get_redis().get(TICKET_KEY.format(ticket))
+    return json.loads(raw) if raw is not None else None
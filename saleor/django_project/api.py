@@ -1,14 +1,25 @@
+from django.conf import settings
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from django.db import connection
-from django.db.models import Sum, Count
+from django.db import connection, transaction
+from django.db.models import Prefetch
 from django.core.serializers import serialize
+from django.utils.dateparse import parse_date, parse_datetime
 import json
-from .models import Product, Order, OrderItem
 import uuid
+from .models import Product, Order, OrderItem, CustomerCohortSnapshot
+from .events import emit_order_created, emit_status_changes
+from .idempotency import idempotent
+from .order_numbers import next_order_number
+from .pagination import decode_cursor, encode_cursor, get_page_size, keyset_page
+from . import analytics, archive, inventory, outbox, rollups, swr, uniques
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
 from decimal import Decimal
 
+MAX_BULK_STATUS_UPDATES = 1000
+
 def get_tenant_from_request(request):
     """Extract tenant from request headers or fallback to origin"""
     # Priority 1: Check for API key validation (most secure)
@@ -44,10 +55,67 @@ def set_tenant_schema(tenant):
     with connection.cursor() as cursor:
         cursor.execute(f'SET search_path TO "{tenant}", public;')
 
+def parse_date_param(value):
+    """Parse an ISO date or datetime query parameter"""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid date: {value}")
+        parsed = datetime.combine(day, time.min)
+    return parsed
+
+def transition_record(order, old_status, new_status):
+    """Describe a status change for the post-checkout pipeline"""
+    return {
+        'order_id': str(order.id),
+        'from': old_status,
+        'to': new_status,
+        'total_amount': str(order.total_amount),
+        'created_at': order.created_at.isoformat(),
+    }
+
+def serialize_order(order, include_items):
+    order_data = {
+        'id': str(order.id),
+        'order_number': order.order_number,
+        'customer_name': order.customer_name,
+        'customer_email': order.customer_email,
+        'total_amount': float(order.total_amount),
+        'status': order.status,
+        'created_at': order.created_at.isoformat(),
+    }
+    if include_items:
+        order_data['items'] = [{
+            'product_name': item.product.name,
+            'quantity': item.quantity,
+            'price': float(item.price),
+        } for item in order.items.all()]
+    return order_data
+
+def serialize_archived_order(row, include_items):
+    order_data = {
+        'id': row['id'],
+        'order_number': row['order_number'],
+        'customer_name': row['customer_name'],
+        'customer_email': row['customer_email'],
+        'total_amount': float(row['total_amount']),
+        'status': row['status'],
+        'created_at': row['created_at'].isoformat(),
+        'archived': True,
+    }
+    if include_items:
+        order_data['items'] = [{
+            'product_name': item['product_name'],
+            'quantity': item['quantity'],
+            'price': float(item['price']),
+        } for item in row.get('items', [])]
+    return order_data
+
 def add_cors_headers(response):
     response["Access-Control-Allow-Origin"] = "*"
     response["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-    response["Access-Control-Allow-Headers"] = "Content-Type, Authorization, X-Tenant-ID, X-API-Key"
+    response["Access-Control-Allow-Headers"] = "Content-Type, Authorization, X-Tenant-ID, X-API-Key, Idempotency-Key"
     return response
 
 @csrf_exempt
@@ -58,7 +126,7 @@ def get_products(request):
         tenant = get_tenant_from_request(request)
         set_tenant_schema(tenant)
         
-        products = Product.objects.filter(is_active=True)
+        products = inventory.with_stock(Product.objects.filter(is_active=True))
         products_data = []
         for product in products:
             products_data.append({
@@ -66,7 +134,7 @@ def get_products(request):
                 'name': product.name,
                 'description': product.description,
                 'price': float(product.price),
-                'stock': product.stock,
+                'stock': product.available_stock,
                 'image_url': product.image_url,
                 'created_at': product.created_at.isoformat(),
             })
@@ -86,13 +154,15 @@ def create_product(request):
         set_tenant_schema(tenant)
         
         data = json.loads(request.body)
-        product = Product.objects.create(
-            name=data['name'],
-            description=data.get('description', ''),
-            price=Decimal(data['price']),
-            stock=data.get('stock', 0),
-            image_url=data.get('image_url', ''),
-        )
+        with transaction.atomic():
+            product = Product.objects.create(
+                name=data['name'],
+                description=data.get('description', ''),
+                price=Decimal(data['price']),
+                stock=data.get('stock', 0),
+                image_url=data.get('image_url', ''),
+            )
+            outbox.record(tenant, 'product', product.id, 'product.created', outbox.product_payload(product))
         
         response = JsonResponse({
             'success': True,
@@ -119,22 +189,24 @@ def update_product(request, product_id):
         set_tenant_schema(tenant)
         
         data = json.loads(request.body)
-        product = Product.objects.get(id=product_id)
-        
-        if 'name' in data:
-            product.name = data['name']
-        if 'description' in data:
-            product.description = data['description']
-        if 'price' in data:
-            product.price = Decimal(data['price'])
-        if 'stock' in data:
-            product.stock = data['stock']
-        if 'image_url' in data:
-            product.image_url = data['image_url']
-        if 'is_active' in data:
-            product.is_active = data['is_active']
+        with transaction.atomic():
+            product = Product.objects.select_for_update().get(id=product_id)
             
-        product.save()
+            if 'name' in data:
+                product.name = data['name']
+            if 'description' in data:
+                product.description = data['description']
+            if 'price' in data:
+                product.price = Decimal(data['price'])
+            if 'stock' in data:
+                inventory.set_stock(product, data['stock'])
+            if 'image_url' in data:
+                product.image_url = data['image_url']
+            if 'is_active' in data:
+                product.is_active = data['is_active']
+                
+            product.save()
+            outbox.record(tenant, 'product', product.id, 'product.updated', outbox.product_payload(product))
         
         response = JsonResponse({
             'success': True,
@@ -143,7 +215,7 @@ def update_product(request, product_id):
                 'name': product.name,
                 'description': product.description,
                 'price': float(product.price),
-                'stock': product.stock,
+                'stock': inventory.available_stock(product),
                 'image_url': product.image_url,
                 'is_active': product.is_active,
             }
@@ -164,9 +236,11 @@ def delete_product(request, product_id):
         tenant = get_tenant_from_request(request)
         set_tenant_schema(tenant)
         
-        product = Product.objects.get(id=product_id)
-        product.is_active = False
-        product.save()
+        with transaction.atomic():
+            product = Product.objects.select_for_update().get(id=product_id)
+            product.is_active = False
+            product.save()
+            outbox.record(tenant, 'product', product.id, 'product.deleted', outbox.product_payload(product))
         
         response = JsonResponse({'success': True, 'message': 'Product deleted'})
         return add_cors_headers(response)
@@ -177,6 +251,38 @@ def delete_product(request, product_id):
         response = JsonResponse({'error': str(e)}, status=500)
         return add_cors_headers(response)
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def set_product_stock_shards(request, product_id):
+    """Split a hot product's stock across N counters (0 switches back)"""
+    try:
+        # Get tenant and set schema
+        tenant = get_tenant_from_request(request)
+        set_tenant_schema(tenant)
+        
+        data = json.loads(request.body)
+        shards = int(data['shards'])
+        product, stock = inventory.set_sharding(product_id, shards)
+        
+        response = JsonResponse({
+            'success': True,
+            'product': {
+                'id': str(product.id),
+                'stock': stock,
+                'stock_shards': product.stock_shards,
+            }
+        })
+        return add_cors_headers(response)
+    except Product.DoesNotExist:
+        response = JsonResponse({'error': 'Product not found'}, status=404)
+        return add_cors_headers(response)
+    except (KeyError, TypeError, ValueError) as e:
+        response = JsonResponse({'error': str(e)}, status=400)
+        return add_cors_headers(response)
+    except Exception as e:
+        response = JsonResponse({'error': str(e)}, status=500)
+        return add_cors_headers(response)
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def get_orders(request):
@@ -185,29 +291,100 @@ def get_orders(request):
         tenant = get_tenant_from_request(request)
         set_tenant_schema(tenant)
         
-        orders = Order.objects.all().order_by('-created_at')
-        orders_data = []
-        for order in orders:
-            items_data = []
-            for item in order.items.all():
-                items_data.append({
-                    'product_name': item.product.name,
-                    'quantity': item.quantity,
-                    'price': float(item.price),
-                })
-            
-            orders_data.append({
-                'id': str(order.id),
-                'order_number': order.order_number,
-                'customer_name': order.customer_name,
-                'customer_email': order.customer_email,
-                'total_amount': float(order.total_amount),
-                'status': order.status,
-                'created_at': order.created_at.isoformat(),
-                'items': items_data,
-            })
+        orders = Order.objects.all()
+
+        # Filters (each one is backed by an index on the orders table)
+        status = request.GET.get('status')
+        if status:
+            orders = orders.filter(status=status)
+        email = request.GET.get('email')
+        if email:
+            orders = orders.filter(customer_email=email)
+        created_after = request.GET.get('created_after')
+        if created_after:
+            created_after = parse_date_param(created_after)
+            orders = orders.filter(created_at__gte=created_after)
+        created_before = request.GET.get('created_before')
+        if created_before:
+            created_before = parse_date_param(created_before)
+            orders = orders.filter(created_at__lt=created_before)
+
+        # Line items are fetched in one extra query per page, or skipped entirely
+        include_items = request.GET.get('include_items', 'true').lower() not in ('0', 'false', 'no')
+        if include_items:
+            orders = orders.prefetch_related(
+                Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+            )
+
+        limit = get_page_size(request)
+        cursor = request.GET.get('cursor')
+        page, next_cursor = keyset_page(orders, cursor, limit)
+        orders_data = [serialize_order(order, include_items) for order in page]
+
+        # Archived orders are all older than hot ones, so once the hot table
+        # runs out the same keyset continues into the archive
+        include_archived = request.GET.get('include_archived', 'false').lower() in ('1', 'true', 'yes')
+        if include_archived and next_cursor is None:
+            if page:
+                before = (page[-1].created_at, page[-1].id)
+            else:
+                before = decode_cursor(cursor) if cursor else None
+            remaining = limit - len(page)
+            archived = archive.list_orders(
+                tenant, remaining + 1, before=before, status=status, email=email,
+                created_after=created_after, created_before=created_before,
+                include_items=include_items,
+            )
+            if len(archived) > remaining:
+                archived = archived[:remaining]
+                next_cursor = encode_cursor(archived[-1]['created_at'], archived[-1]['id'])
+            orders_data.extend(serialize_archived_order(row, include_items) for row in archived)
+
+        response = JsonResponse({
+            'orders': orders_data,
+            'pagination': {
+                'limit': limit,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None,
+            }
+        })
+        return add_cors_headers(response)
+    except ValueError as e:
+        response = JsonResponse({'error': str(e)}, status=400)
+        return add_cors_headers(response)
+    except Exception as e:
+        response = JsonResponse({'error': str(e)}, status=500)
+        return add_cors_headers(response)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def get_order(request, order_id):
+    """Get one order by id or order number, falling back to the archive"""
+    try:
+        # Get tenant and set schema
+        tenant = get_tenant_from_request(request)
+        set_tenant_schema(tenant)
+        
+        try:
+            lookup = {'id': uuid.UUID(order_id)}
+        except ValueError:
+            lookup = {'order_number': order_id}
         
-        response = JsonResponse({'orders': orders_data})
+        order = Order.objects.prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+        ).filter(**lookup).first()
+        if order is not None:
+            order_data = serialize_order(order, include_items=True)
+        else:
+            archived = archive.find_order(
+                tenant, order_id=lookup.get('id'), order_number=lookup.get('order_number')
+            )
+            if archived is None:
+                response = JsonResponse({'error': 'Order not found'}, status=404)
+                return add_cors_headers(response)
+            order_data = serialize_archived_order(archived, include_items=True)
+        
+        response = JsonResponse({'order': order_data})
         return add_cors_headers(response)
     except Exception as e:
         response = JsonResponse({'error': str(e)}, status=500)
@@ -215,6 +392,7 @@ def get_orders(request):
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@idempotent(get_tenant_from_request)
 def create_order(request):
     try:
         # Get tenant and set schema
@@ -223,28 +401,38 @@ def create_order(request):
         
         data = json.loads(request.body)
         
-        # Generate order number
-        order_number = f"ORD-{uuid.uuid4().hex[:8].upper()}"
-        
-        order = Order.objects.create(
-            order_number=order_number,
-            customer_name=data['customer_name'],
-            customer_email=data['customer_email'],
-            total_amount=Decimal(data['total_amount']),
-        )
+        # Allocate the next order number from the tenant's sequence
+        order_number = next_order_number(tenant)
         
-        # Create order items
-        for item_data in data['items']:
-            product = Product.objects.get(id=item_data['product_id'])
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                quantity=item_data['quantity'],
-                price=Decimal(item_data['price']),
+        with transaction.atomic():
+            order = Order.objects.create(
+                order_number=order_number,
+                customer_name=data['customer_name'],
+                customer_email=data['customer_email'],
+                total_amount=Decimal(data['total_amount']),
             )
-            # Update stock
-            product.stock -= item_data['quantity']
-            product.save()
+            
+            # Create order items
+            items = []
+            stock_events = []
+            for item_data in data['items']:
+                product = Product.objects.get(id=item_data['product_id'])
+                items.append(OrderItem.objects.create(
+                    order=order,
+                    product=product,
+                    quantity=item_data['quantity'],
+                    price=Decimal(item_data['price']),
+                ))
+                inventory.reserve(product, item_data['quantity'])
+                stock_events.append(('product', product.id, 'product.stock_changed', outbox.product_payload(product)))
+            
+            outbox.record_many(tenant, [
+                ('order', order.id, 'order.created', outbox.order_payload(order, items)),
+                *stock_events,
+            ])
+            
+            # Emails, counters, alerts and webhooks run in Celery after commit
+            emit_order_created(tenant, order, [item.product_id for item in items])
         
         response = JsonResponse({
             'success': True,
@@ -255,6 +443,9 @@ def create_order(request):
             }
         })
         return add_cors_headers(response)
+    except inventory.InsufficientStock as e:
+        response = JsonResponse({'error': str(e), 'product_id': str(e.product_id)}, status=409)
+        return add_cors_headers(response)
     except Exception as e:
         response = JsonResponse({'error': str(e)}, status=500)
         return add_cors_headers(response)
@@ -268,9 +459,19 @@ def update_order_status(request, order_id):
         set_tenant_schema(tenant)
         
         data = json.loads(request.body)
-        order = Order.objects.get(id=order_id)
-        order.status = data['status']
-        order.save()
+        new_status = data['status']
+        
+        with transaction.atomic():
+            order = Order.objects.select_for_update().get(id=order_id)
+            old_status = order.status
+            # Manual corrections stay possible here; only the bulk path
+            # enforces STATUS_TRANSITIONS
+            if new_status != old_status:
+                order.status = new_status
+                order.save(update_fields=['status', 'updated_at'])
+                transition = transition_record(order, old_status, new_status)
+                outbox.record(tenant, 'order', order.id, 'order.status_changed', transition)
+                emit_status_changes(tenant, [transition])
         
         response = JsonResponse({
             'success': True,
@@ -288,6 +489,151 @@ def update_order_status(request, order_id):
         response = JsonResponse({'error': str(e)}, status=500)
         return add_cors_headers(response)
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def bulk_update_order_status(request):
+    """Move many orders to new statuses with one UPDATE per target status"""
+    try:
+        # Get tenant and set schema
+        tenant = get_tenant_from_request(request)
+        set_tenant_schema(tenant)
+        
+        data = json.loads(request.body)
+        
+        # Accept either {"order_ids": [...], "status": "..."} or
+        # {"updates": [{"id": "...", "status": "..."}, ...]}
+        if 'updates' in data:
+            requested = {str(update['id']): update['status'] for update in data['updates']}
+        else:
+            requested = {str(order_id): data['status'] for order_id in data.get('order_ids', [])}
+        
+        if not requested:
+            response = JsonResponse({'error': 'No orders given'}, status=400)
+            return add_cors_headers(response)
+        if len(requested) > MAX_BULK_STATUS_UPDATES:
+            response = JsonResponse({
+                'error': f'At most {MAX_BULK_STATUS_UPDATES} orders can be updated at once'
+            }, status=400)
+            return add_cors_headers(response)
+        
+        results = {}
+        order_ids = []
+        for order_id, new_status in requested.items():
+            if new_status not in Order.STATUS_TRANSITIONS:
+                results[order_id] = {'success': False, 'error': f"Invalid status '{new_status}'"}
+                continue
+            try:
+                order_ids.append(uuid.UUID(order_id))
+            except ValueError:
+                results[order_id] = {'success': False, 'error': 'Order not found'}
+        
+        with transaction.atomic():
+            # Lock every affected row up front (in id order, to avoid deadlocks
+            # between concurrent batches) so the checks below stay valid
+            current = {
+                str(row[0]): row
+                for row in Order.objects.select_for_update().filter(
+                    id__in=order_ids
+                ).order_by('id').values_list('id', 'status', 'total_amount', 'created_at')
+            }
+            
+            by_target = defaultdict(list)
+            transitions = []
+            for order_id, new_status in requested.items():
+                if order_id in results:
+                    continue
+                if order_id not in current:
+                    results[order_id] = {'success': False, 'error': 'Order not found'}
+                    continue
+                
+                pk, old_status, total_amount, created_at = current[order_id]
+                if old_status == new_status:
+                    results[order_id] = {'success': True, 'status': new_status, 'changed': False}
+                elif not Order.can_transition(old_status, new_status):
+                    results[order_id] = {
+                        'success': False,
+                        'status': old_status,
+                        'error': f"Cannot change status from '{old_status}' to '{new_status}'",
+                    }
+                else:
+                    by_target[new_status].append(pk)
+                    transitions.append({
+                        'order_id': order_id,
+                        'from': old_status,
+                        'to': new_status,
+                        'total_amount': str(total_amount),
+                        'created_at': created_at.isoformat(),
+                    })
+                    results[order_id] = {'success': True, 'status': new_status, 'changed': True}
+            
+            now = datetime.now()
+            for new_status, ids in by_target.items():
+                Order.objects.filter(id__in=ids).update(status=new_status, updated_at=now)
+            
+            outbox.record_many(tenant, [
+                ('order', transition['order_id'], 'order.status_changed', transition)
+                for transition in transitions
+            ])
+            emit_status_changes(tenant, transitions)
+        
+        response = JsonResponse({
+            'success': all(result['success'] for result in results.values()),
+            'updated': len(transitions),
+            'results': results,
+        })
+        return add_cors_headers(response)
+    except (KeyError, TypeError, ValueError) as e:
+        response = JsonResponse({'error': f'Invalid request: {e}'}, status=400)
+        return add_cors_headers(response)
+    except Exception as e:
+        response = JsonResponse({'error': str(e)}, status=500)
+        return add_cors_headers(response)
+
+def compute_statistics():
+    """Dashboard statistics of the active tenant schema"""
+    # Total products
+    total_products = Product.objects.filter(is_active=True).count()
+    
+    # Order counts and revenue from the daily rollups
+    total_orders, total_revenue, orders_by_status = rollups.totals()
+    
+    # Recent orders
+    recent_orders = Order.objects.order_by('-created_at')[:5]
+    recent_orders_data = []
+    for order in recent_orders:
+        recent_orders_data.append({
+            'order_number': order.order_number,
+            'customer_name': order.customer_name,
+            'total_amount': float(order.total_amount),
+            'status': order.status,
+            'created_at': order.created_at.isoformat(),
+        })
+    
+    # Top selling products
+    top_products = rollups.top_products(5)
+    names = {
+        str(product_id): name
+        for product_id, name in Product.objects.filter(
+            id__in=[product_id for product_id, _ in top_products]
+        ).values_list('id', 'name')
+    }
+    
+    top_products_data = []
+    for product_id, total_sold in top_products:
+        top_products_data.append({
+            'name': names.get(str(product_id), ''),
+            'total_sold': total_sold,
+        })
+    
+    return {
+        'total_products': total_products,
+        'total_orders': total_orders,
+        'total_revenue': float(total_revenue),
+        'orders_by_status': orders_by_status,
+        'recent_orders': recent_orders_data,
+        'top_products': top_products_data,
+    }
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def get_statistics(request):
@@ -296,59 +642,124 @@ def get_statistics(request):
         tenant = get_tenant_from_request(request)
         set_tenant_schema(tenant)
         
-        # Total products
-        total_products = Product.objects.filter(is_active=True).count()
+        # Served from cache and refreshed in the background once stale
+        statistics = swr.get_or_compute(
+            f'katkat:statistics:{tenant}', tenant, compute_statistics,
+            settings.STATISTICS_CACHE_FRESH_SECONDS, settings.STATISTICS_CACHE_STALE_SECONDS,
+        )
         
-        # Total orders
-        total_orders = Order.objects.count()
+        response = JsonResponse({'statistics': statistics})
+        return add_cors_headers(response)
+    except Exception as e:
+        response = JsonResponse({'error': str(e)}, status=500)
+        return add_cors_headers(response)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def get_unique_counts(request):
+    """Approximate unique customers and storefront visitors per day and over the range"""
+    try:
+        # Get tenant and set schema
+        tenant = get_tenant_from_request(request)
+        set_tenant_schema(tenant)
         
-        # Total revenue
-        total_revenue = Order.objects.filter(status__in=['delivered', 'shipped']).aggregate(
-            total=Sum('total_amount')
-        )['total'] or Decimal('0.00')
+        try:
+            end = parse_date_param(request.GET['end']).date() if 'end' in request.GET else date.today()
+            start = parse_date_param(request.GET['start']).date() if 'start' in request.GET else end - timedelta(days=29)
+        except ValueError as e:
+            response = JsonResponse({'error': str(e)}, status=400)
+            return add_cors_headers(response)
+        if start > end or (end - start).days >= settings.UNIQUES_RETENTION_DAYS:
+            response = JsonResponse({
+                'error': f'start must be before end and at most {settings.UNIQUES_RETENTION_DAYS} days apart'
+            }, status=400)
+            return add_cors_headers(response)
         
-        # Orders by status
-        orders_by_status = Order.objects.values('status').annotate(
-            count=Count('id')
-        )
+        response = JsonResponse({
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            **uniques.counts(tenant, start, end),
+        })
+        return add_cors_headers(response)
+    except Exception as e:
+        response = JsonResponse({'error': str(e)}, status=500)
+        return add_cors_headers(response)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def get_report(request, report_name):
+    """Run a fixed analytics report against the tenant's Parquet snapshot"""
+    try:
+        # Get tenant and set schema
+        tenant = get_tenant_from_request(request)
+        set_tenant_schema(tenant)
         
-        # Recent orders
-        recent_orders = Order.objects.order_by('-created_at')[:5]
-        recent_orders_data = []
-        for order in recent_orders:
-            recent_orders_data.append({
-                'order_number': order.order_number,
-                'customer_name': order.customer_name,
-                'total_amount': float(order.total_amount),
-                'status': order.status,
-                'created_at': order.created_at.isoformat(),
-            })
+        if report_name not in analytics.REPORTS:
+            response = JsonResponse({
+                'error': f"Unknown report '{report_name}'",
+                'reports': sorted(analytics.REPORTS),
+            }, status=404)
+            return add_cors_headers(response)
         
-        # Top selling products
-        top_products = Product.objects.filter(
-            orderitem__order__status__in=['delivered', 'shipped']
-        ).annotate(
-            total_sold=Sum('orderitem__quantity')
-        ).order_by('-total_sold')[:5]
+        try:
+            end = parse_date_param(request.GET['end']) if 'end' in request.GET else datetime.now()
+            start = parse_date_param(request.GET['start']) if 'start' in request.GET else end - timedelta(days=30)
+            limit = min(max(int(request.GET.get('limit', 20)), 1), 100)
+        except ValueError as e:
+            response = JsonResponse({'error': str(e)}, status=400)
+            return add_cors_headers(response)
         
-        top_products_data = []
-        for product in top_products:
-            top_products_data.append({
-                'name': product.name,
-                'total_sold': product.total_sold or 0,
-            })
+        try:
+            columns, rows, snapshot_at = analytics.run_report(tenant, report_name, start, end, limit)
+        except analytics.SnapshotMissing:
+            response = JsonResponse({'error': 'No analytics snapshot for this tenant yet'}, status=404)
+            return add_cors_headers(response)
         
         response = JsonResponse({
-            'statistics': {
-                'total_products': total_products,
-                'total_orders': total_orders,
-                'total_revenue': float(total_revenue),
-                'orders_by_status': list(orders_by_status),
-                'recent_orders': recent_orders_data,
-                'top_products': top_products_data,
-            }
+            'report': report_name,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'snapshot_at': snapshot_at,
+            'columns': columns,
+            'rows': [list(row) for row in rows],
         })
         return add_cors_headers(response)
     except Exception as e:
         response = JsonResponse({'error': str(e)}, status=500)
-        return add_cors_headers(response) 
\ No newline at end of file
+        return add_cors_headers(response)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def get_customer_cohorts(request):
+    """Latest customer cohort snapshot, with a short trend of past runs"""
+    try:
+        # Get tenant and set schema
+        tenant = get_tenant_from_request(request)
+        set_tenant_schema(tenant)
+        
+        try:
+            history = min(max(int(request.GET.get('history', 0)), 0), settings.COHORT_SNAPSHOTS_KEPT)
+        except ValueError:
+            response = JsonResponse({'error': 'history must be an integer'}, status=400)
+            return add_cors_headers(response)
+        
+        snapshot = CustomerCohortSnapshot.objects.order_by('-computed_at').first()
+        if snapshot is None:
+            response = JsonResponse({'error': 'No cohort snapshot for this tenant yet'}, status=404)
+            return add_cors_headers(response)
+        
+        data = dict(snapshot.payload, computed_at=snapshot.computed_at.isoformat())
+        if history:
+            past = CustomerCohortSnapshot.objects.order_by('-computed_at')[:history]
+            data['history'] = [{
+                'computed_at': row.computed_at.isoformat(),
+                'customers': row.customers,
+                'repeat_purchase_rate': row.repeat_purchase_rate,
+                'average_lifetime_value': float(row.average_lifetime_value),
+            } for row in past.only('computed_at', 'customers', 'repeat_purchase_rate', 'average_lifetime_value')]
+        
+        response = JsonResponse(data)
+        return add_cors_headers(response)
+    except Exception as e:
+        response = JsonResponse({'error': str(e)}, status=500)
+        return add_cors_headers(response)
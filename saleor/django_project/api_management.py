@@ -1,8 +1,9 @@
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from django.db import connection
-from .models import Tenant, ApiKey
+from django.db import transaction
+from .models import Tenant, ApiKey, ProvisioningJob
+from . import provisioning
 import json
 from datetime import datetime, timedelta
 
@@ -17,7 +18,7 @@ def add_cors_headers(response, request=None):
         response["Access-Control-Allow-Origin"] = "*"
     
     response["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-    response["Access-Control-Allow-Headers"] = "Content-Type, Authorization, X-Tenant-ID, X-API-Key, Accept, Accept-Language, User-Agent, Referer, Origin"
+    response["Access-Control-Allow-Headers"] = "Content-Type, Authorization, X-Tenant-ID, X-API-Key, Idempotency-Key, X-Visitor-ID, Accept, Accept-Language, User-Agent, Referer, Origin"
     response["Access-Control-Allow-Credentials"] = "true"
     response["Access-Control-Max-Age"] = "86400"
     return response
@@ -30,6 +31,7 @@ def create_tenant(request):
         data = json.loads(request.body)
         tenant_name = data.get('name', '').strip()
         domain = data.get('domain', '').strip()
+        partitioned = bool(data.get('partitioned', False))
         
         if not tenant_name:
             return add_cors_headers(JsonResponse({
@@ -40,81 +42,67 @@ def create_tenant(request):
         schema_name = tenant_name.lower().replace(' ', '_').replace('-', '_')
         
         # Check if tenant already exists
-        if Tenant.objects.filter(name=tenant_name).exists():
+        existing = Tenant.objects.filter(name=tenant_name).first()
+        if existing:
+            # A repeated request for a tenant still being provisioned gets its job back
+            job = ProvisioningJob.objects.filter(tenant=existing).exclude(status='succeeded').first()
+            if job is None:
+                return add_cors_headers(JsonResponse({
+                    "error": f"Tenant '{tenant_name}' already exists"
+                }, status=400), request)
+            if job.status == 'failed' or provisioning.is_stale(job):
+                provisioning.resubmit(job)
             return add_cors_headers(JsonResponse({
-                "error": f"Tenant '{tenant_name}' already exists"
-            }, status=400), request)
-        
-        # Create tenant record
-        tenant = Tenant.objects.create(
-            name=tenant_name,
-            schema_name=schema_name,
-            domain=domain
-        )
+                "success": True,
+                "job": provisioning.serialize_job(job),
+            }, status=202), request)
         
-        # Create database schema
-        with connection.cursor() as cursor:
-            cursor.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema_name}";')
-            
-            # Set search path and create tables
-            cursor.execute(f'SET search_path TO "{schema_name}", public;')
+        with transaction.atomic():
+            # Create tenant record; the provisioning job activates it
+            tenant = Tenant.objects.create(
+                name=tenant_name,
+                schema_name=schema_name,
+                domain=domain,
+                is_active=False
+            )
             
-            # Create products table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS products (
-                    id UUID PRIMARY KEY,
-                    name VARCHAR(200),
-                    description TEXT,
-                    price DECIMAL(10,2),
-                    stock INTEGER DEFAULT 0,
-                    image_url VARCHAR(500),
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    is_active BOOLEAN DEFAULT TRUE
-                );
-            ''')
-            
-            # Create orders table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS orders (
-                    id UUID PRIMARY KEY,
-                    order_number VARCHAR(20) UNIQUE,
-                    customer_email VARCHAR(254),
-                    customer_name VARCHAR(200),
-                    total_amount DECIMAL(10,2),
-                    status VARCHAR(20) DEFAULT 'pending',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-            ''')
-            
-            # Create order_items table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS order_items (
-                    id UUID PRIMARY KEY,
-                    order_id UUID REFERENCES orders(id),
-                    product_id UUID REFERENCES products(id),
-                    quantity INTEGER,
-                    price DECIMAL(10,2)
-                );
-            ''')
-        
+            # The schema is cloned from the tenant template in the background
+            job = provisioning.submit(schema_name, tenant=tenant, partitioned=partitioned)
+
         return add_cors_headers(JsonResponse({
             "success": True,
             "tenant": {
                 "id": str(tenant.id),
                 "name": tenant.name,
                 "schema_name": tenant.schema_name,
-                "domain": tenant.domain
+                "domain": tenant.domain,
+                "partitioned": partitioned
             },
-            "message": f"Tenant '{tenant_name}' created successfully"
-        }), request)
+            "job": provisioning.serialize_job(job),
+            "message": f"Tenant '{tenant_name}' is being provisioned"
+        }, status=202), request)
         
     except Exception as e:
         return add_cors_headers(JsonResponse({
             "error": f"Failed to create tenant: {str(e)}"
         }, status=500), request)
 
+@csrf_exempt
+@require_http_methods(["GET"])
+def get_provisioning_job(request, job_id):
+    """Status of a tenant provisioning job"""
+    try:
+        job = ProvisioningJob.objects.get(id=job_id)
+    except ProvisioningJob.DoesNotExist:
+        return add_cors_headers(JsonResponse({
+            "error": "Provisioning job not found"
+        }, status=404), request)
+    
+    return add_cors_headers(JsonResponse({
+        "success": True,
+        "job": provisioning.serialize_job(job),
+    }), request)
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def generate_api_key(request):
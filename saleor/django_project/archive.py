@@ -0,0 +1,242 @@
+"""
+Cold archive for old orders.
+
+Orders older than ``ORDER_ARCHIVE_RETENTION_DAYS`` are moved out of the
+tenant's hot ``orders``/``order_items`` tables into zstd-compressed Parquet
+files under ``ARCHIVE_ROOT/<schema>/``. A ``manifest.json`` next to them
+lists every file with its row count and created_at range, so reads only
+open the files that can contain a match.
+
+Archival runs oldest first, so every archived order is older than every
+hot one. The orders listing can therefore continue its (created_at, id)
+keyset from the hot table into the archive.
+
+Files and manifest are written before the rows are deleted. If the delete
+fails, an order is briefly in both places, never in neither, and readers
+drop duplicates by id.
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+
+from .models import Order, OrderItem
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = pq = None
+
+if pa is not None:
+    ORDERS_SCHEMA = pa.schema([
+        ('id', pa.string()),
+        ('order_number', pa.string()),
+        ('customer_email', pa.string()),
+        ('customer_name', pa.string()),
+        ('total_amount', pa.decimal128(10, 2)),
+        ('status', pa.string()),
+        ('created_at', pa.timestamp('us')),
+        ('updated_at', pa.timestamp('us')),
+    ])
+    ORDER_ITEMS_SCHEMA = pa.schema([
+        ('id', pa.string()),
+        ('order_id', pa.string()),
+        ('product_id', pa.string()),
+        ('product_name', pa.string()),
+        ('quantity', pa.int32()),
+        ('price', pa.decimal128(10, 2)),
+    ])
+
+ORDER_FIELDS = ('id', 'order_number', 'customer_email', 'customer_name',
+                'total_amount', 'status', 'created_at', 'updated_at')
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImproperlyConfigured("Order archival requires the 'pyarrow' package")
+
+
+def schema_dir(schema_name):
+    return os.path.join(settings.ARCHIVE_ROOT, schema_name)
+
+
+def load_manifest(schema_name):
+    path = os.path.join(schema_dir(schema_name), 'manifest.json')
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'files': []}
+
+
+def save_manifest(schema_name, manifest):
+    path = os.path.join(schema_dir(schema_name), 'manifest.json')
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def write_parquet(rows, schema, path):
+    tmp_path = f'{path}.tmp'
+    pq.write_table(pa.Table.from_pylist(rows, schema=schema), tmp_path, compression='zstd')
+    os.replace(tmp_path, path)
+
+
+def archive_orders(schema_name, cutoff=None, batch_size=None):
+    """Move orders created before ``cutoff`` into the archive.
+
+    Must run with the tenant's search_path active. Returns the number of
+    orders archived.
+    """
+    require_pyarrow()
+    if cutoff is None:
+        cutoff = datetime.now() - timedelta(days=settings.ORDER_ARCHIVE_RETENTION_DAYS)
+    batch_size = batch_size or settings.ORDER_ARCHIVE_BATCH_SIZE
+    os.makedirs(schema_dir(schema_name), exist_ok=True)
+
+    archived = 0
+    while True:
+        with transaction.atomic():
+            orders = list(
+                Order.objects.select_for_update()
+                .filter(created_at__lt=cutoff)
+                .order_by('created_at', 'id')
+                .values(*ORDER_FIELDS)[:batch_size]
+            )
+            if not orders:
+                return archived
+
+            order_ids = [order['id'] for order in orders]
+            items = list(
+                OrderItem.objects.filter(order_id__in=order_ids).values(
+                    'id', 'order_id', 'product_id', 'product__name', 'quantity', 'price',
+                )
+            )
+
+            stamp = f"{datetime.now():%Y%m%dT%H%M%S%f}"
+            orders_file = f'orders-{stamp}.parquet'
+            items_file = f'order_items-{stamp}.parquet'
+            write_parquet(
+                [dict(order, id=str(order['id'])) for order in orders],
+                ORDERS_SCHEMA,
+                os.path.join(schema_dir(schema_name), orders_file),
+            )
+            write_parquet(
+                [{
+                    'id': str(item['id']),
+                    'order_id': str(item['order_id']),
+                    'product_id': str(item['product_id']),
+                    'product_name': item['product__name'],
+                    'quantity': item['quantity'],
+                    'price': item['price'],
+                } for item in items],
+                ORDER_ITEMS_SCHEMA,
+                os.path.join(schema_dir(schema_name), items_file),
+            )
+
+            manifest = load_manifest(schema_name)
+            manifest['files'].append({
+                'orders': orders_file,
+                'order_items': items_file,
+                'rows': len(orders),
+                'items': len(items),
+                'min_created_at': orders[0]['created_at'].isoformat(),
+                'max_created_at': orders[-1]['created_at'].isoformat(),
+                'archived_at': datetime.now().isoformat(),
+            })
+            save_manifest(schema_name, manifest)
+
+            with connection.cursor() as cursor:
+                cursor.execute('DELETE FROM order_items WHERE order_id = ANY(%s)', [order_ids])
+                cursor.execute('DELETE FROM orders WHERE id = ANY(%s)', [order_ids])
+
+        archived += len(orders)
+        if len(orders) < batch_size:
+            return archived
+
+
+def _entries(schema_name, created_after=None, created_before=None):
+    """Manifest entries that can hold orders in the given range, newest first"""
+    entries = []
+    for entry in load_manifest(schema_name)['files']:
+        if created_after and datetime.fromisoformat(entry['max_created_at']) < created_after:
+            continue
+        if created_before and datetime.fromisoformat(entry['min_created_at']) >= created_before:
+            continue
+        entries.append(entry)
+    entries.sort(key=lambda entry: entry['max_created_at'], reverse=True)
+    return entries
+
+
+def _read_items(schema_name, entry, order_ids):
+    path = os.path.join(schema_dir(schema_name), entry['order_items'])
+    items = pq.read_table(path, filters=[('order_id', 'in', list(order_ids))]).to_pylist()
+    by_order = {}
+    for item in items:
+        by_order.setdefault(item['order_id'], []).append(item)
+    return by_order
+
+
+def find_order(schema_name, order_id=None, order_number=None):
+    """Look up one archived order (with its items) by id or order number"""
+    require_pyarrow()
+    column, value = ('id', str(order_id)) if order_id else ('order_number', order_number)
+    for entry in _entries(schema_name):
+        path = os.path.join(schema_dir(schema_name), entry['orders'])
+        rows = pq.read_table(path, filters=[(column, '=', value)]).to_pylist()
+        if rows:
+            order = rows[0]
+            order['items'] = _read_items(schema_name, entry, [order['id']]).get(order['id'], [])
+            return order
+    return None
+
+
+def list_orders(schema_name, limit, before=None, status=None, email=None,
+                created_after=None, created_before=None, include_items=True):
+    """Archived orders newest first, continuing after the ``before`` keyset
+
+    ``before`` is a (created_at, id) pair like the ones in listing cursors.
+    """
+    require_pyarrow()
+    filters = []
+    if status:
+        filters.append(('status', '=', status))
+    if email:
+        filters.append(('customer_email', '=', email))
+    if created_after:
+        filters.append(('created_at', '>=', created_after))
+    if created_before:
+        filters.append(('created_at', '<', created_before))
+
+    seen = set()
+    results = []
+    for entry in _entries(schema_name, created_after, created_before):
+        if before and datetime.fromisoformat(entry['min_created_at']) > before[0]:
+            continue
+        # Stop once every remaining file is older than a full page we already have
+        if len(results) >= limit and datetime.fromisoformat(entry['max_created_at']) < results[limit - 1]['created_at']:
+            break
+
+        path = os.path.join(schema_dir(schema_name), entry['orders'])
+        rows = pq.read_table(path, filters=filters or None).to_pylist()
+        if before:
+            rows = [row for row in rows if (row['created_at'], row['id']) < (before[0], str(before[1]))]
+        if include_items and rows:
+            items = _read_items(schema_name, entry, [row['id'] for row in rows])
+            for row in rows:
+                row['items'] = items.get(row['id'], [])
+        for row in rows:
+            if row['id'] not in seen:
+                seen.add(row['id'])
+                results.append(row)
+        results.sort(key=lambda row: (row['created_at'], row['id']), reverse=True)
+
+    return results[:limit]
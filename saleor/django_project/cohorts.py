@@ -0,0 +1,163 @@
+"""
+Customer cohort, repeat-purchase and lifetime-value analytics.
+
+Orders only carry the customer's email, so customers are identified by
+normalised email. A nightly job loads each tenant's non-cancelled orders
+as column arrays. It reads the analytics Parquet snapshot when one
+exists and the orders table otherwise. Everything is then computed with
+vectorised pandas/NumPy operations:
+
+- cohorts: customers grouped by the month of their first order, with the
+  share of each cohort ordering again N months later (retention) and the
+  cumulative revenue per cohort customer (LTV curve);
+- repeat-purchase rate: share of customers with more than one order;
+- lifetime value: total revenue per customer (mean, median, p90).
+
+Each run is stored as a ``CustomerCohortSnapshot`` row; the endpoint
+serves the latest one.
+"""
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+
+from . import analytics
+from .models import CustomerCohortSnapshot
+
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:  # pragma: no cover - optional dependency
+    np = pd = None
+
+ORDERS_QUERY = '''
+    SELECT customer_email, created_at, total_amount
+    FROM orders
+    WHERE status <> 'cancelled'
+'''
+
+
+def require_pandas():
+    if pd is None:
+        raise ImproperlyConfigured("Customer cohorts require the 'pandas' and 'numpy' packages")
+
+
+def create_cohort_table(cursor):
+    """Create the customer_cohort_snapshots table in the current schema"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS customer_cohort_snapshots (
+            id BIGSERIAL PRIMARY KEY,
+            computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            customers INTEGER,
+            repeat_purchase_rate DOUBLE PRECISION,
+            average_lifetime_value DECIMAL(12,2),
+            payload JSONB
+        );
+    ''')
+
+
+def load_orders(schema_name):
+    """DataFrame of (customer_email, created_at, total_amount) for the active schema"""
+    try:
+        db = analytics.open_reports(schema_name)
+    except (analytics.SnapshotMissing, ImproperlyConfigured):
+        db = None
+    if db is not None:
+        try:
+            return db.execute(ORDERS_QUERY).df()
+        finally:
+            db.close()
+
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(ORDERS_QUERY)
+        frames = []
+        while True:
+            rows = cursor.fetchmany(settings.ANALYTICS_BATCH_SIZE)
+            if not rows:
+                break
+            frames.append(pd.DataFrame.from_records(rows, columns=['customer_email', 'created_at', 'total_amount']))
+    if not frames:
+        return pd.DataFrame(columns=['customer_email', 'created_at', 'total_amount'])
+    return pd.concat(frames, ignore_index=True)
+
+
+def compute(orders, max_months=None):
+    """Cohort metrics from an orders DataFrame; returns a JSON-ready dict"""
+    max_months = max_months or settings.COHORT_MAX_MONTHS
+    orders = orders.dropna(subset=['customer_email', 'created_at'])
+    if orders.empty:
+        return {
+            'customers': 0, 'orders': 0, 'repeat_purchase_rate': 0.0, 'orders_per_customer': 0.0,
+            'lifetime_value': {'mean': 0.0, 'median': 0.0, 'p90': 0.0},
+            'cohorts': [],
+        }
+
+    email = orders['customer_email'].str.strip().str.lower().to_numpy()
+    created = pd.to_datetime(orders['created_at']).to_numpy()
+    amount = orders['total_amount'].astype(float).to_numpy()
+
+    # Customer index per order, and months counted from year 0 for offsets
+    customer_ids, customer = np.unique(email, return_inverse=True)
+    months = created.astype('datetime64[M]').astype(np.int64)
+
+    first_month = np.full(len(customer_ids), np.iinfo(np.int64).max)
+    np.minimum.at(first_month, customer, months)
+    cohort = first_month[customer]
+    offset = months - cohort
+
+    orders_per_customer = np.bincount(customer, minlength=len(customer_ids))
+    revenue_per_customer = np.bincount(customer, weights=amount, minlength=len(customer_ids))
+
+    frame = pd.DataFrame({'customer': customer, 'cohort': cohort, 'offset': offset, 'amount': amount})
+    frame = frame[frame['offset'] < max_months]
+    span = range(min(max_months, int(months.max() - months.min()) + 1))
+    active = frame.groupby(['cohort', 'offset'])['customer'].nunique().unstack(fill_value=0).reindex(columns=span, fill_value=0)
+    revenue = frame.groupby(['cohort', 'offset'])['amount'].sum().unstack(fill_value=0.0).reindex(columns=span, fill_value=0.0)
+    sizes = pd.Series(np.bincount(first_month - first_month.min()), index=np.arange(first_month.min(), first_month.max() + 1))
+    sizes = sizes[sizes > 0]
+
+    retention = active.div(sizes[active.index], axis=0)
+    ltv_curve = revenue.cumsum(axis=1).div(sizes[revenue.index], axis=0)
+
+    cohorts = []
+    last_month = months.max()
+    for month in sizes.index:
+        # Later cohorts have had fewer months to come back; don't report future zeros
+        elapsed = min(len(span), int(last_month - month) + 1)
+        cohorts.append({
+            'cohort': str(np.datetime64(int(month), 'M')),
+            'customers': int(sizes[month]),
+            'retention': [round(float(value), 4) for value in retention.loc[month].to_numpy()[:elapsed]],
+            'revenue_per_customer': [round(float(value), 2) for value in ltv_curve.loc[month].to_numpy()[:elapsed]],
+        })
+
+    return {
+        'customers': int(len(customer_ids)),
+        'orders': int(len(email)),
+        'repeat_purchase_rate': round(float(np.mean(orders_per_customer > 1)), 4),
+        'orders_per_customer': round(float(orders_per_customer.mean()), 2),
+        'lifetime_value': {
+            'mean': round(float(revenue_per_customer.mean()), 2),
+            'median': round(float(np.median(revenue_per_customer)), 2),
+            'p90': round(float(np.percentile(revenue_per_customer, 90)), 2),
+        },
+        'cohorts': cohorts,
+    }
+
+
+def run(schema_name):
+    """Compute and store the cohort snapshot of the active tenant schema"""
+    require_pandas()
+    result = compute(load_orders(schema_name))
+    snapshot = CustomerCohortSnapshot.objects.create(
+        customers=result['customers'],
+        repeat_purchase_rate=result['repeat_purchase_rate'],
+        average_lifetime_value=Decimal(str(result['lifetime_value']['mean'])),
+        payload=result,
+    )
+    # Keep a short history for trend lines, not every run forever
+    keep = CustomerCohortSnapshot.objects.order_by('-computed_at').values_list('id', flat=True)[:settings.COHORT_SNAPSHOTS_KEPT]
+    CustomerCohortSnapshot.objects.exclude(id__in=list(keep)).delete()
+    return snapshot
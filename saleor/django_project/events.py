@@ -0,0 +1,184 @@
+"""
+Order events for the post-checkout pipeline.
+
+Checkout only performs the transactional write and then, once the
+transaction commits, pushes a small event onto a Redis list. Celery drains
+that list in batches (see ``tasks.process_order_events``) and does the slow
+work: confirmation emails, unique-customer sketches, low-stock alerts and
+webhooks.
+
+Delivery is at least once. ``pop_batch`` moves events with LMOVE onto a
+processing list instead of deleting them, and they are only removed by
+``ack`` once handled. ``retry`` parks a failed tenant's events in a
+sorted set scored by when they are due, with exponential backoff from
+``ORDER_EVENTS_RETRY_DELAY``, so a short SMTP or webhook outage is
+waited out instead of burning through the attempts. ``promote_due`` puts
+them back on the queue. After ``ORDER_EVENTS_MAX_ATTEMPTS`` they go to a
+dead-letter list, which ``manage.py requeue_order_events`` replays once
+the cause is fixed. One drainer runs at a time. Anything it finds on
+the processing list at start was left by a drainer that died, so it goes
+back on the queue.
+
+Handlers must tolerate seeing an event twice. Per-order and per-product
+side effects are claimed with SET NX, so a retried batch does not repeat
+the ones that already happened.
+"""
+
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+ORDER_EVENTS_KEY = 'katkat:order_events'
+PROCESSING_KEY = 'katkat:order_events:processing'
+DELAYED_KEY = 'katkat:order_events:delayed'
+DEAD_LETTER_KEY = 'katkat:order_events:dead'
+DRAINER_KEY = 'katkat:order_events:drainer'
+
+
+def emit(schema_name, event_type, payload):
+    """Queue an event for the pipeline once the current transaction commits"""
+    event = json.dumps({
+        'type': event_type,
+        'schema': schema_name,
+        'payload': payload,
+    }, cls=DjangoJSONEncoder)
+
+    def push():
+        try:
+            # Kick a drain when the list goes from empty to non-empty; the
+            # periodic beat task picks up anything that slips through
+            if get_redis().rpush(ORDER_EVENTS_KEY, event) == 1:
+                from .tasks import process_order_events
+                process_order_events.delay()
+        except Exception:
+            logger.exception("Failed to queue %s event for %s", event_type, schema_name)
+
+    transaction.on_commit(push)
+
+
+def emit_order_created(schema_name, order, product_ids):
+    emit(schema_name, 'order.created', {
+        'order_id': str(order.id),
+        'order_number': order.order_number,
+        'customer_email': order.customer_email,
+        'total_amount': str(order.total_amount),
+        'created_at': order.created_at.isoformat(),
+        'product_ids': [str(product_id) for product_id in product_ids],
+    })
+
+
+def emit_status_changes(schema_name, transitions):
+    """Record a batch of status transitions as a single event"""
+    if transitions:
+        emit(schema_name, 'order.status_changed', {'transitions': transitions})
+
+
+def claim_drainer():
+    return bool(get_redis().set(DRAINER_KEY, 1, nx=True, ex=settings.ORDER_EVENTS_DRAINER_TTL))
+
+
+def refresh_drainer():
+    get_redis().expire(DRAINER_KEY, settings.ORDER_EVENTS_DRAINER_TTL)
+
+
+def release_drainer():
+    get_redis().delete(DRAINER_KEY)
+
+
+def recover():
+    """Requeue events a dead drainer left unacknowledged; call holding the drainer claim"""
+    client = get_redis()
+    recovered = 0
+    while client.lmove(PROCESSING_KEY, ORDER_EVENTS_KEY, 'RIGHT', 'LEFT') is not None:
+        recovered += 1
+    if recovered:
+        logger.warning("Requeued %d unacknowledged order events", recovered)
+    return recovered
+
+
+def pop_batch(size):
+    """Move up to ``size`` events onto the processing list; returns (raw, event) pairs"""
+    pipe = get_redis().pipeline(transaction=False)
+    for _ in range(size):
+        pipe.lmove(ORDER_EVENTS_KEY, PROCESSING_KEY, 'LEFT', 'RIGHT')
+    batch = []
+    malformed = []
+    for item in pipe.execute():
+        if item is None:
+            break
+        try:
+            batch.append((item, json.loads(item)))
+        except ValueError:
+            logger.error("Dropping malformed order event: %r", item)
+            malformed.append(item)
+    ack(malformed)
+    return batch
+
+
+def ack(raw_items):
+    """Remove handled events from the processing list"""
+    if not raw_items:
+        return
+    pipe = get_redis().pipeline(transaction=False)
+    for item in raw_items:
+        pipe.lrem(PROCESSING_KEY, 1, item)
+    pipe.execute()
+
+
+def retry_delay(attempts):
+    """Seconds before the next attempt of an event that failed ``attempts`` times"""
+    return min(settings.ORDER_EVENTS_RETRY_DELAY * 2 ** (attempts - 1), settings.ORDER_EVENTS_RETRY_MAX_DELAY)
+
+
+def retry(batch):
+    """Schedule the (raw, event) pairs of a failed batch again, or dead-letter them"""
+    now = time.time()
+    pipe = get_redis().pipeline(transaction=True)
+    for item, event in batch:
+        event['attempts'] = event.get('attempts', 0) + 1
+        raw = json.dumps(event, cls=DjangoJSONEncoder)
+        if event['attempts'] < settings.ORDER_EVENTS_MAX_ATTEMPTS:
+            pipe.zadd(DELAYED_KEY, {raw: now + retry_delay(event['attempts'])})
+        else:
+            logger.error("Giving up on %s event for %s", event['type'], event['schema'])
+            pipe.rpush(DEAD_LETTER_KEY, raw)
+        pipe.lrem(PROCESSING_KEY, 1, item)
+    pipe.execute()
+
+
+def promote_due(size):
+    """Move up to ``size`` retries that are due back onto the queue"""
+    client = get_redis()
+    due = client.zrangebyscore(DELAYED_KEY, '-inf', time.time(), start=0, num=size)
+    if due:
+        pipe = client.pipeline(transaction=True)
+        pipe.rpush(ORDER_EVENTS_KEY, *due)
+        pipe.zrem(DELAYED_KEY, *due)
+        pipe.execute()
+    return len(due)
+
+
+def requeue_dead_letters(limit=None):
+    """Queue dead-lettered events again with a fresh attempt count"""
+    client = get_redis()
+    items = client.lrange(DEAD_LETTER_KEY, 0, -1 if limit is None else limit - 1)
+    for item in items:
+        try:
+            event = json.loads(item)
+        except ValueError:
+            logger.error("Leaving malformed dead-lettered event: %r", item)
+            continue
+        event['attempts'] = 0
+        pipe = client.pipeline(transaction=True)
+        pipe.rpush(ORDER_EVENTS_KEY, json.dumps(event, cls=DjangoJSONEncoder))
+        pipe.lrem(DEAD_LETTER_KEY, 1, item)
+        pipe.execute()
+    return len(items)
@@ -0,0 +1,100 @@
+"""
+Idempotency-Key support for write endpoints.
+
+The first request carrying a given key claims it in Redis and runs the view;
+its response is stored per tenant for ``IDEMPOTENCY_KEY_TTL`` seconds.
+Retries with the same key get the stored response back without running the
+view again, so a client retrying a timed-out checkout cannot create a
+second order.
+"""
+
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+
+from .api_management import add_cors_headers
+from .redis_client import get_redis
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+
+
+def idempotent(resolve_tenant):
+    """Make a POST view honour the Idempotency-Key header.
+
+    ``resolve_tenant`` maps the request to its tenant schema, which scopes
+    the keys so two tenants can never see each other's responses.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = request.META.get(HEADER)
+            if request.method != 'POST' or not key:
+                return view(request, *args, **kwargs)
+
+            if len(key) > MAX_KEY_LENGTH:
+                return add_cors_headers(JsonResponse({
+                    "error": f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters"
+                }, status=400), request)
+
+            redis_client = get_redis()
+            redis_key = f'katkat:idempotency:{resolve_tenant(request)}:{key}'
+            fingerprint = hashlib.sha256(request.path.encode() + b'\0' + request.body).hexdigest()
+
+            claimed = redis_client.set(
+                redis_key,
+                json.dumps({'state': 'processing', 'fingerprint': fingerprint}),
+                nx=True,
+                ex=settings.IDEMPOTENCY_LOCK_TTL,
+            )
+            if not claimed:
+                return replay(request, redis_client.get(redis_key), fingerprint)
+
+            try:
+                response = view(request, *args, **kwargs)
+            except Exception:
+                redis_client.delete(redis_key)
+                raise
+
+            if response.status_code >= 500:
+                # Nothing was committed, let the client retry for real
+                redis_client.delete(redis_key)
+            else:
+                redis_client.set(redis_key, json.dumps({
+                    'state': 'completed',
+                    'fingerprint': fingerprint,
+                    'status': response.status_code,
+                    'headers': dict(response.items()),
+                    'body': response.content.decode(),
+                }), ex=settings.IDEMPOTENCY_KEY_TTL)
+            return response
+        return wrapper
+    return decorator
+
+
+def replay(request, stored, fingerprint):
+    """Answer a retry from the stored record of the original request"""
+    if stored is None:
+        # The original finished with an error and released the key
+        return add_cors_headers(JsonResponse({
+            "error": "Request with this Idempotency-Key is being retried, please try again"
+        }, status=409), request)
+
+    record = json.loads(stored)
+    if record['fingerprint'] != fingerprint:
+        return add_cors_headers(JsonResponse({
+            "error": "Idempotency-Key was already used for a different request"
+        }, status=422), request)
+    if record['state'] != 'completed':
+        return add_cors_headers(JsonResponse({
+            "error": "A request with this Idempotency-Key is still being processed"
+        }, status=409), request)
+
+    response = HttpResponse(record['body'], status=record['status'])
+    for header, value in record['headers'].items():
+        response[header] = value
+    response['Idempotent-Replayed'] = 'true'
+    return response
@@ -0,0 +1,167 @@
+"""
+Stock reservations, with optional sharded counters for hot products.
+
+Every checkout of a product updates the same ``products.stock`` row, so
+during a flash sale buyers of one product queue up on that row lock. A
+product can be switched to sharded mode (``Product.stock_shards > 0``).
+Its stock then lives in N ``product_stock_shards`` rows. A reservation
+decrements one random shard and spills over to the others when that shard
+runs low. Concurrent buyers usually hit different rows, and available
+stock is the sum of the shards.
+
+Reservations are conditional UPDATEs (``quantity >= n``), so stock can no
+longer go negative or lose a concurrent decrement. Shards drift apart as
+they drain; ``rebalance`` spreads the total evenly again and runs
+periodically from ``tasks.rebalance_stock_shards``.
+"""
+
+import random
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, When
+from django.db.models.functions import Coalesce
+
+from .models import Product, ProductStockShard
+
+MAX_SHARDS = 64
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_id, requested):
+        super().__init__(f"Insufficient stock for product {product_id}")
+        self.product_id = product_id
+        self.requested = requested
+
+
+def create_stock_shard_table(cursor):
+    """Create the product_stock_shards table in the current schema"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS product_stock_shards (
+            id BIGSERIAL PRIMARY KEY,
+            product_id UUID NOT NULL REFERENCES products(id),
+            shard SMALLINT NOT NULL,
+            quantity INTEGER NOT NULL DEFAULT 0 CHECK (quantity >= 0),
+            UNIQUE (product_id, shard)
+        );
+    ''')
+
+
+def split(total, shards):
+    """Spread ``total`` over ``shards`` counters as evenly as possible"""
+    base, extra = divmod(total, shards)
+    return [base + (1 if i < extra else 0) for i in range(shards)]
+
+
+def with_stock(queryset):
+    """Annotate products with ``available_stock``, summing shards where sharded"""
+    shard_total = (
+        ProductStockShard.objects
+        .filter(product=OuterRef('pk'))
+        .values('product')
+        .annotate(total=Sum('quantity'))
+        .values('total')
+    )
+    return queryset.annotate(available_stock=Case(
+        When(stock_shards__gt=0, then=Coalesce(Subquery(shard_total), 0)),
+        default=F('stock'),
+        output_field=IntegerField(),
+    ))
+
+
+def available_stock(product):
+    if not product.stock_shards:
+        return product.stock
+    total = ProductStockShard.objects.filter(product=product).aggregate(total=Sum('quantity'))['total']
+    return total or 0
+
+
+def reserve(product, quantity):
+    """Take ``quantity`` units of ``product`` inside the current transaction"""
+    if quantity <= 0:
+        raise ValueError("Quantity must be positive")
+
+    if not product.stock_shards:
+        updated = Product.objects.filter(
+            id=product.id, stock__gte=quantity,
+        ).update(stock=F('stock') - quantity)
+        if not updated:
+            raise InsufficientStock(product.id, quantity)
+        product.refresh_from_db(fields=['stock'])
+        return
+
+    # Start at a random shard and spill over to the others when it runs low
+    shards = list(range(product.stock_shards))
+    start = random.randrange(len(shards))
+    for shard in shards[start:] + shards[:start]:
+        if ProductStockShard.objects.filter(
+            product=product, shard=shard, quantity__gte=quantity,
+        ).update(quantity=F('quantity') - quantity):
+            return
+
+    # No single shard holds enough: lock them all (in shard order, so
+    # concurrent callers cannot deadlock) and take from several
+    rows = list(ProductStockShard.objects.select_for_update().filter(product=product).order_by('shard'))
+    if sum(row.quantity for row in rows) < quantity:
+        raise InsufficientStock(product.id, quantity)
+    remaining = quantity
+    for row in rows:
+        take = min(row.quantity, remaining)
+        if take:
+            row.quantity -= take
+            row.save(update_fields=['quantity'])
+            remaining -= take
+        if not remaining:
+            return
+
+
+def set_stock(product, total):
+    """Set a product's available stock, whichever mode it is in"""
+    if not product.stock_shards:
+        product.stock = total
+        return
+    rows = list(ProductStockShard.objects.select_for_update().filter(product=product).order_by('shard'))
+    for row, quantity in zip(rows, split(total, len(rows))):
+        if row.quantity != quantity:
+            row.quantity = quantity
+            row.save(update_fields=['quantity'])
+
+
+def set_sharding(product_id, shards):
+    """Switch a product to ``shards`` counters, or back to one column with 0"""
+    if not 0 <= shards <= MAX_SHARDS:
+        raise ValueError(f"shards must be between 0 and {MAX_SHARDS}")
+
+    with transaction.atomic():
+        product = Product.objects.select_for_update().get(id=product_id)
+        total = available_stock(product)
+        ProductStockShard.objects.filter(product=product).delete()
+        if shards:
+            ProductStockShard.objects.bulk_create([
+                ProductStockShard(product=product, shard=shard, quantity=quantity)
+                for shard, quantity in enumerate(split(total, shards))
+            ])
+        # While sharded the column is not used; it holds the stock again
+        # once the product goes back to a single counter
+        product.stock = 0 if shards else total
+        product.stock_shards = shards
+        product.save(update_fields=['stock', 'stock_shards', 'updated_at'])
+    return product, total
+
+
+def rebalance(product, threshold=0.5):
+    """Even out a product's shards when the emptiest falls below ``threshold`` of the mean
+
+    Returns whether the shards were rewritten.
+    """
+    with transaction.atomic():
+        rows = list(ProductStockShard.objects.select_for_update().filter(product=product).order_by('shard'))
+        if not rows:
+            return False
+        total = sum(row.quantity for row in rows)
+        if min(row.quantity for row in rows) >= threshold * total / len(rows):
+            return False
+        for row, quantity in zip(rows, split(total, len(rows))):
+            if row.quantity != quantity:
+                row.quantity = quantity
+                row.save(update_fields=['quantity'])
+    return True
@@ -0,0 +1,52 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from django_project import uniques
+from django_project.models import Tenant
+from django_project.tenancy import tenant_schema
+
+BATCH_SIZE = 10000  # emails sent per PFADD
+
+
+class Command(BaseCommand):
+    help = "Add the customer emails of existing orders to the daily unique-customer sketches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('schemas', nargs='*', help='Tenant schemas (default: all active tenants)')
+
+    def handle(self, *args, **options):
+        schemas = options['schemas'] or list(
+            Tenant.objects.filter(is_active=True).values_list('schema_name', flat=True)
+        )
+        # Older sketches would have expired anyway
+        since = date.today() - timedelta(days=settings.UNIQUES_RETENTION_DAYS - 1)
+        for schema in schemas:
+            with tenant_schema(schema):
+                added = self.backfill(schema, since)
+            self.stdout.write(self.style.SUCCESS(
+                f"Backfilled unique customers of '{schema}' from {since}: {added} day/customer pairs"
+            ))
+
+    def backfill(self, schema, since):
+        # PFADD is idempotent, so orders the event pipeline already counted
+        # (or a second run) change nothing
+        added = 0
+        day, emails = None, []
+        with connection.chunked_cursor() as cursor:
+            cursor.execute('''
+                SELECT DISTINCT created_at::date, lower(btrim(customer_email))
+                FROM orders
+                WHERE created_at >= %s AND btrim(coalesce(customer_email, '')) <> ''
+                ORDER BY 1
+            ''', [since])
+            for row_day, email in cursor:
+                if row_day != day or len(emails) >= BATCH_SIZE:
+                    uniques.add(schema, 'customers', day, emails)
+                    day, emails = row_day, []
+                emails.append(email)
+                added += 1
+        uniques.add(schema, 'customers', day, emails)
+        return added
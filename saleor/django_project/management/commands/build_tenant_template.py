@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from django_project import provisioning
+
+
+class Command(BaseCommand):
+    help = "Build the template schemas new tenants are cloned from"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Recreate the templates even if they are at the current version',
+        )
+
+    def handle(self, *args, **options):
+        for partitioned in (False, True):
+            if options['rebuild']:
+                schema = provisioning.build_template(partitioned)
+            else:
+                schema = provisioning.ensure_template(partitioned)
+            statements = len(provisioning.template_script(partitioned).split(';\n'))
+            self.stdout.write(self.style.SUCCESS(
+                f"Template '{schema}' is at version {provisioning.TEMPLATE_VERSION} ({statements} statements)"
+            ))
@@ -0,0 +1,53 @@
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from django_project import outbox
+from django_project.archive import load_manifest
+from django_project.models import Tenant
+from django_project.rollups import create_rollup_tables, rebuild
+
+
+class Command(BaseCommand):
+    help = "Backfill the daily statistics rollups from the orders tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('schemas', nargs='*', help='Tenant schemas (default: all active tenants)')
+        parser.add_argument(
+            '--since', type=date.fromisoformat,
+            help='First day to rebuild (default: the day after the newest archived order)',
+        )
+
+    def handle(self, *args, **options):
+        schemas = options['schemas'] or list(
+            Tenant.objects.filter(is_active=True).values_list('schema_name', flat=True)
+        )
+        for schema in schemas:
+            since = options['since'] or self.first_unarchived_day(schema)
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f'SET LOCAL search_path TO "{schema}", public;')
+                create_rollup_tables(cursor)
+                # Writers and the relay wait for the rebuild
+                outbox.lock_relay(cursor, schema, wait=True)
+                cursor.execute('LOCK TABLE orders, daily_order_stats, daily_product_sales IN SHARE ROW EXCLUSIVE MODE;')
+                # Orders the rebuild counts must not be counted again when
+                # their events are relayed, so publish those events now
+                while outbox.relay_batch(schema, settings.OUTBOX_BATCH_SIZE, apply_rollups=False):
+                    pass
+                written = rebuild(cursor, since)
+
+            scope = f"from {since}" if since else "for all days"
+            self.stdout.write(self.style.SUCCESS(
+                f"Rebuilt rollups of '{schema}' {scope}: {written} day/status rows"
+            ))
+
+    def first_unarchived_day(self, schema):
+        # Archived orders are gone from the hot tables, so days they cover
+        # keep the rollups they already have
+        files = load_manifest(schema)['files']
+        if not files:
+            return None
+        newest = max(datetime.fromisoformat(entry['max_created_at']) for entry in files)
+        return newest.date() + timedelta(days=1)
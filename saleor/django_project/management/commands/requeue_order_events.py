@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from django_project import events
+
+
+class Command(BaseCommand):
+    help = "Queue dead-lettered order events for another round of attempts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, help='Requeue at most this many events (oldest first)')
+
+    def handle(self, *args, **options):
+        requeued = events.requeue_dead_letters(options['limit'])
+        if requeued:
+            from django_project.tasks import process_order_events
+            process_order_events.delay()
+        self.stdout.write(self.style.SUCCESS(f"Requeued {requeued} dead-lettered order events"))
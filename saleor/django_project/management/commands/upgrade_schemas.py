@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from django_project.models import Tenant
+from django_project.upgrades import upgrade_public, upgrade_tenant
+
+
+class Command(BaseCommand):
+    help = "Add new columns and tables to the public tables and every tenant schema"
+
+    def add_arguments(self, parser):
+        parser.add_argument('schemas', nargs='*', help='Tenant schemas (default: all tenants)')
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), connection.cursor() as cursor:
+            upgrade_public(cursor)
+        self.stdout.write("Upgraded the public tables")
+
+        schemas = options['schemas'] or list(Tenant.objects.values_list('schema_name', flat=True))
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT nspname FROM pg_namespace WHERE nspname = ANY(%s)', [schemas])
+            existing = {row[0] for row in cursor.fetchall()}
+        failed = []
+        for schema in schemas:
+            if schema not in existing:
+                self.stdout.write(self.style.WARNING(f"Skipping '{schema}': no such schema"))
+                continue
+            try:
+                # One transaction per schema, so a broken tenant does not hold back the rest
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.execute(f'SET LOCAL search_path TO "{schema}", public;')
+                    upgrade_tenant(cursor)
+            except Exception as e:
+                self.stderr.write(f"Failed to upgrade '{schema}': {e}")
+                failed.append(schema)
+
+        if failed:
+            raise CommandError(f"{len(failed)} schemas failed: {', '.join(failed[:10])}")
+        self.stdout.write(self.style.SUCCESS(f"Upgraded {len(schemas)} tenant schemas"))
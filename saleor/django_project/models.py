@@ -4,6 +4,7 @@ import hashlib
 import secrets
 from datetime import datetime, timedelta
 import json
+from .ids import uuid7
 
 class Tenant(models.Model):
     """Tenant model for managing multi-tenancy"""
@@ -64,6 +65,11 @@ class TenantStorefront(models.Model):
     require_account_creation = models.BooleanField(default=False)
     enable_coupons = models.BooleanField(default=False)
     enable_gift_cards = models.BooleanField(default=False)
+    order_number_prefix = models.CharField(max_length=8, default='ORD-')
+    
+    # Post-checkout notifications
+    order_confirmation_email = models.BooleanField(default=True)
+    webhook_url = models.URLField(blank=True)
     
     # Custom CSS/JS
     custom_css = models.TextField(blank=True)
@@ -127,7 +133,8 @@ class TenantStorefront(models.Model):
                 'guest_checkout': self.enable_guest_checkout,
                 'require_account': self.require_account_creation,
                 'coupons': self.enable_coupons,
-                'gift_cards': self.enable_gift_cards
+                'gift_cards': self.enable_gift_cards,
+                'order_number_prefix': self.order_number_prefix
             }
         }
 
@@ -185,12 +192,35 @@ class ApiKey(models.Model):
         except cls.DoesNotExist:
             return None
 
-class Product(models.Model):
+class ProvisioningJob(models.Model):
+    """Asynchronous tenant provisioning job (see provisioning.py)"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='provisioning_jobs', null=True, blank=True)
+    schema_name = models.CharField(max_length=63)
+    options = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, default='pending')  # pending, running, succeeded, failed
+    steps = models.JSONField(default=list, blank=True)  # completed steps, in order
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'tenant_provisioning_jobs'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.schema_name} provisioning ({self.status})"
+
+class Product(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     name = models.CharField(max_length=200)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.IntegerField(default=0)
+    # Number of ProductStockShard counters holding the stock; 0 uses `stock`
+    stock_shards = models.IntegerField(default=0)
     image_url = models.URLField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -202,6 +232,20 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+class ProductStockShard(models.Model):
+    """One of the counters a hot product's stock is split across"""
+    id = models.BigAutoField(primary_key=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_shard_set')
+    shard = models.SmallIntegerField()
+    quantity = models.IntegerField(default=0)
+    
+    class Meta:
+        db_table = 'product_stock_shards'
+        unique_together = [('product', 'shard')]
+    
+    def __str__(self):
+        return f"{self.product_id}#{self.shard}: {self.quantity}"
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -211,7 +255,16 @@ class Order(models.Model):
         ('cancelled', 'Cancelled'),
     ]
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Allowed moves through the order lifecycle; delivered and cancelled are final
+    STATUS_TRANSITIONS = {
+        'pending': ('processing', 'shipped', 'cancelled'),
+        'processing': ('shipped', 'cancelled'),
+        'shipped': ('delivered',),
+        'delivered': (),
+        'cancelled': (),
+    }
+    
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     order_number = models.CharField(max_length=20, unique=True)
     customer_email = models.EmailField()
     customer_name = models.CharField(max_length=200)
@@ -222,12 +275,23 @@ class Order(models.Model):
     
     class Meta:
         db_table = 'orders'
-    
+        indexes = [
+            # Keyset pagination and the status/email filters on the orders listing
+            models.Index(fields=['-created_at', '-id'], name='orders_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='orders_status_created_idx'),
+            models.Index(fields=['customer_email', '-created_at', '-id'], name='orders_email_created_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.order_number}"
+    
+    @classmethod
+    def can_transition(cls, from_status, to_status):
+        """Check whether an order may move from one status to another"""
+        return to_status in cls.STATUS_TRANSITIONS.get(from_status, ())
 
 class OrderItem(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.IntegerField()
@@ -237,4 +301,39 @@ class OrderItem(models.Model):
         db_table = 'order_items'
     
     def __str__(self):
-        return f"{self.quantity}x {self.product.name}" 
\ No newline at end of file
+        return f"{self.quantity}x {self.product.name}" 
+
+class OutboxEvent(models.Model):
+    """Change event written in the same transaction as the change itself"""
+    id = models.BigAutoField(primary_key=True)
+    aggregate_type = models.CharField(max_length=20)  # 'product' or 'order'
+    aggregate_id = models.CharField(max_length=64)
+    event_type = models.CharField(max_length=50)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    published_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'outbox_events'
+        indexes = [
+            models.Index(fields=['id'], name='outbox_unpublished_idx',
+                         condition=models.Q(published_at__isnull=True)),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} {self.aggregate_id}"
+
+class CustomerCohortSnapshot(models.Model):
+    """Result of one run of the customer cohort job (see cohorts.py)"""
+    id = models.BigAutoField(primary_key=True)
+    computed_at = models.DateTimeField(auto_now_add=True)
+    customers = models.IntegerField()
+    repeat_purchase_rate = models.FloatField()
+    average_lifetime_value = models.DecimalField(max_digits=12, decimal_places=2)
+    payload = models.JSONField()
+    
+    class Meta:
+        db_table = 'customer_cohort_snapshots'
+    
+    def __str__(self):
+        return f"Cohorts at {self.computed_at}"
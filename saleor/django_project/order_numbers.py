@@ -0,0 +1,99 @@
+"""
+Per-tenant order number allocation.
+
+Every tenant schema owns an ``order_number_seq`` sequence, so numbers are
+unique and increasing within a tenant and inserts into the unique
+``orders.order_number`` index always land on its right-most page.
+
+With ``ORDER_NUMBER_BLOCK_SIZE`` > 1 the sequence increments by the block
+size and each worker process hands out the numbers of a block from memory,
+so only one ``nextval`` round trip is paid per block. Numbers stay unique;
+they are only increasing per process and gaps appear when a worker exits.
+"""
+
+import re
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.utils import ProgrammingError
+
+SEQUENCE_NAME = 'order_number_seq'
+DEFAULT_PREFIX = 'ORD-'
+# Fits TenantStorefront.order_number_prefix and is safe in URLs, emails and CSV exports
+PREFIX_PATTERN = re.compile(r'[A-Za-z0-9_-]{0,8}')
+
+_blocks = {}
+_blocks_lock = threading.Lock()
+
+
+def get_block_size():
+    return max(1, int(getattr(settings, 'ORDER_NUMBER_BLOCK_SIZE', 1)))
+
+
+def create_sequence(cursor, block_size=None):
+    """Create the order number sequence in the current search_path schema"""
+    block_size = int(block_size or get_block_size())
+    cursor.execute(
+        f'CREATE SEQUENCE IF NOT EXISTS {SEQUENCE_NAME} '
+        f'INCREMENT BY {block_size} MINVALUE 1 START WITH 1;'
+    )
+
+
+def _fetch_block():
+    """Return (first, last) of a freshly reserved block of numbers"""
+    query = (
+        f"SELECT nextval('{SEQUENCE_NAME}'), seqincrement "
+        f"FROM pg_sequence WHERE seqrelid = '{SEQUENCE_NAME}'::regclass"
+    )
+    try:
+        # Savepoint so a missing sequence does not abort an outer transaction
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(query)
+                start, increment = cursor.fetchone()
+    except ProgrammingError:
+        # Tenant schemas created before sequences existed get one lazily
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                create_sequence(cursor)
+                cursor.execute(query)
+                start, increment = cursor.fetchone()
+    return start, start + increment - 1
+
+
+def next_number(schema_name):
+    """Allocate the next order number for the tenant whose schema is active"""
+    with _blocks_lock:
+        block = _blocks.get(schema_name)
+        if block and block[0] <= block[1]:
+            number = block[0]
+            block[0] += 1
+            return number
+
+    start, end = _fetch_block()
+    if start < end:
+        with _blocks_lock:
+            _blocks[schema_name] = [start + 1, end]
+    return start
+
+
+def is_valid_prefix(prefix):
+    return isinstance(prefix, str) and PREFIX_PATTERN.fullmatch(prefix) is not None
+
+
+def get_prefix(schema_name):
+    """Look up the tenant's configured order number prefix"""
+    from .models import TenantStorefront
+
+    prefix = TenantStorefront.objects.filter(
+        tenant__schema_name=schema_name
+    ).values_list('order_number_prefix', flat=True).first()
+    return DEFAULT_PREFIX if prefix is None else prefix
+
+
+def next_order_number(schema_name, prefix=None):
+    """Return a formatted order number such as ``ORD-000042``"""
+    if prefix is None:
+        prefix = get_prefix(schema_name)
+    return f"{prefix}{next_number(schema_name):06d}"
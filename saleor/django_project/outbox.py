@@ -0,0 +1,240 @@
+"""
+Transactional outbox for product and order changes.
+
+Views call ``record``/``record_many`` inside the transaction that changes
+the data, so an event exists exactly when its change committed. The relay
+(``tasks.relay_outbox``) publishes pending rows in id order and in batches
+to a Redis stream per tenant (``katkat:outbox:<schema>``), or to JSON-lines
+files when ``OUTBOX_SINK = 'file'``. Published rows are pruned after
+``OUTBOX_RETENTION_HOURS``.
+
+Committed writes also add the schema to a Redis set, so the relay only
+visits tenants that have something to publish.
+
+Publication order is id order, which is the order ids were allocated in,
+not commit order. A transaction that took a lower id can commit after a
+higher id was already published, and its event then follows later.
+Consumers must tolerate reordering. Events are keyed by aggregate id,
+and product payloads carry ``updated_at`` for discarding stale snapshots.
+
+After each batch the relay also publishes the events, plus an order/revenue
+delta, on ``katkat:live:<schema>`` for the backend's live dashboard stream.
+"""
+
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+
+from . import inventory, rollups
+from .models import OutboxEvent
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+DIRTY_SCHEMAS_KEY = 'katkat:outbox:dirty'
+LIVE_CHANNEL_PREFIX = 'katkat:live:'
+
+
+def _json(value):
+    # Round-trip through the Django encoder so Decimals, UUIDs and datetimes
+    # are stored as plain JSON values
+    return json.loads(json.dumps(value, cls=DjangoJSONEncoder))
+
+
+def create_outbox_table(cursor):
+    """Create the outbox_events table in the current schema"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS outbox_events (
+            id BIGSERIAL PRIMARY KEY,
+            aggregate_type VARCHAR(20),
+            aggregate_id VARCHAR(64),
+            event_type VARCHAR(50),
+            payload JSONB,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            published_at TIMESTAMP NULL
+        );
+        CREATE INDEX IF NOT EXISTS outbox_unpublished_idx
+            ON outbox_events (id) WHERE published_at IS NULL;
+    ''')
+
+
+def _mark_dirty(schema_name):
+    def push():
+        try:
+            # Kick the relay when the first tenant gets flagged; the periodic
+            # sweep catches anything that slips through
+            if get_redis().sadd(DIRTY_SCHEMAS_KEY, schema_name):
+                from .tasks import relay_outbox
+                relay_outbox.delay()
+        except Exception:
+            logger.exception("Failed to flag outbox of %s", schema_name)
+
+    transaction.on_commit(push)
+
+
+def record(schema_name, aggregate_type, aggregate_id, event_type, payload):
+    """Add one event to the outbox of the active tenant schema"""
+    OutboxEvent.objects.create(
+        aggregate_type=aggregate_type,
+        aggregate_id=str(aggregate_id),
+        event_type=event_type,
+        payload=_json(payload),
+    )
+    _mark_dirty(schema_name)
+
+
+def record_many(schema_name, events):
+    """Add several (aggregate_type, aggregate_id, event_type, payload) events in one INSERT"""
+    if not events:
+        return
+    OutboxEvent.objects.bulk_create([
+        OutboxEvent(
+            aggregate_type=aggregate_type,
+            aggregate_id=str(aggregate_id),
+            event_type=event_type,
+            payload=_json(payload),
+        )
+        for aggregate_type, aggregate_id, event_type, payload in events
+    ])
+    _mark_dirty(schema_name)
+
+
+def product_payload(product):
+    return {
+        'id': product.id,
+        'name': product.name,
+        'description': product.description,
+        'price': product.price,
+        'stock': inventory.available_stock(product),
+        'image_url': product.image_url,
+        'is_active': product.is_active,
+        'updated_at': product.updated_at,
+    }
+
+
+def order_payload(order, items):
+    return {
+        'id': order.id,
+        'order_number': order.order_number,
+        'customer_name': order.customer_name,
+        'customer_email': order.customer_email,
+        'total_amount': order.total_amount,
+        'status': order.status,
+        'created_at': order.created_at,
+        'items': [{
+            'product_id': item.product_id,
+            'quantity': item.quantity,
+            'price': item.price,
+        } for item in items],
+    }
+
+
+def publish(schema_name, events):
+    """Send a batch of outbox rows to the configured sink"""
+    if settings.OUTBOX_SINK == 'file':
+        directory = os.path.join(settings.OUTBOX_FILE_ROOT, schema_name)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{datetime.now():%Y-%m-%d}.jsonl')
+        with open(path, 'a') as f:
+            for event in events:
+                f.write(json.dumps(event, cls=DjangoJSONEncoder) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        return
+
+    pipe = get_redis().pipeline(transaction=False)
+    stream = f'katkat:outbox:{schema_name}'
+    for event in events:
+        pipe.xadd(stream, {
+            'id': event['id'],
+            'type': event['event_type'],
+            'aggregate_type': event['aggregate_type'],
+            'aggregate_id': event['aggregate_id'],
+            'payload': json.dumps(event['payload']),
+            'created_at': event['created_at'].isoformat(),
+        }, maxlen=settings.OUTBOX_STREAM_MAXLEN, approximate=True)
+    pipe.execute()
+
+
+def publish_live(schema_name, events):
+    """Push a batch to open dashboards (backend core.live); best effort"""
+    created = [event for event in events if event['event_type'] == 'order.created']
+    messages = [
+        {'type': event['event_type'], 'id': event['aggregate_id'], 'data': event['payload']}
+        for event in events
+    ]
+    if created:
+        messages.append({
+            'type': 'stats.delta',
+            'orders': len(created),
+            'revenue': str(sum(Decimal(event['payload']['total_amount']) for event in created)),
+        })
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for message in messages:
+            pipe.publish(f'{LIVE_CHANNEL_PREFIX}{schema_name}', json.dumps(message, cls=DjangoJSONEncoder))
+        pipe.execute()
+    except Exception:
+        logger.exception("Failed to push live events for %s", schema_name)
+
+
+def relay_batch(schema_name, batch_size, apply_rollups=True):
+    """Publish one batch of pending events inside the caller's transaction; returns it"""
+    events = list(
+        OutboxEvent.objects
+        .filter(published_at__isnull=True)
+        .order_by('id')
+        .values('id', 'aggregate_type', 'aggregate_id', 'event_type', 'payload', 'created_at')
+        [:batch_size]
+    )
+    if not events:
+        return events
+    if apply_rollups:
+        # Committed with published_at, so each event is counted once
+        rollups.apply_events(events)
+    publish(schema_name, events)
+    OutboxEvent.objects.filter(
+        id__in=[event['id'] for event in events]
+    ).update(published_at=datetime.now())
+    return events
+
+
+def lock_relay(cursor, schema_name, wait=False):
+    """Take the tenant's relay lock for this transaction; False if another relay has it"""
+    if wait:
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [f'outbox:{schema_name}'])
+        return True
+    cursor.execute("SELECT pg_try_advisory_xact_lock(hashtext(%s))", [f'outbox:{schema_name}'])
+    return cursor.fetchone()[0]
+
+
+def relay(schema_name, batch_size=None):
+    """Publish pending events of the active schema; returns how many were sent"""
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    sent = 0
+    while True:
+        with transaction.atomic():
+            # One relay per tenant at a time, so no event is published twice
+            with connection.cursor() as cursor:
+                if not lock_relay(cursor, schema_name):
+                    return sent
+            events = relay_batch(schema_name, batch_size)
+            if not events:
+                return sent
+        publish_live(schema_name, events)
+        sent += len(events)
+        if len(events) < batch_size:
+            return sent
+
+
+def prune():
+    """Delete events of the active schema published before the retention window"""
+    cutoff = datetime.now() - timedelta(hours=settings.OUTBOX_RETENTION_HOURS)
+    deleted, _ = OutboxEvent.objects.filter(published_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,66 @@
+import base64
+import json
+import uuid
+
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we did not issue"""
+
+
+def get_page_size(request, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Read ?limit= from the request, clamped to [1, maximum]"""
+    try:
+        limit = int(request.GET.get('limit', default))
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, maximum))
+
+
+def encode_cursor(created_at, pk):
+    """Build an opaque cursor pointing just after the given (created_at, id) row"""
+    payload = json.dumps([created_at.isoformat(), str(pk)])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the (created_at, id) pair stored in a cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        created_at = parse_datetime(created_at)
+        pk = uuid.UUID(pk)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+    if created_at is None:
+        raise InvalidCursor('Invalid cursor')
+    return created_at, pk
+
+
+def keyset_page(queryset, cursor, limit, table='orders'):
+    """
+    Return one page of a queryset ordered newest first, plus the cursor of
+    the next page (or None).
+
+    Uses a row comparison on (created_at, id) so Postgres can walk the
+    (created_at DESC, id DESC) index instead of counting past an OFFSET.
+    """
+    queryset = queryset.order_by('-created_at', '-id')
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.extra(
+            where=[f'("{table}"."created_at", "{table}"."id") < (%s, %s)'],
+            params=[created_at, pk],
+        )
+
+    rows = list(queryset[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return rows, next_cursor
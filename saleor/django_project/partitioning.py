@@ -0,0 +1,166 @@
+"""
+DDL for the per-tenant ``orders`` and ``order_items`` tables.
+
+High-volume tenants can have both tables range partitioned by month on
+``created_at``. Each month is then a separate table, so vacuum and index
+maintenance work on small pieces, date-filtered queries only scan the
+matching months, and old months can be detached or dropped in one step.
+
+Postgres requires the partition key in every unique constraint, so the
+partitioned tables use (id, created_at) as primary key and order_items
+carries its own created_at. order_items.order_id is not a foreign key in
+that layout. Order numbers stay unique because they come from the tenant's
+sequence.
+"""
+
+from datetime import date
+
+from django.conf import settings
+from django.db import connection
+
+PARTITIONED_TABLES = ('orders', 'order_items')
+
+
+def create_order_tables(cursor, partitioned=False, suffix=''):
+    """Create the orders and order_items tables in the current schema"""
+    if not partitioned:
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS orders{suffix} (
+                id UUID PRIMARY KEY,
+                order_number VARCHAR(20) UNIQUE,
+                customer_email VARCHAR(254),
+                customer_name VARCHAR(200),
+                total_amount DECIMAL(10,2),
+                status VARCHAR(20) DEFAULT 'pending',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        ''')
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS order_items{suffix} (
+                id UUID PRIMARY KEY,
+                order_id UUID REFERENCES orders{suffix}(id),
+                product_id UUID REFERENCES products(id),
+                quantity INTEGER,
+                price DECIMAL(10,2)
+            );
+        ''')
+        return
+
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS orders{suffix} (
+            id UUID NOT NULL,
+            order_number VARCHAR(20),
+            customer_email VARCHAR(254),
+            customer_name VARCHAR(200),
+            total_amount DECIMAL(10,2),
+            status VARCHAR(20) DEFAULT 'pending',
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, created_at),
+            UNIQUE (order_number, created_at)
+        ) PARTITION BY RANGE (created_at);
+    ''')
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS order_items{suffix} (
+            id UUID NOT NULL,
+            order_id UUID NOT NULL,
+            product_id UUID REFERENCES products(id),
+            quantity INTEGER,
+            price DECIMAL(10,2),
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at);
+    ''')
+    for table in PARTITIONED_TABLES:
+        # Catches rows outside every monthly partition instead of failing the insert
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table}{suffix} DEFAULT;'
+        )
+
+
+def create_order_indexes(cursor):
+    """Indexes for the paginated orders listing and its filters"""
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS orders_created_idx
+            ON orders (created_at DESC, id DESC);
+        CREATE INDEX IF NOT EXISTS orders_status_created_idx
+            ON orders (status, created_at DESC, id DESC);
+        CREATE INDEX IF NOT EXISTS orders_email_created_idx
+            ON orders (customer_email, created_at DESC, id DESC);
+        CREATE INDEX IF NOT EXISTS order_items_order_id_idx
+            ON order_items (order_id);
+    ''')
+
+
+def add_months(day, months):
+    """First day of the month ``months`` after the month of ``day``"""
+    years, month = divmod(day.month - 1 + months, 12)
+    return date(day.year + years, month + 1, 1)
+
+
+def create_partition(cursor, table, month, suffix=''):
+    """Create the partition of ``table`` holding the month starting at ``month``
+
+    If rows of that month already landed in the default partition (because
+    partition maintenance fell behind), Postgres refuses the new partition.
+    The default is then detached, the partition created, the month's rows
+    moved into it and the default attached again, all in the caller's
+    transaction.
+    """
+    name = f'{table}_p{month:%Y_%m}'
+    bounds = [month.isoformat(), add_months(month, 1).isoformat()]
+    cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [name])
+    if cursor.fetchone()[0]:
+        return
+
+    default = f'{table}_default'
+    cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {default} WHERE created_at >= %s AND created_at < %s)', bounds)
+    stranded = cursor.fetchone()[0]
+    if stranded:
+        cursor.execute(f'ALTER TABLE {table}{suffix} DETACH PARTITION {default};')
+    cursor.execute(
+        f"CREATE TABLE {name} PARTITION OF {table}{suffix} "
+        f"FOR VALUES FROM ('{bounds[0]}') TO ('{bounds[1]}');"
+    )
+    if stranded:
+        cursor.execute(f'''
+            WITH moved AS (
+                DELETE FROM {default} WHERE created_at >= %s AND created_at < %s RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved;
+        ''', bounds)
+        cursor.execute(f'ALTER TABLE {table}{suffix} ATTACH PARTITION {default} DEFAULT;')
+
+
+def ensure_partitions(cursor, months_ahead=None, start=None, suffix=''):
+    """Create monthly partitions from ``start`` (default: this month) onwards"""
+    if months_ahead is None:
+        months_ahead = settings.ORDER_PARTITION_MONTHS_AHEAD
+    first = add_months(start or date.today(), 0)
+    last = add_months(date.today(), months_ahead)
+
+    month = first
+    while month <= last:
+        for table in PARTITIONED_TABLES:
+            create_partition(cursor, table, month, suffix)
+        month = add_months(month, 1)
+
+
+def partitioned_schemas():
+    """Schemas whose orders table is partitioned"""
+    with connection.cursor() as cursor:
+        cursor.execute('''
+            SELECT n.nspname
+            FROM pg_partitioned_table p
+            JOIN pg_class c ON c.oid = p.partrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE c.relname = 'orders'
+        ''')
+        return [row[0] for row in cursor.fetchall()]
+
+
+def is_partitioned(cursor):
+    """Whether the orders table on the current search_path is partitioned"""
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = 'orders'::regclass")
+    return cursor.fetchone()[0] == 'p'
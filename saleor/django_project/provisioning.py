@@ -0,0 +1,535 @@
+"""
+Tenant provisioning by cloning a template schema.
+
+Creating a tenant used to run the full tenant DDL, or ``migrate``, inside
+the signup request. Instead, a template schema holding every tenant table,
+index, sequence and any seed rows is built once per ``TEMPLATE_VERSION``.
+It is built by the ``build_tenant_template`` command at deploy, or lazily
+on first use. Its structure is read back from the catalog into a script of
+schema-agnostic statements. The script is cached per process, and a new
+tenant is created by running it under the new schema's search_path in a
+single round trip.
+
+Partitioned tenants have their own template because their orders tables
+differ. Bump ``TEMPLATE_VERSION`` whenever ``create_tenant_tables``
+changes, and the next provisioning call rebuilds the template.
+
+Tenant creation endpoints do not provision inline. They record a
+``ProvisioningJob`` and return its id, and ``tasks.provision_tenant``
+runs ``run_job`` on the ``provisioning`` queue. A job's steps (schema,
+storefront config, sample data) each check what already exists, so
+redelivered or retried jobs are safe to run again.
+
+The backend's signup jobs are stored in the backend's own database, so
+they are not ``ProvisioningJob`` rows here. The backend sends
+``tasks.provision_schema`` the job id, schema name and options, and only
+``provision_schema`` runs for it. The outcome goes back to the backend
+through ``report_back``, as a task on ``BACKEND_TASK_QUEUE``.
+
+Signup spikes should not wait on DDL either, so ``tasks.replenish_tenant_pool``
+keeps a warm pool of unassigned clones (``TENANT_POOL_SIZE`` per kind).
+Each is named ``TENANT_POOL_PREFIX<hex>`` and labelled with its template
+version in the schema COMMENT. ``run_job`` claims one and renames it to
+the tenant's schema name in its own transaction. A per-schema advisory
+lock makes concurrent jobs skip each other's claims. The job only clones
+inline when the pool is empty. Pooled schemas of an older template are
+dropped, never handed out.
+"""
+
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from celery import current_app
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cohorts import create_cohort_table
+from .inventory import create_stock_shard_table
+from .models import Product, ProvisioningJob, Tenant, TenantStorefront
+from .order_numbers import create_sequence
+from .outbox import create_outbox_table
+from .partitioning import create_order_indexes, create_order_tables, ensure_partitions
+from .rollups import create_rollup_tables
+from .tenancy import tenant_schema
+
+TEMPLATE_VERSION = 1
+
+# Backend task that records the outcome of a backend job's schema work
+BACKEND_RESULT_TASK = 'tenants.tasks.schema_provisioned'
+
+_scripts = {}
+
+
+def template_schema(partitioned=False):
+    name = settings.TENANT_TEMPLATE_SCHEMA
+    return f'{name}_partitioned' if partitioned else name
+
+
+def create_tenant_tables(cursor, partitioned=False):
+    """Create every tenant table in the current search_path schema"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS products (
+            id UUID PRIMARY KEY,
+            name VARCHAR(200),
+            description TEXT,
+            price DECIMAL(10,2),
+            stock INTEGER DEFAULT 0,
+            stock_shards INTEGER DEFAULT 0,
+            image_url VARCHAR(500),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_active BOOLEAN DEFAULT TRUE
+        );
+    ''')
+
+    # Stock counters for products in sharded mode
+    create_stock_shard_table(cursor)
+
+    # Create orders and order_items tables, optionally partitioned
+    # by month for high-volume tenants
+    create_order_tables(cursor, partitioned=partitioned)
+    if partitioned:
+        ensure_partitions(cursor)
+    create_order_indexes(cursor)
+
+    # Per-tenant sequence that order numbers are allocated from
+    create_sequence(cursor)
+
+    # Outbox of product and order changes for downstream consumers
+    create_outbox_table(cursor)
+
+    # Daily rollups read by the statistics endpoint
+    create_rollup_tables(cursor)
+
+    # Nightly customer cohort snapshots
+    create_cohort_table(cursor)
+
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def schema_exists(schema_name):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_namespace WHERE nspname = %s', [schema_name])
+        return cursor.fetchone() is not None
+
+
+def template_version(cursor, schema):
+    """Version recorded on a template schema, or None if it does not exist"""
+    cursor.execute("SELECT obj_description(oid, 'pg_namespace') FROM pg_namespace WHERE nspname = %s", [schema])
+    row = cursor.fetchone()
+    if row is None or not (row[0] or '').isdigit():
+        return None
+    return int(row[0])
+
+
+def build_template(partitioned=False):
+    """(Re)create a template schema from the tenant DDL"""
+    schema = template_schema(partitioned)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DROP SCHEMA IF EXISTS {quote(schema)} CASCADE;')
+        cursor.execute(f'CREATE SCHEMA {quote(schema)};')
+        with tenant_schema(schema):
+            create_tenant_tables(cursor, partitioned)
+        cursor.execute(f'COMMENT ON SCHEMA {quote(schema)} IS %s', [str(TEMPLATE_VERSION)])
+    _scripts.pop((schema, TEMPLATE_VERSION), None)
+    return schema
+
+
+def ensure_template(partitioned=False):
+    """Build the template unless it exists at this version or newer"""
+    schema = template_schema(partitioned)
+    with connection.cursor() as cursor:
+        version = template_version(cursor, schema)
+    if version is not None and version >= TEMPLATE_VERSION:
+        return schema
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # One builder at a time; the others wait and then find it built.
+        # Older code never downgrades a template during a rolling deploy.
+        cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [f'template:{schema}'])
+        version = template_version(cursor, schema)
+        if version is None or version < TEMPLATE_VERSION:
+            build_template(partitioned)
+    return schema
+
+
+def describe(cursor, schema):
+    """Statements recreating ``schema``'s objects in whatever schema is current
+
+    Must run with ``schema`` first on the search_path, so the catalog
+    renders references between its objects without a schema prefix.
+    """
+    statements = []
+
+    cursor.execute('''
+        SELECT sequencename, data_type, increment_by, min_value, max_value, start_value,
+               cache_size, cycle, last_value
+        FROM pg_sequences
+        WHERE schemaname = %s
+    ''', [schema])
+    sequences = cursor.fetchall()
+    for name, data_type, increment, minimum, maximum, start, cache, cycle, _ in sequences:
+        statements.append(
+            f'CREATE SEQUENCE {quote(name)} AS {data_type} INCREMENT BY {increment} '
+            f'MINVALUE {minimum} MAXVALUE {maximum} START WITH {start} CACHE {cache}'
+            f'{" CYCLE" if cycle else ""}'
+        )
+
+    cursor.execute('''
+        SELECT c.oid, c.relname, c.relkind, c.relispartition,
+               pg_get_partkeydef(c.oid), pg_get_expr(c.relpartbound, c.oid), parent.relname
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        LEFT JOIN pg_inherits i ON i.inhrelid = c.oid
+        LEFT JOIN pg_class parent ON parent.oid = i.inhparent
+        WHERE n.nspname = %s AND c.relkind IN ('r', 'p')
+        ORDER BY c.relispartition, c.oid
+    ''', [schema])
+    tables = cursor.fetchall()
+    top_level = [oid for oid, _, _, is_partition, _, _, _ in tables if not is_partition]
+
+    cursor.execute('''
+        SELECT a.attrelid, a.attname, format_type(a.atttypid, a.atttypmod), a.attnotnull,
+               pg_get_expr(d.adbin, d.adrelid)
+        FROM pg_attribute a
+        LEFT JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+        WHERE a.attrelid = ANY(%s::oid[]) AND a.attnum > 0 AND NOT a.attisdropped
+        ORDER BY a.attrelid, a.attnum
+    ''', [top_level])
+    columns = {}
+    for oid, name, data_type, not_null, default in cursor.fetchall():
+        column = f'{quote(name)} {data_type}'
+        if default is not None:
+            column += f' DEFAULT {default}'
+        if not_null:
+            column += ' NOT NULL'
+        columns.setdefault(oid, []).append(column)
+
+    # Partitions inherit their parent's constraints and indexes
+    cursor.execute('''
+        SELECT con.conrelid, con.conname, con.contype, pg_get_constraintdef(con.oid)
+        FROM pg_constraint con
+        WHERE con.conrelid = ANY(%s::oid[]) AND con.contype IN ('p', 'u', 'c', 'x', 'f')
+        ORDER BY con.conrelid, con.oid
+    ''', [top_level])
+    constraints = {}
+    foreign_keys = []
+    for oid, name, kind, definition in cursor.fetchall():
+        if kind == 'f':
+            foreign_keys.append((oid, name, definition))
+        else:
+            constraints.setdefault(oid, []).append(f'CONSTRAINT {quote(name)} {definition}')
+
+    names = {oid: name for oid, name, _, _, _, _, _ in tables}
+    for oid, name, kind, is_partition, partition_key, bound, parent in tables:
+        if is_partition:
+            statements.append(f'CREATE TABLE {quote(name)} PARTITION OF {quote(parent)} {bound}')
+            continue
+        body = ',\n    '.join(columns.get(oid, []) + constraints.get(oid, []))
+        partitioning = f' PARTITION BY {partition_key}' if kind == 'p' else ''
+        statements.append(f'CREATE TABLE {quote(name)} (\n    {body}\n){partitioning}')
+
+    # Pretty-printed definitions only qualify names not on the search_path.
+    # An index on a partitioned parent prints as ON ONLY, which would leave
+    # the partitions without it.
+    cursor.execute('''
+        SELECT pg_get_indexdef(i.indexrelid, 0, true)
+        FROM pg_index i
+        WHERE i.indrelid = ANY(%s::oid[])
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_constraint con
+              WHERE con.conindid = i.indexrelid AND con.conrelid = i.indrelid
+                AND con.contype IN ('p', 'u', 'x')
+          )
+        ORDER BY i.indexrelid
+    ''', [top_level])
+    for (definition,) in cursor.fetchall():
+        statements.append(definition.replace(' ON ONLY ', ' ON ', 1))
+
+    # Seed rows, and the sequence positions that go with them
+    for oid in top_level:
+        cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {quote(names[oid])})')
+        if cursor.fetchone()[0]:
+            statements.append(
+                f'INSERT INTO {quote(names[oid])} SELECT * FROM {quote(schema)}.{quote(names[oid])}'
+            )
+    for name, _, _, _, _, _, _, _, last_value in sequences:
+        if last_value is not None:
+            statements.append(f"SELECT setval('{quote(name)}', {last_value})")
+
+    for oid, name, definition in foreign_keys:
+        statements.append(f'ALTER TABLE {quote(names[oid])} ADD CONSTRAINT {quote(name)} {definition}')
+
+    # Serial columns own their sequences, so dropping the table drops both
+    cursor.execute('''
+        SELECT s.relname, t.relname, a.attname
+        FROM pg_depend d
+        JOIN pg_class s ON s.oid = d.objid AND s.relkind = 'S'
+        JOIN pg_class t ON t.oid = d.refobjid
+        JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = d.refobjsubid
+        JOIN pg_namespace n ON n.oid = s.relnamespace
+        WHERE n.nspname = %s AND d.classid = 'pg_class'::regclass AND d.deptype = 'a'
+    ''', [schema])
+    for sequence, table, column in cursor.fetchall():
+        statements.append(f'ALTER SEQUENCE {quote(sequence)} OWNED BY {quote(table)}.{quote(column)}')
+
+    return statements
+
+
+def template_script(partitioned=False):
+    """Cached clone script of the (built if needed) template schema"""
+    key = (template_schema(partitioned), TEMPLATE_VERSION)
+    script = _scripts.get(key)
+    if script is None:
+        schema = ensure_template(partitioned)
+        with connection.cursor() as cursor, tenant_schema(schema):
+            script = ';\n'.join(describe(cursor, schema)) + ';'
+        _scripts[key] = script
+    return script
+
+
+def clone(schema_name, partitioned=False):
+    """Create a tenant schema as a copy of the template"""
+    script = template_script(partitioned)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'CREATE SCHEMA {quote(schema_name)};')
+        with tenant_schema(schema_name):
+            cursor.execute(script)
+            if partitioned:
+                # The template only has the partitions of the month it was built
+                ensure_partitions(cursor)
+
+
+def pool_label(partitioned=False):
+    return f"pool {TEMPLATE_VERSION}{' partitioned' if partitioned else ''}"
+
+
+def pooled_schemas(cursor):
+    """Pooled schemas with their labels, oldest first"""
+    cursor.execute('''
+        SELECT nspname, coalesce(obj_description(oid, 'pg_namespace'), '')
+        FROM pg_namespace
+        WHERE left(nspname, %s) = %s
+        ORDER BY oid
+    ''', [len(settings.TENANT_POOL_PREFIX), settings.TENANT_POOL_PREFIX])
+    return cursor.fetchall()
+
+
+def lock_pooled(cursor, name):
+    """Take a pooled schema for this transaction; False if someone else has it or it is gone"""
+    cursor.execute('SELECT pg_try_advisory_xact_lock(hashtext(%s))', [f'pool:{name}'])
+    if not cursor.fetchone()[0]:
+        return False
+    # Another claim may have renamed it and committed before we got the lock
+    cursor.execute('SELECT 1 FROM pg_namespace WHERE nspname = %s', [name])
+    return cursor.fetchone() is not None
+
+
+def claim(schema_name, partitioned=False):
+    """Rename a pooled schema to ``schema_name``; False if the pool is empty"""
+    label = pool_label(partitioned)
+    with transaction.atomic(), connection.cursor() as cursor:
+        for name, comment in pooled_schemas(cursor):
+            if comment != label or not lock_pooled(cursor, name):
+                continue
+            cursor.execute(f'ALTER SCHEMA {quote(name)} RENAME TO {quote(schema_name)};')
+            cursor.execute(f'COMMENT ON SCHEMA {quote(schema_name)} IS NULL;')
+            if partitioned:
+                # The clone may have been made in an earlier month
+                with tenant_schema(schema_name):
+                    ensure_partitions(cursor)
+            return True
+    return False
+
+
+def replenish(partitioned=False):
+    """Drop pooled schemas of older templates and top the pool up; returns schemas created"""
+    label = pool_label(partitioned)
+    size = settings.TENANT_POOL_PARTITIONED_SIZE if partitioned else settings.TENANT_POOL_SIZE
+    lock_key = f'pool-replenish:{partitioned}'
+    with connection.cursor() as cursor:
+        # One replenisher per pool, or overlapping runs would overfill it
+        cursor.execute('SELECT pg_try_advisory_lock(hashtext(%s))', [lock_key])
+        if not cursor.fetchone()[0]:
+            return 0
+        pooled = pooled_schemas(cursor)
+
+    try:
+        ready = 0
+        for name, comment in pooled:
+            if comment == label:
+                ready += 1
+            elif comment.endswith(' partitioned') == partitioned:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    if lock_pooled(cursor, name):
+                        cursor.execute(f'DROP SCHEMA {quote(name)} CASCADE;')
+
+        created = 0
+        for _ in range(size - ready):
+            name = f'{settings.TENANT_POOL_PREFIX}{uuid.uuid4().hex[:16]}'
+            # Labelled in the same transaction, so a half-built clone is never claimed
+            with transaction.atomic(), connection.cursor() as cursor:
+                clone(name, partitioned)
+                cursor.execute(f'COMMENT ON SCHEMA {quote(name)} IS %s', [label])
+            created += 1
+        return created
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock(hashtext(%s))', [lock_key])
+
+
+def storefront_defaults(tenant):
+    return {
+        'store_name': f"{tenant.name} Store",
+        'primary_color': '#667eea',
+        'secondary_color': '#764ba2',
+        'accent_color': '#e74c3c',
+        'background_color': '#f8f9fa',
+        'text_color': '#333333'
+    }
+
+
+def sample_products(schema_name):
+    name = schema_name.title()
+    return [
+        {
+            'name': f'{name} Laptop',
+            'description': f'High-performance laptop for {schema_name} customers',
+            'price': Decimal('1299.99'),
+            'stock': 10,
+            'image_url': 'https://via.placeholder.com/300x200?text=Laptop'
+        },
+        {
+            'name': f'{name} Headphones',
+            'description': f'Premium headphones for {schema_name} customers',
+            'price': Decimal('299.99'),
+            'stock': 25,
+            'image_url': 'https://via.placeholder.com/300x200?text=Headphones'
+        },
+        {
+            'name': f'{name} Smartphone',
+            'description': f'Latest smartphone for {schema_name} customers',
+            'price': Decimal('899.99'),
+            'stock': 15,
+            'image_url': 'https://via.placeholder.com/300x200?text=Smartphone'
+        }
+    ]
+
+
+def submit(schema_name, tenant=None, **options):
+    """Record a provisioning job and queue it once the transaction commits"""
+    job = ProvisioningJob.objects.create(tenant=tenant, schema_name=schema_name, options=options)
+    enqueue(job)
+    return job
+
+
+def enqueue(job):
+    from .tasks import provision_tenant
+    transaction.on_commit(lambda: provision_tenant.delay(str(job.id)))
+
+
+def is_stale(job):
+    """Whether an unfinished job has made no progress for PROVISIONING_STALE_SECONDS
+
+    A worker killed mid-job leaves it running; such jobs may be resubmitted.
+    """
+    return (
+        job.status in ('pending', 'running')
+        and job.updated_at < timezone.now() - timedelta(seconds=settings.PROVISIONING_STALE_SECONDS)
+    )
+
+
+def resubmit(job):
+    """Queue a failed or stale job again; completed steps are skipped"""
+    job.status = 'pending'
+    job.error = ''
+    job.finished_at = None
+    job.save(update_fields=['status', 'error', 'finished_at', 'updated_at'])
+    enqueue(job)
+
+
+def provision_schema(schema_name, options):
+    """Create a tenant schema and its optional sample data; returns the steps done"""
+    partitioned = options.get('partitioned', False)
+    if not schema_exists(schema_name) and not claim(schema_name, partitioned):
+        clone(schema_name, partitioned)
+    steps = ['schema']
+
+    if options.get('sample_data'):
+        with tenant_schema(schema_name):
+            if not Product.objects.exists():
+                for product_data in sample_products(schema_name):
+                    Product.objects.create(**product_data)
+        steps.append('sample_data')
+    return steps
+
+
+def report_back(job_id, steps=(), error=None):
+    """Send the outcome of a backend job's schema work to the backend worker"""
+    current_app.send_task(
+        BACKEND_RESULT_TASK, args=[job_id], kwargs={'steps': list(steps), 'error': error},
+        queue=settings.BACKEND_TASK_QUEUE,
+    )
+
+
+def run_job(job_id):
+    """Run the remaining steps of a job; returns the job, or None if another worker has it"""
+    # Visible to status polling while the work below is still uncommitted
+    ProvisioningJob.objects.filter(id=job_id, status__in=('pending', 'failed')).update(
+        status='running', updated_at=timezone.now(),
+    )
+
+    with transaction.atomic():
+        job = ProvisioningJob.objects.select_for_update(skip_locked=True, of=('self',)).select_related('tenant').filter(id=job_id).first()
+        if job is None:
+            if not ProvisioningJob.objects.filter(id=job_id).exists():
+                raise ProvisioningJob.DoesNotExist(f"Provisioning job {job_id} does not exist")
+            return None
+        if job.status == 'succeeded':
+            return job
+
+        steps = provision_schema(job.schema_name, job.options)
+
+        if job.tenant:
+            TenantStorefront.objects.get_or_create(tenant=job.tenant, defaults=storefront_defaults(job.tenant))
+            steps.append('storefront')
+
+        if job.tenant:
+            Tenant.objects.filter(id=job.tenant_id).update(is_active=True)
+
+        job.steps = [step for step in job.steps if step not in steps] + steps
+        job.status = 'succeeded'
+        job.error = ''
+        job.finished_at = timezone.now()
+        job.save()
+    return job
+
+
+def record_failure(job_id, error, final):
+    ProvisioningJob.objects.filter(id=job_id).update(
+        status='failed' if final else 'pending',
+        error=str(error),
+        attempts=F('attempts') + 1,
+        finished_at=timezone.now() if final else None,
+        updated_at=timezone.now(),
+    )
+
+
+def serialize_job(job):
+    return {
+        'id': str(job.id),
+        'tenant_id': str(job.tenant_id) if job.tenant_id else None,
+        'schema_name': job.schema_name,
+        'status': job.status,
+        'steps': job.steps,
+        'attempts': job.attempts,
+        'error': job.error or None,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'status_url': f'/api/management/tenants/jobs/{job.id}/',
+    }
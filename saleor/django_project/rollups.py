@@ -0,0 +1,185 @@
+"""
+Daily rollups behind the tenant statistics endpoint.
+
+``daily_order_stats`` holds order count and revenue per (day, status), and
+``daily_product_sales`` holds units sold per (day, product, status). The
+day is the order's creation date. A status change moves the order's
+counts from its old status to the new one on the same day.
+``get_statistics`` then reads O(days) rows instead of scanning every
+order and item.
+
+Checkouts do not touch the rollups. Updating today's row inside every
+checkout would make it one hot row lock per tenant, serialising the very
+spikes admission control and stock sharding spread out. Instead, the
+outbox relay (``outbox.relay``) applies the ``order.created`` and
+``order.status_changed`` events of each batch with ``apply_events``. It
+does so in the transaction that marks them published, so every event is
+counted exactly once. One relay runs per tenant at a time, so the rows
+have a single writer. The rollups trail the orders table by the relay
+delay, normally well under a second.
+
+The rollups outlive archived orders. ``manage.py rebuild_rollups``
+recomputes them from the hot tables.
+"""
+
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection
+
+from .models import OrderItem
+
+REVENUE_STATUSES = ('shipped', 'delivered')
+
+
+def create_rollup_tables(cursor):
+    """Create the rollup tables in the current schema"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_order_stats (
+            day DATE NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            orders INTEGER NOT NULL DEFAULT 0,
+            revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, status)
+        );
+        CREATE TABLE IF NOT EXISTS daily_product_sales (
+            day DATE NOT NULL,
+            product_id UUID NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            units INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, product_id, status)
+        );
+    ''')
+
+
+def apply(order_deltas, product_deltas):
+    """Add {(day, status): [orders, revenue]} and {(day, product_id, status): units}
+
+    Keys are written in sorted order, so concurrent transactions take the
+    row locks in the same sequence and cannot deadlock.
+    """
+    order_rows = [
+        (day, status, orders, revenue)
+        for (day, status), (orders, revenue) in sorted(order_deltas.items())
+        if orders or revenue
+    ]
+    product_rows = sorted(
+        (day, str(product_id), status, units)
+        for (day, product_id, status), units in product_deltas.items()
+        if units
+    )
+    with connection.cursor() as cursor:
+        if order_rows:
+            cursor.execute(f'''
+                INSERT INTO daily_order_stats (day, status, orders, revenue)
+                VALUES {", ".join(["(%s, %s, %s, %s)"] * len(order_rows))}
+                ON CONFLICT (day, status) DO UPDATE SET
+                    orders = daily_order_stats.orders + EXCLUDED.orders,
+                    revenue = daily_order_stats.revenue + EXCLUDED.revenue
+            ''', [value for row in order_rows for value in row])
+        if product_rows:
+            cursor.execute(f'''
+                INSERT INTO daily_product_sales (day, product_id, status, units)
+                VALUES {", ".join(["(%s, %s::uuid, %s, %s)"] * len(product_rows))}
+                ON CONFLICT (day, product_id, status) DO UPDATE SET
+                    units = daily_product_sales.units + EXCLUDED.units
+            ''', [value for row in product_rows for value in row])
+
+
+def apply_events(events):
+    """Count a batch of outbox events (as the relay reads them) into the rollups"""
+    order_deltas = defaultdict(lambda: [0, Decimal('0')])
+    product_deltas = defaultdict(int)
+    transitions = []
+    for event in events:
+        payload = event['payload']
+        if event['event_type'] == 'order.created':
+            day = date.fromisoformat(payload['created_at'][:10])
+            order_deltas[(day, payload['status'])][0] += 1
+            order_deltas[(day, payload['status'])][1] += Decimal(payload['total_amount'])
+            for item in payload['items']:
+                product_deltas[(day, item['product_id'], payload['status'])] += item['quantity']
+        elif event['event_type'] == 'order.status_changed':
+            transitions.append(payload)
+
+    moves = {}
+    for transition in transitions:
+        day = date.fromisoformat(transition['created_at'][:10])
+        amount = Decimal(transition['total_amount'])
+        order_deltas[(day, transition['from'])][0] -= 1
+        order_deltas[(day, transition['from'])][1] -= amount
+        order_deltas[(day, transition['to'])][0] += 1
+        order_deltas[(day, transition['to'])][1] += amount
+        moves.setdefault(transition['order_id'], []).append((day, transition['from'], transition['to']))
+
+    if moves:
+        items = OrderItem.objects.filter(order_id__in=list(moves)).values_list('order_id', 'product_id', 'quantity')
+        for order_id, product_id, quantity in items:
+            for day, old_status, new_status in moves[str(order_id)]:
+                product_deltas[(day, str(product_id), old_status)] -= quantity
+                product_deltas[(day, str(product_id), new_status)] += quantity
+
+    apply(order_deltas, product_deltas)
+
+
+def rebuild(cursor, since=None):
+    """Recompute the rollups from the orders table, for days from ``since`` on
+
+    Returns the number of (day, status) rows written.
+    """
+    condition, params = ('WHERE o.created_at >= %s', [since]) if since else ('', [])
+    cursor.execute(
+        'DELETE FROM daily_order_stats' + (' WHERE day >= %s' if since else ''), params
+    )
+    cursor.execute(
+        'DELETE FROM daily_product_sales' + (' WHERE day >= %s' if since else ''), params
+    )
+    cursor.execute(f'''
+        INSERT INTO daily_order_stats (day, status, orders, revenue)
+        SELECT o.created_at::date, o.status, count(*), coalesce(sum(o.total_amount), 0)
+        FROM orders o
+        {condition}
+        GROUP BY 1, 2
+    ''', params)
+    written = cursor.rowcount
+    cursor.execute(f'''
+        INSERT INTO daily_product_sales (day, product_id, status, units)
+        SELECT o.created_at::date, i.product_id, o.status, sum(i.quantity)
+        FROM order_items i
+        JOIN orders o ON o.id = i.order_id
+        {condition}
+        GROUP BY 1, 2, 3
+    ''', params)
+    return written
+
+
+def totals():
+    """Order count, revenue and per-status counts over all days"""
+    with connection.cursor() as cursor:
+        cursor.execute('''
+            SELECT status, sum(orders), sum(revenue)
+            FROM daily_order_stats
+            GROUP BY status
+        ''')
+        rows = cursor.fetchall()
+
+    total_orders = sum(orders for _, orders, _ in rows)
+    total_revenue = sum((revenue for status, _, revenue in rows if status in REVENUE_STATUSES), Decimal('0.00'))
+    by_status = [{'status': status, 'count': orders} for status, orders, _ in rows if orders]
+    return total_orders, total_revenue, by_status
+
+
+def top_products(limit=5):
+    """(product_id, units) of the best sellers among shipped and delivered orders"""
+    with connection.cursor() as cursor:
+        cursor.execute('''
+            SELECT product_id, sum(units) AS units
+            FROM daily_product_sales
+            WHERE status = ANY(%s)
+            GROUP BY product_id
+            HAVING sum(units) > 0
+            ORDER BY units DESC
+            LIMIT %s
+        ''', [list(REVENUE_STATUSES), limit])
+        return cursor.fetchall()
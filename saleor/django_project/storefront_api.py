@@ -1,12 +1,16 @@
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from django.db import connection
+from django.conf import settings
+from django.db import connection, transaction
 from .models import Tenant, TenantStorefront, Product, Order, OrderItem
 from .api_management import validate_api_key_from_request, add_cors_headers
+from .events import emit_order_created
+from .idempotency import idempotent
+from . import admission, inventory, outbox, provisioning, uniques
+from .order_numbers import is_valid_prefix, next_order_number
 import json
 from decimal import Decimal
-import uuid
 
 def get_tenant_from_request(request):
     """Extract tenant from request headers or fallback to origin"""
@@ -61,17 +65,12 @@ def get_storefront_config(request):
                 "error": "Tenant not found"
             }, status=404), request)
         
+        uniques.record_visit(tenant_schema, request)
+        
         # Get or create storefront config
         storefront, created = TenantStorefront.objects.get_or_create(
             tenant=tenant,
-            defaults={
-                'store_name': f"{tenant.name} Store",
-                'primary_color': '#667eea',
-                'secondary_color': '#764ba2',
-                'accent_color': '#e74c3c',
-                'background_color': '#f8f9fa',
-                'text_color': '#333333'
-            }
+            defaults=provisioning.storefront_defaults(tenant)
         )
         
         config = {
@@ -209,6 +208,18 @@ def update_storefront_config(request):
                 storefront.enable_coupons = checkout['coupons']
             if 'gift_cards' in checkout:
                 storefront.enable_gift_cards = checkout['gift_cards']
+            if 'order_number_prefix' in checkout:
+                if not is_valid_prefix(checkout['order_number_prefix']):
+                    return add_cors_headers(JsonResponse({
+                        "error": "order_number_prefix must be at most 8 letters, digits, '-' or '_'"
+                    }, status=400), request)
+                storefront.order_number_prefix = checkout['order_number_prefix']
+            if 'order_confirmation_email' in checkout:
+                storefront.order_confirmation_email = checkout['order_confirmation_email']
+        
+        # Update post-checkout webhook
+        if 'webhook_url' in data:
+            storefront.webhook_url = data['webhook_url']
         
         # Update custom CSS/JS
         if 'custom_css' in data:
@@ -289,12 +300,14 @@ def get_products_for_storefront(request):
                 "error": "Storefront configuration not found"
             }, status=404), request)
         
+        uniques.record_visit(tenant_schema, request)
+        
         # Get products with pagination
         page = int(request.GET.get('page', 1))
         per_page = storefront.products_per_page
         offset = (page - 1) * per_page
         
-        products = Product.objects.filter(is_active=True)[offset:offset + per_page]
+        products = inventory.with_stock(Product.objects.filter(is_active=True))[offset:offset + per_page]
         
         products_data = []
         for product in products:
@@ -302,7 +315,7 @@ def get_products_for_storefront(request):
                 'id': str(product.id),
                 'name': product.name,
                 'price': float(product.price),
-                'stock': product.stock,
+                'stock': product.available_stock,
                 'created_at': product.created_at.isoformat(),
             }
             
@@ -344,37 +357,40 @@ def get_products_for_storefront(request):
             "error": str(e)
         }, status=500), request)
 
-@csrf_exempt
-def create_order_for_storefront(request):
-    if request.method == "OPTIONS":
-        return add_cors_headers(JsonResponse({}), request)
-    if request.method != "POST":
-        return add_cors_headers(JsonResponse({"error": "Method not allowed"}, status=405), request)
-    """Create order for storefront with tenant-specific checkout settings"""
+def place_storefront_order(tenant_schema, data):
+    """Create a storefront order in the active schema; returns (body, status)"""
+    # Get storefront config
     try:
-        tenant_schema = get_tenant_from_request(request)
-        set_tenant_schema(tenant_schema)
-        
-        # Get storefront config
-        try:
-            tenant = Tenant.objects.get(schema_name=tenant_schema)
-            storefront = TenantStorefront.objects.get(tenant=tenant)
-        except (Tenant.DoesNotExist, TenantStorefront.DoesNotExist):
-            return add_cors_headers(JsonResponse({
-                "error": "Storefront configuration not found"
-            }, status=404), request)
-        
-        data = json.loads(request.body)
-        
-        # Check if guest checkout is enabled
-        if not storefront.enable_guest_checkout and not data.get('customer_account_id'):
-            return add_cors_headers(JsonResponse({
-                "error": "Guest checkout is disabled for this store"
-            }, status=400), request)
-        
-        # Generate order number
-        order_number = f"ORD-{uuid.uuid4().hex[:8].upper()}"
-        
+        tenant = Tenant.objects.get(schema_name=tenant_schema)
+        storefront = TenantStorefront.objects.get(tenant=tenant)
+    except (Tenant.DoesNotExist, TenantStorefront.DoesNotExist):
+        return {"error": "Storefront configuration not found"}, 404
+    
+    # Check if guest checkout is enabled
+    if not storefront.enable_guest_checkout and not data.get('customer_account_id'):
+        return {"error": "Guest checkout is disabled for this store"}, 400
+    
+    # Allocate the next order number from the tenant's sequence
+    order_number = next_order_number(tenant_schema, storefront.order_number_prefix)
+    
+    try:
+        order, items = _create_storefront_order(tenant_schema, order_number, data)
+    except inventory.InsufficientStock as e:
+        return {"error": str(e), "product_id": str(e.product_id)}, 409
+    
+    return {
+        'success': True,
+        'order': {
+            'id': str(order.id),
+            'order_number': order.order_number,
+            'total_amount': float(order.total_amount),
+            'customer_name': order.customer_name,
+            'customer_email': order.customer_email
+        }
+    }, 200
+
+def _create_storefront_order(tenant_schema, order_number, data):
+    with transaction.atomic():
         # Create order
         order = Order.objects.create(
             order_number=order_number,
@@ -384,30 +400,102 @@ def create_order_for_storefront(request):
         )
         
         # Create order items
+        items = []
+        stock_events = []
         for item_data in data['items']:
             product = Product.objects.get(id=item_data['product_id'])
-            OrderItem.objects.create(
+            items.append(OrderItem.objects.create(
                 order=order,
                 product=product,
                 quantity=item_data['quantity'],
                 price=Decimal(item_data['price']),
-            )
-            # Update stock
-            product.stock -= item_data['quantity']
-            product.save()
+            ))
+            inventory.reserve(product, item_data['quantity'])
+            stock_events.append(('product', product.id, 'product.stock_changed', outbox.product_payload(product)))
         
-        return add_cors_headers(JsonResponse({
+        outbox.record_many(tenant_schema, [
+            ('order', order.id, 'order.created', outbox.order_payload(order, items)),
+            *stock_events,
+        ])
+        
+        # Emails, counters, alerts and webhooks run in Celery after commit
+        emit_order_created(tenant_schema, order, [item.product_id for item in items])
+    
+    return order, items
+
+@csrf_exempt
+@idempotent(get_tenant_from_request)
+def create_order_for_storefront(request):
+    if request.method == "OPTIONS":
+        return add_cors_headers(JsonResponse({}), request)
+    if request.method != "POST":
+        return add_cors_headers(JsonResponse({"error": "Method not allowed"}, status=405), request)
+    """Create order for storefront, queueing it when the tenant is at its checkout limit"""
+    try:
+        tenant_schema = get_tenant_from_request(request)
+        data = json.loads(request.body)
+        
+        # Place the order right away if a checkout slot is free
+        token = admission.acquire_slot(tenant_schema)
+        if token:
+            try:
+                set_tenant_schema(tenant_schema)
+                body, status = place_storefront_order(tenant_schema, data)
+            finally:
+                admission.release_slot(tenant_schema, token)
+            return add_cors_headers(JsonResponse(body, status=status), request)
+        
+        # Otherwise wait in line behind earlier checkouts
+        try:
+            ticket, position = admission.enqueue(tenant_schema, data)
+        except admission.QueueFull:
+            response = JsonResponse({
+                "error": "Checkout is busy, please try again shortly"
+            }, status=503)
+            response['Retry-After'] = str(settings.CHECKOUT_RETRY_AFTER)
+            return add_cors_headers(response, request)
+        
+        response = JsonResponse({
             'success': True,
-            'order': {
-                'id': str(order.id),
-                'order_number': order.order_number,
-                'total_amount': float(order.total_amount),
-                'customer_name': order.customer_name,
-                'customer_email': order.customer_email
-            }
-        }), request)
+            'queued': True,
+            'ticket': ticket,
+            'position': position,
+            'status_url': f'/api/storefront/orders/queue/{ticket}/',
+        }, status=202)
+        response['Retry-After'] = str(settings.CHECKOUT_RETRY_AFTER)
+        return add_cors_headers(response, request)
+        
+    except Exception as e:
+        return add_cors_headers(JsonResponse({
+            "error": str(e)
+        }, status=500), request)
+
+@csrf_exempt
+def get_queued_order(request, ticket):
+    if request.method == "OPTIONS":
+        return add_cors_headers(JsonResponse({}), request)
+    if request.method != "GET":
+        return add_cors_headers(JsonResponse({"error": "Method not allowed"}, status=405), request)
+    """Status of a queued checkout; poll again after Retry-After until it is placed"""
+    try:
+        tenant_schema = get_tenant_from_request(request)
+        record = admission.get_ticket(ticket)
+        if record is None or record['schema'] != tenant_schema:
+            return add_cors_headers(JsonResponse({"error": "Ticket not found"}, status=404), request)
+        
+        if record['state'] == 'done':
+            return add_cors_headers(JsonResponse(record['result'], status=record['status']), request)
+        
+        response = JsonResponse({
+            'queued': True,
+            'ticket': ticket,
+            'state': record['state'],
+            'queue_length': admission.queue_length(tenant_schema),
+        }, status=202)
+        response['Retry-After'] = str(settings.CHECKOUT_RETRY_AFTER)
+        return add_cors_headers(response, request)
         
     except Exception as e:
         return add_cors_headers(JsonResponse({
             "error": str(e)
-        }, status=500), request) 
\ No newline at end of file
+        }, status=500), request)
@@ -0,0 +1,80 @@
+"""
+Stale-while-revalidate caching in Redis.
+
+Entries stay fresh for ``fresh_for`` seconds and can then be served stale
+for another ``stale_for`` seconds. The first request to see a stale entry
+takes a short SET NX lock and recomputes the entry on a background
+thread, while it and everyone else keep getting the stale value. On a
+cold miss, only the lock holder computes. The others wait for its result,
+taking the lock over if it fails, so many open dashboards cost one
+computation per key.
+
+Values must be JSON serializable. ``compute`` also runs on a background
+thread with its own connection; ``schema_name`` is put on its search_path.
+"""
+
+import json
+import logging
+import threading
+import time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+
+from .redis_client import get_redis
+from .tenancy import tenant_schema
+
+logger = logging.getLogger(__name__)
+
+LOCK_TIMEOUT = 30  # seconds; a crashed refresh releases its lock after this
+POLL_INTERVAL = 0.1  # seconds between a cold miss's checks for another worker's result
+
+
+def _store(key, value, fresh_for, stale_for):
+    get_redis().set(key, json.dumps({
+        'value': value,
+        'fresh_until': time.time() + fresh_for,
+    }, cls=DjangoJSONEncoder), ex=fresh_for + stale_for)
+
+
+def _load(key):
+    raw = get_redis().get(key)
+    return json.loads(raw) if raw is not None else None
+
+
+def _refresh(key, schema_name, compute, fresh_for, stale_for):
+    try:
+        with tenant_schema(schema_name):
+            _store(key, compute(), fresh_for, stale_for)
+    except Exception:
+        logger.exception("Background refresh of %s failed", key)
+    finally:
+        get_redis().delete(f'{key}:lock')
+        connection.close()
+
+
+def get_or_compute(key, schema_name, compute, fresh_for, stale_for):
+    """Return the cached value of ``key``, refreshing it as described above"""
+    redis_client = get_redis()
+    entry = _load(key)
+    if entry is not None:
+        if entry['fresh_until'] < time.time() and redis_client.set(f'{key}:lock', 1, nx=True, ex=LOCK_TIMEOUT):
+            threading.Thread(
+                target=_refresh, args=(key, schema_name, compute, fresh_for, stale_for), daemon=True,
+            ).start()
+        return entry['value']
+
+    while not redis_client.set(f'{key}:lock', 1, nx=True, ex=LOCK_TIMEOUT):
+        # Someone else is computing it; wait for their result rather than
+        # computing it too. If they fail, the lock goes and one waiter takes over
+        time.sleep(POLL_INTERVAL)
+        entry = _load(key)
+        if entry is not None:
+            return entry['value']
+
+    try:
+        value = compute()
+        _store(key, value, fresh_for, stale_for)
+        return value
+    finally:
+        redis_client.delete(f'{key}:lock')
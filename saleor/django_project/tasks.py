@@ -0,0 +1,359 @@
+import json
+import logging
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import URLError
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.db.models import Prefetch
+
+from . import admission, analytics, cohorts, events, inventory, outbox, provisioning, uniques
+from .celery import app
+from .archive import archive_orders
+from .models import Tenant, TenantStorefront, Product, Order, OrderItem
+from .partitioning import ensure_partitions, partitioned_schemas
+from .redis_client import get_redis
+from .tenancy import tenant_schema
+
+logger = logging.getLogger(__name__)
+
+
+@app.task(ignore_result=True)
+def process_order_events(batch_size=None):
+    """Drain the order event queue, handling each tenant's events as a batch"""
+    batch_size = batch_size or settings.ORDER_EVENTS_BATCH_SIZE
+    if not events.claim_drainer():
+        return
+    try:
+        events.recover()
+        while True:
+            events.promote_due(batch_size)
+            batch = events.pop_batch(batch_size)
+            if not batch:
+                return
+
+            by_schema = defaultdict(list)
+            for item, event in batch:
+                by_schema[event['schema']].append((item, event))
+
+            for schema_name, schema_batch in by_schema.items():
+                by_type = defaultdict(list)
+                for _, event in schema_batch:
+                    by_type[event['type']].append(event['payload'])
+                try:
+                    with tenant_schema(schema_name):
+                        for event_type, payloads in by_type.items():
+                            handler = EVENT_HANDLERS.get(event_type)
+                            if handler:
+                                handler(schema_name, payloads)
+                except Exception:
+                    logger.exception("Failed to process order events for %s", schema_name)
+                    events.retry(schema_batch)
+                else:
+                    events.ack([item for item, _ in schema_batch])
+            events.refresh_drainer()
+
+            if len(batch) < batch_size:
+                return
+    finally:
+        events.release_drainer()
+
+
+def handle_orders_created(schema_name, payloads):
+    storefront = TenantStorefront.objects.filter(tenant__schema_name=schema_name).first()
+
+    uniques.add_customers(schema_name, payloads)
+    if storefront is None or storefront.order_confirmation_email:
+        send_order_confirmations(schema_name, storefront, payloads)
+    send_low_stock_alerts(schema_name, storefront, payloads)
+    if storefront and storefront.webhook_url:
+        deliver_webhook.delay(storefront.webhook_url, {
+            'tenant': schema_name,
+            'events': [{'type': 'order.created', **payload} for payload in payloads],
+        })
+
+
+def handle_status_changes(schema_name, payloads):
+    transitions = [transition for payload in payloads for transition in payload['transitions']]
+
+    webhook_url = TenantStorefront.objects.filter(
+        tenant__schema_name=schema_name
+    ).values_list('webhook_url', flat=True).first()
+    if webhook_url:
+        deliver_webhook.delay(webhook_url, {
+            'tenant': schema_name,
+            'events': [{'type': 'order.status_changed', **transition} for transition in transitions],
+        })
+
+
+EVENT_HANDLERS = {
+    'order.created': handle_orders_created,
+    'order.status_changed': handle_status_changes,
+}
+
+
+def send_order_confirmations(schema_name, storefront, payloads):
+    """Send the confirmation emails of a batch over a single connection, once per order"""
+    store_name = storefront.store_name if storefront else 'our store'
+    from_email = (storefront.contact_email if storefront else '') or settings.DEFAULT_FROM_EMAIL
+
+    orders = Order.objects.filter(
+        id__in=[payload['order_id'] for payload in payloads]
+    ).prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+    )
+
+    redis_client = get_redis()
+    with get_connection() as mail:
+        for order in orders:
+            # A retried batch skips the orders that were already confirmed
+            sent_key = f'katkat:confirmation_sent:{schema_name}:{order.id}'
+            if not redis_client.set(sent_key, 1, nx=True, ex=settings.ORDER_CONFIRMATION_SENT_TTL):
+                continue
+            lines = [f"{item.quantity} x {item.product.name} @ {item.price}" for item in order.items.all()]
+            body = "\n".join([
+                f"Hi {order.customer_name},",
+                "",
+                f"Thank you for your order {order.order_number} at {store_name}.",
+                "",
+                *lines,
+                "",
+                f"Total: {order.total_amount}",
+            ])
+            try:
+                mail.send_messages([EmailMessage(
+                    subject=f"Order confirmation {order.order_number}",
+                    body=body,
+                    from_email=from_email,
+                    to=[order.customer_email],
+                )])
+            except Exception:
+                redis_client.delete(sent_key)
+                raise
+
+
+def send_low_stock_alerts(schema_name, storefront, payloads):
+    """Alert the merchant about products of this batch that are running low"""
+    product_ids = {product_id for payload in payloads for product_id in payload['product_ids']}
+    if not product_ids:
+        return
+
+    low_stock = inventory.with_stock(Product.objects.filter(
+        id__in=product_ids,
+        is_active=True,
+    )).filter(available_stock__lte=settings.LOW_STOCK_THRESHOLD).values('id', 'name', 'available_stock')
+
+    # Alert once per product per interval, not once per order
+    redis_client = get_redis()
+    to_alert = [
+        product for product in low_stock
+        if redis_client.set(
+            f'katkat:low_stock_alerted:{schema_name}:{product["id"]}', 1,
+            nx=True, ex=settings.LOW_STOCK_ALERT_INTERVAL,
+        )
+    ]
+    if not to_alert:
+        return
+
+    lines = [f"{product['name']}: {product['available_stock']} left" for product in to_alert]
+    if not storefront or not storefront.contact_email:
+        logger.warning("Low stock for %s: %s", schema_name, "; ".join(lines))
+        return
+
+    EmailMessage(
+        subject=f"Low stock alert for {storefront.store_name}",
+        body="The following products are running low:\n\n" + "\n".join(lines),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[storefront.contact_email],
+    ).send()
+
+
+@app.task(ignore_result=True)
+def rebalance_stock_shards():
+    """Even out the stock counters of every sharded product"""
+    for schema_name in Tenant.objects.filter(is_active=True).values_list('schema_name', flat=True):
+        try:
+            with tenant_schema(schema_name):
+                for product in Product.objects.filter(stock_shards__gt=0).only('id'):
+                    inventory.rebalance(product, settings.STOCK_SHARD_REBALANCE_THRESHOLD)
+        except Exception:
+            logger.exception("Failed to rebalance stock shards for %s", schema_name)
+
+
+@app.task(ignore_result=True)
+def ensure_order_partitions():
+    """Create the upcoming monthly partitions for every partitioned tenant"""
+    for schema_name in partitioned_schemas():
+        try:
+            with transaction.atomic(), tenant_schema(schema_name):
+                with connection.cursor() as cursor:
+                    ensure_partitions(cursor)
+        except Exception:
+            logger.exception("Failed to create order partitions for %s", schema_name)
+
+
+@app.task(ignore_result=True)
+def archive_old_orders():
+    """Move every tenant's orders past the retention window to the archive"""
+    for schema_name in Tenant.objects.filter(is_active=True).values_list('schema_name', flat=True):
+        try:
+            with tenant_schema(schema_name):
+                archived = archive_orders(schema_name)
+            if archived:
+                logger.info("Archived %d orders for %s", archived, schema_name)
+        except Exception:
+            logger.exception("Failed to archive orders for %s", schema_name)
+
+
+@app.task(ignore_result=True)
+def process_checkout_queue(schema_name=None):
+    """Place queued storefront checkouts in FIFO order, one drainer per tenant"""
+    from .storefront_api import place_storefront_order
+
+    schemas = [schema_name] if schema_name else admission.queued_schemas()
+    for schema_name in schemas:
+        # Re-check after releasing the drainer claim, in case an enqueue
+        # happened while its kick was turned away by our claim
+        while admission.queue_length(schema_name) and admission.claim_drainer(schema_name):
+            try:
+                drain_checkout_queue(schema_name, place_storefront_order)
+            finally:
+                admission.release_drainer(schema_name)
+
+
+def drain_checkout_queue(schema_name, place_order):
+    """Place queued checkouts in FIFO order, one thread per free slot"""
+    def place(entry, token):
+        try:
+            with tenant_schema(schema_name):
+                try:
+                    body, status = place_order(schema_name, entry['data'])
+                except Exception as e:
+                    logger.exception("Queued checkout %s failed for %s", entry['ticket'], schema_name)
+                    body, status = {'error': str(e)}, 500
+            admission.complete(entry['ticket'], schema_name, status, body)
+        finally:
+            admission.release_slot(schema_name, token)
+            # Each pool thread opened its own connection
+            connection.close()
+
+    # Leaving the block waits for the checkouts still in flight
+    with ThreadPoolExecutor(max_workers=settings.CHECKOUT_MAX_CONCURRENCY) as pool:
+        while True:
+            token = admission.wait_for_slot(schema_name)
+            if token is None:
+                # Slots stayed busy; keep the queue for the next run
+                return
+            entry = admission.pop(schema_name)
+            if entry is None:
+                admission.release_slot(schema_name, token)
+                return
+            pool.submit(place, entry, token)
+            admission.refresh_drainer(schema_name)
+
+
+@app.task(ignore_result=True)
+def snapshot_analytics(full=False):
+    """Refresh every tenant's Parquet snapshot (full nightly, incremental otherwise)"""
+    for schema_name in Tenant.objects.filter(is_active=True).values_list('schema_name', flat=True):
+        try:
+            with tenant_schema(schema_name):
+                analytics.snapshot(schema_name, full=full)
+        except Exception:
+            logger.exception("Failed to snapshot analytics data for %s", schema_name)
+
+
+@app.task(ignore_result=True)
+def compute_customer_cohorts():
+    """Recompute every tenant's cohort, repeat-purchase and lifetime-value snapshot"""
+    for schema_name in Tenant.objects.filter(is_active=True).values_list('schema_name', flat=True):
+        try:
+            with tenant_schema(schema_name):
+                cohorts.run(schema_name)
+        except Exception:
+            logger.exception("Failed to compute customer cohorts for %s", schema_name)
+
+
+@app.task(ignore_result=True)
+def relay_outbox(sweep=False):
+    """Publish pending outbox events of flagged tenants, or of all tenants on a sweep"""
+    if sweep:
+        schemas = list(Tenant.objects.filter(is_active=True).values_list('schema_name', flat=True))
+    else:
+        schemas = get_redis().spop(outbox.DIRTY_SCHEMAS_KEY, 1000) or []
+
+    for schema_name in schemas:
+        try:
+            with tenant_schema(schema_name):
+                outbox.relay(schema_name)
+        except Exception:
+            logger.exception("Failed to relay outbox events for %s", schema_name)
+            # Flag it again so the next run retries
+            get_redis().sadd(outbox.DIRTY_SCHEMAS_KEY, schema_name)
+
+
+@app.task(ignore_result=True)
+def prune_outbox():
+    """Delete published outbox events past the retention window"""
+    for schema_name in Tenant.objects.filter(is_active=True).values_list('schema_name', flat=True):
+        try:
+            with tenant_schema(schema_name):
+                outbox.prune()
+        except Exception:
+            logger.exception("Failed to prune outbox events for %s", schema_name)
+
+
+@app.task(ignore_result=True, autoretry_for=(URLError, OSError), retry_backoff=True, max_retries=5)
+def deliver_webhook(url, payload):
+    """POST a batch of events to a tenant's webhook endpoint"""
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode(),
+        headers={'Content-Type': 'application/json'},
+        method='POST',
+    )
+    with urllib.request.urlopen(request, timeout=settings.WEBHOOK_TIMEOUT):
+        pass
+
+
+@app.task(bind=True, ignore_result=True, max_retries=5)
+def provision_tenant(self, job_id):
+    """Provision a tenant schema and its default data for a ProvisioningJob"""
+    try:
+        provisioning.run_job(job_id)
+    except Exception as e:
+        logger.exception("Failed to run provisioning job %s", job_id)
+        final = self.request.retries >= self.max_retries
+        provisioning.record_failure(job_id, e, final)
+        if not final:
+            raise self.retry(exc=e, countdown=2 ** self.request.retries)
+
+
+@app.task(bind=True, ignore_result=True, max_retries=5)
+def provision_schema(self, job_id, schema_name, options):
+    """Schema work of a backend provisioning job, reported back when done"""
+    try:
+        with transaction.atomic():
+            steps = provisioning.provision_schema(schema_name, options)
+    except Exception as e:
+        logger.exception("Failed to provision schema %s for backend job %s", schema_name, job_id)
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e, countdown=2 ** self.request.retries)
+        provisioning.report_back(job_id, error=str(e))
+        return
+    provisioning.report_back(job_id, steps=steps)
+
+
+@app.task(ignore_result=True)
+def replenish_tenant_pool():
+    """Keep the warm pools of tenant schemas full"""
+    for partitioned in (False, True):
+        try:
+            created = provisioning.replenish(partitioned)
+            if created:
+                logger.info("Added %d schemas to the %s tenant pool", created, 'partitioned' if partitioned else 'default')
+        except Exception:
+            logger.exception("Failed to replenish the tenant pool")
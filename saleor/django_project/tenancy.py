@@ -0,0 +1,19 @@
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def tenant_schema(schema_name):
+    """Run a block with the search_path pointed at a tenant schema.
+
+    Background tasks have no request middleware to do this for them, and a
+    worker's connection is reused across tasks, so the path is reset after.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f'SET search_path TO "{schema_name}", public;')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('SET search_path TO public;')
@@ -0,0 +1,56 @@
+from decimal import Decimal
+from itertools import count
+
+from django.db import connection
+from django.test import TestCase
+
+from django_project.models import Order, OrderItem, Product, Tenant
+from django_project.provisioning import create_tenant_tables
+
+_order_numbers = count(1)
+
+
+class TenantTestCase(TestCase):
+    """Runs every test with the search_path on a tenant schema of its own
+
+    The schema is created inside the class's transaction, so it is rolled
+    back with the rest of the test data.
+    """
+    schema_name = 'test_tenant'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name=cls.schema_name, schema_name=cls.schema_name)
+        with connection.cursor() as cursor:
+            cursor.execute(f'CREATE SCHEMA "{cls.schema_name}";')
+            cursor.execute(f'SET search_path TO "{cls.schema_name}", public;')
+            create_tenant_tables(cursor)
+            cursor.execute('SET search_path TO public;')
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SET search_path TO "{self.schema_name}", public;')
+
+    def tearDown(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET search_path TO public;')
+
+    def create_product(self, name='Widget', price='10.00', stock=100):
+        return Product.objects.create(name=name, description='', price=Decimal(price), stock=stock)
+
+    def create_order(self, items, status='pending', created_at=None):
+        """Order of (product, quantity) pairs, optionally backdated to ``created_at``"""
+        total = sum((product.price * quantity for product, quantity in items), Decimal('0.00'))
+        order = Order.objects.create(
+            order_number=f'ORD-{next(_order_numbers):06d}',
+            customer_email='customer@example.com',
+            customer_name='Customer',
+            total_amount=total,
+            status=status,
+        )
+        for product, quantity in items:
+            OrderItem.objects.create(order=order, product=product, quantity=quantity, price=product.price)
+        if created_at is not None:
+            Order.objects.filter(pk=order.pk).update(created_at=created_at)
+            order.refresh_from_db()
+        return order
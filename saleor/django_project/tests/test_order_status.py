@@ -0,0 +1,157 @@
+import json
+import uuid
+
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+
+from django_project.models import Order, OutboxEvent
+
+from .base import TenantTestCase
+
+
+class StatusTransitionTests(SimpleTestCase):
+    def test_lifecycle_moves(self):
+        self.assertTrue(Order.can_transition('pending', 'processing'))
+        self.assertTrue(Order.can_transition('pending', 'cancelled'))
+        self.assertTrue(Order.can_transition('processing', 'shipped'))
+        self.assertTrue(Order.can_transition('shipped', 'delivered'))
+
+    def test_no_way_back(self):
+        self.assertFalse(Order.can_transition('shipped', 'pending'))
+        self.assertFalse(Order.can_transition('shipped', 'cancelled'))
+        self.assertFalse(Order.can_transition('processing', 'pending'))
+
+    def test_final_statuses(self):
+        for status in ('delivered', 'cancelled'):
+            self.assertEqual(Order.STATUS_TRANSITIONS[status], ())
+            for target in Order.STATUS_TRANSITIONS:
+                self.assertFalse(Order.can_transition(status, target))
+
+    def test_unknown_statuses(self):
+        self.assertFalse(Order.can_transition('lost', 'pending'))
+        self.assertFalse(Order.can_transition('pending', 'lost'))
+
+    def test_transitions_cover_every_status(self):
+        statuses = {value for value, _ in Order.STATUS_CHOICES}
+        self.assertEqual(set(Order.STATUS_TRANSITIONS), statuses)
+        for targets in Order.STATUS_TRANSITIONS.values():
+            self.assertLessEqual(set(targets), statuses)
+
+
+class BulkUpdateOrderStatusTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = self.create_product()
+
+    def post(self, data):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                '/api/orders/status/bulk/', data=json.dumps(data),
+                content_type='application/json', HTTP_X_TENANT_ID=self.schema_name,
+            )
+        self.updates = [query['sql'] for query in queries.captured_queries
+                        if query['sql'].startswith('UPDATE "orders"')]
+        return response
+
+    def status_of(self, order):
+        order.refresh_from_db()
+        return order.status
+
+    def status_events(self):
+        return [event.payload for event in OutboxEvent.objects.filter(event_type='order.status_changed').order_by('id')]
+
+    def test_invalid_status(self):
+        order = self.create_order([(self.product, 1)])
+
+        response = self.post({'order_ids': [str(order.id)], 'status': 'lost'})
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertFalse(body['success'])
+        self.assertEqual(body['updated'], 0)
+        self.assertEqual(body['results'][str(order.id)], {'success': False, 'error': "Invalid status 'lost'"})
+        self.assertEqual(self.status_of(order), 'pending')
+        self.assertEqual(self.updates, [])
+
+    def test_unknown_and_malformed_ids(self):
+        unknown = str(uuid.uuid4())
+
+        response = self.post({'order_ids': [unknown, 'not-a-uuid'], 'status': 'processing'})
+
+        results = response.json()['results']
+        self.assertEqual(results[unknown], {'success': False, 'error': 'Order not found'})
+        self.assertEqual(results['not-a-uuid'], {'success': False, 'error': 'Order not found'})
+        self.assertEqual(self.updates, [])
+        self.assertEqual(self.status_events(), [])
+
+    def test_same_status_is_a_no_op(self):
+        order = self.create_order([(self.product, 1)], status='processing')
+
+        response = self.post({'order_ids': [str(order.id)], 'status': 'processing'})
+
+        body = response.json()
+        self.assertTrue(body['success'])
+        self.assertEqual(body['updated'], 0)
+        self.assertEqual(body['results'][str(order.id)], {'success': True, 'status': 'processing', 'changed': False})
+        self.assertEqual(self.updates, [])
+        self.assertEqual(self.status_events(), [])
+
+    def test_forbidden_transition(self):
+        order = self.create_order([(self.product, 1)], status='delivered')
+
+        response = self.post({'order_ids': [str(order.id)], 'status': 'pending'})
+
+        result = response.json()['results'][str(order.id)]
+        self.assertFalse(result['success'])
+        self.assertEqual(result['status'], 'delivered')
+        self.assertEqual(result['error'], "Cannot change status from 'delivered' to 'pending'")
+        self.assertEqual(self.status_of(order), 'delivered')
+        self.assertEqual(self.updates, [])
+
+    def test_mixed_targets(self):
+        first = self.create_order([(self.product, 1)])
+        second = self.create_order([(self.product, 2)])
+        cancelled = self.create_order([(self.product, 3)])
+        delivered = self.create_order([(self.product, 1)], status='shipped')
+        refused = self.create_order([(self.product, 1)], status='cancelled')
+
+        response = self.post({'updates': [
+            {'id': str(first.id), 'status': 'processing'},
+            {'id': str(second.id), 'status': 'processing'},
+            {'id': str(cancelled.id), 'status': 'cancelled'},
+            {'id': str(delivered.id), 'status': 'delivered'},
+            {'id': str(refused.id), 'status': 'processing'},
+        ]})
+
+        body = response.json()
+        self.assertFalse(body['success'])
+        self.assertEqual(body['updated'], 4)
+        self.assertFalse(body['results'][str(refused.id)]['success'])
+
+        # One UPDATE per target status, not per order
+        self.assertEqual(len(self.updates), 3)
+        self.assertEqual(self.status_of(first), 'processing')
+        self.assertEqual(self.status_of(second), 'processing')
+        self.assertEqual(self.status_of(cancelled), 'cancelled')
+        self.assertEqual(self.status_of(delivered), 'delivered')
+        self.assertEqual(self.status_of(refused), 'cancelled')
+
+        events = self.status_events()
+        self.assertCountEqual(
+            [(event['order_id'], event['from'], event['to']) for event in events],
+            [
+                (str(first.id), 'pending', 'processing'),
+                (str(second.id), 'pending', 'processing'),
+                (str(cancelled.id), 'pending', 'cancelled'),
+                (str(delivered.id), 'shipped', 'delivered'),
+            ],
+        )
+        event = next(event for event in events if event['order_id'] == str(cancelled.id))
+        self.assertEqual(event['total_amount'], str(cancelled.total_amount))
+        self.assertEqual(event['created_at'], cancelled.created_at.isoformat())
+
+    def test_no_orders(self):
+        response = self.post({'order_ids': [], 'status': 'processing'})
+
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,70 @@
+import base64
+import uuid
+from datetime import datetime, timedelta
+
+from django.test import SimpleTestCase
+
+from django_project.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+from .base import TenantTestCase
+
+
+class CursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        created_at = datetime(2026, 3, 2, 12, 30, 45, 123456)
+        pk = uuid.uuid4()
+
+        cursor = encode_cursor(created_at, pk)
+
+        self.assertEqual(decode_cursor(cursor), (created_at, pk))
+        # Safe to put in a query string as is
+        self.assertRegex(cursor, r'^[A-Za-z0-9_-]+$')
+
+    def test_invalid_cursors(self):
+        def encode(raw):
+            return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+        for cursor in [
+            'not a cursor',
+            encode('not json'),
+            encode('["2026-03-02T12:00:00"]'),
+            encode('["2026-03-02T12:00:00", "not-a-uuid"]'),
+            encode(f'["yesterday", "{uuid.uuid4()}"]'),
+            encode(f'[null, "{uuid.uuid4()}"]'),
+        ]:
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                decode_cursor(cursor)
+
+
+class OrderListingPaginationTests(TenantTestCase):
+    def get(self, **params):
+        return self.client.get('/api/orders/', params, HTTP_X_TENANT_ID=self.schema_name)
+
+    def test_pages_walk_every_order_once(self):
+        product = self.create_product()
+        now = datetime.now().replace(microsecond=0)
+        # Two orders share a timestamp, so the id breaks the tie
+        orders = [self.create_order([(product, 1)], created_at=now - timedelta(minutes=minutes))
+                  for minutes in (0, 1, 1, 2, 3)]
+
+        seen = []
+        cursor = None
+        while True:
+            params = {'limit': 2, 'include_items': 'false'}
+            if cursor:
+                params['cursor'] = cursor
+            body = self.get(**params).json()
+            seen.extend(order['id'] for order in body['orders'])
+            cursor = body['pagination']['next_cursor']
+            self.assertEqual(body['pagination']['has_more'], cursor is not None)
+            if cursor is None:
+                break
+
+        expected = sorted(orders, key=lambda order: (order.created_at, order.id), reverse=True)
+        self.assertEqual(seen, [str(order.id) for order in expected])
+
+    def test_invalid_cursor_is_a_bad_request(self):
+        response = self.get(cursor='not a cursor')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Invalid cursor'})
@@ -0,0 +1,162 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.db import connection
+
+from django_project import outbox, rollups
+from django_project.api import transition_record
+from django_project.models import OutboxEvent
+
+from .base import TenantTestCase
+
+DAY = date(2026, 3, 2)
+NEXT_DAY = date(2026, 3, 3)
+
+
+def at_noon(day):
+    return datetime.combine(day, datetime.min.time()).replace(hour=12)
+
+
+class RollupsTestCase(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.widget = self.create_product('Widget', price='10.00')
+        self.gadget = self.create_product('Gadget', price='5.00')
+
+    def record_created(self, order):
+        outbox.record(self.schema_name, 'order', order.id, 'order.created',
+                      outbox.order_payload(order, order.items.all()))
+
+    def record_status_change(self, order, new_status):
+        old_status = order.status
+        order.status = new_status
+        order.save(update_fields=['status', 'updated_at'])
+        outbox.record(self.schema_name, 'order', order.id, 'order.status_changed',
+                      transition_record(order, old_status, new_status))
+
+    def relay(self):
+        """Apply the pending outbox events as one batch, as the relay reads them"""
+        events = list(
+            OutboxEvent.objects.filter(published_at__isnull=True).order_by('id')
+            .values('id', 'aggregate_type', 'aggregate_id', 'event_type', 'payload', 'created_at')
+        )
+        rollups.apply_events(events)
+        OutboxEvent.objects.filter(id__in=[event['id'] for event in events]).update(published_at=datetime.now())
+
+    def order_stats(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT day, status, orders, revenue FROM daily_order_stats WHERE orders <> 0')
+            return {(day, status): (orders, revenue) for day, status, orders, revenue in cursor.fetchall()}
+
+    def product_sales(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT day, product_id, status, units FROM daily_product_sales WHERE units <> 0')
+            return {(day, product_id, status): units for day, product_id, status, units in cursor.fetchall()}
+
+
+class ApplyEventsTests(RollupsTestCase):
+    def test_created_and_status_changes_in_one_batch(self):
+        shipped = self.create_order([(self.widget, 2), (self.gadget, 1)], created_at=at_noon(DAY))
+        pending = self.create_order([(self.widget, 1)], created_at=at_noon(DAY))
+        self.record_created(shipped)
+        self.record_created(pending)
+        self.record_status_change(shipped, 'shipped')
+
+        self.relay()
+
+        self.assertEqual(self.order_stats(), {
+            (DAY, 'pending'): (1, Decimal('10.00')),
+            (DAY, 'shipped'): (1, Decimal('25.00')),
+        })
+        self.assertEqual(self.product_sales(), {
+            (DAY, self.widget.id, 'pending'): 1,
+            (DAY, self.widget.id, 'shipped'): 2,
+            (DAY, self.gadget.id, 'shipped'): 1,
+        })
+        total_orders, total_revenue, by_status = rollups.totals()
+        self.assertEqual(total_orders, 2)
+        self.assertEqual(total_revenue, Decimal('25.00'))
+        self.assertCountEqual(by_status, [
+            {'status': 'pending', 'count': 1},
+            {'status': 'shipped', 'count': 1},
+        ])
+
+    def test_status_changes_move_counts_of_earlier_batches(self):
+        order = self.create_order([(self.widget, 3)], created_at=at_noon(DAY))
+        self.record_created(order)
+        self.relay()
+        self.record_status_change(order, 'shipped')
+        self.record_status_change(order, 'delivered')
+        self.relay()
+
+        # The moved-from rows stay behind at zero
+        self.assertEqual(self.order_stats(), {(DAY, 'delivered'): (1, Decimal('30.00'))})
+        self.assertEqual(self.product_sales(), {(DAY, self.widget.id, 'delivered'): 3})
+        self.assertEqual(rollups.top_products(), [(self.widget.id, 3)])
+
+    def test_counts_on_the_day_the_order_was_created(self):
+        order = self.create_order([(self.gadget, 1)], created_at=at_noon(DAY))
+        self.record_created(order)
+        self.relay()
+        # The move is counted against the creation day, not the day it happens
+        self.record_status_change(order, 'cancelled')
+        self.relay()
+
+        self.assertEqual(self.order_stats(), {(DAY, 'cancelled'): (1, Decimal('5.00'))})
+
+    def test_ignores_other_events(self):
+        outbox.record(self.schema_name, 'product', self.widget.id, 'product.updated',
+                      outbox.product_payload(self.widget))
+        self.relay()
+
+        self.assertEqual(self.order_stats(), {})
+        self.assertEqual(self.product_sales(), {})
+
+
+class RebuildTests(RollupsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_order([(self.widget, 2)], status='delivered', created_at=at_noon(DAY))
+        self.create_order([(self.gadget, 4)], status='pending', created_at=at_noon(DAY))
+        self.create_order([(self.widget, 1), (self.gadget, 1)], status='shipped', created_at=at_noon(NEXT_DAY))
+
+    def rebuild(self, since=None):
+        with connection.cursor() as cursor:
+            return rollups.rebuild(cursor, since)
+
+    def test_rebuild_recomputes_from_orders(self):
+        # Drifted rows from before the rebuild are replaced
+        rollups.apply({(DAY, 'delivered'): [7, Decimal('99.00')]}, {(DAY, self.widget.id, 'delivered'): 7})
+
+        written = self.rebuild()
+
+        self.assertEqual(written, 3)
+        self.assertEqual(self.order_stats(), {
+            (DAY, 'delivered'): (1, Decimal('20.00')),
+            (DAY, 'pending'): (1, Decimal('20.00')),
+            (NEXT_DAY, 'shipped'): (1, Decimal('15.00')),
+        })
+        self.assertEqual(self.product_sales(), {
+            (DAY, self.widget.id, 'delivered'): 2,
+            (DAY, self.gadget.id, 'pending'): 4,
+            (NEXT_DAY, self.widget.id, 'shipped'): 1,
+            (NEXT_DAY, self.gadget.id, 'shipped'): 1,
+        })
+
+    def test_rebuild_since_keeps_earlier_days(self):
+        # Stands in for the counts of orders that were archived
+        rollups.apply({(DAY, 'delivered'): [5, Decimal('50.00')]}, {(DAY, self.widget.id, 'delivered'): 5})
+        rollups.apply({(NEXT_DAY, 'shipped'): [9, Decimal('90.00')]}, {})
+
+        written = self.rebuild(since=NEXT_DAY)
+
+        self.assertEqual(written, 1)
+        self.assertEqual(self.order_stats(), {
+            (DAY, 'delivered'): (5, Decimal('50.00')),
+            (NEXT_DAY, 'shipped'): (1, Decimal('15.00')),
+        })
+        self.assertEqual(self.product_sales(), {
+            (DAY, self.widget.id, 'delivered'): 5,
+            (NEXT_DAY, self.widget.id, 'shipped'): 1,
+            (NEXT_DAY, self.gadget.id, 'shipped'): 1,
+        })
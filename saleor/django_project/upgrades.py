@@ -0,0 +1,35 @@
+"""
+Bringing existing tables up to date.
+
+saleor has no migrations. ``migrate --run-syncdb`` creates missing public
+tables but never alters existing ones. Tenant tables are only created when
+a schema is provisioned. Columns and tables added after that reach
+existing databases through ``manage.py upgrade_schemas``, which runs
+``upgrade_public`` once and ``upgrade_tenant`` in every tenant schema.
+Run it on every deploy, before the new code serves traffic. Every
+statement is idempotent.
+"""
+
+from .inventory import create_stock_shard_table
+from .order_numbers import create_sequence
+from .outbox import create_outbox_table
+from .rollups import create_rollup_tables
+
+
+def upgrade_public(cursor):
+    """Columns added to the shared public tables"""
+    cursor.execute('''
+        ALTER TABLE IF EXISTS tenant_storefronts
+            ADD COLUMN IF NOT EXISTS order_number_prefix VARCHAR(8) NOT NULL DEFAULT 'ORD-',
+            ADD COLUMN IF NOT EXISTS order_confirmation_email BOOLEAN NOT NULL DEFAULT TRUE,
+            ADD COLUMN IF NOT EXISTS webhook_url VARCHAR(200) NOT NULL DEFAULT '';
+    ''')
+
+
+def upgrade_tenant(cursor):
+    """Tables and columns added to tenant schemas; run with the search_path on the schema"""
+    cursor.execute('ALTER TABLE products ADD COLUMN IF NOT EXISTS stock_shards INTEGER DEFAULT 0;')
+    create_stock_shard_table(cursor)
+    create_sequence(cursor)
+    create_outbox_table(cursor)
+    create_rollup_tables(cursor)
@@ -3,10 +3,10 @@ from django.urls import path
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from django.db import connection
 from . import api
 from . import api_management
 from . import storefront_api
+from . import provisioning
 
 def health_check(request):
     response = JsonResponse({"status": "healthy", "service": "multi-tenant-demo"})
@@ -58,22 +58,15 @@ def create_tenant(request):
             return JsonResponse({"error": "Tenant name is required"}, status=400)
         
         try:
-            with connection.cursor() as cursor:
-                # Create schema for the tenant
-                cursor.execute(f'CREATE SCHEMA IF NOT EXISTS "{tenant_name}";')
-                
-                # Set search path to the new schema
-                cursor.execute(f'SET search_path TO "{tenant_name}", public;')
-                
-                # Run Django migrations for the tenant
-                from django.core.management import execute_from_command_line
-                execute_from_command_line(['manage.py', 'migrate', '--run-syncdb'])
+            # Provisioned in the background from the tenant template
+            job = provisioning.submit(tenant_name)
                 
             response = JsonResponse({
                 "success": True,
                 "tenant": tenant_name,
-                "message": f"Tenant '{tenant_name}' created successfully with isolated database schema"
-            })
+                "job": provisioning.serialize_job(job),
+                "message": f"Tenant '{tenant_name}' is being created with an isolated database schema"
+            }, status=202)
             response["Access-Control-Allow-Origin"] = "*"
             return response
             
@@ -99,55 +92,15 @@ def initialize_tenant_data(request):
             return JsonResponse({"error": "Tenant name is required"}, status=400)
         
         try:
-            with connection.cursor() as cursor:
-                # Create schema if it doesn't exist
-                cursor.execute(f'CREATE SCHEMA IF NOT EXISTS "{tenant_name}";')
-                
-                # Set search path to the tenant schema
-                cursor.execute(f'SET search_path TO "{tenant_name}", public;')
-                
-                # Run migrations for this tenant
-                from django.core.management import execute_from_command_line
-                execute_from_command_line(['manage.py', 'migrate', '--run-syncdb'])
-                
-                # Add sample products for this tenant
-                from .models import Product
-                from decimal import Decimal
-                
-                # Check if products already exist
-                if Product.objects.count() == 0:
-                    sample_products = [
-                        {
-                            'name': f'{tenant_name.title()} Laptop',
-                            'description': f'High-performance laptop for {tenant_name} customers',
-                            'price': Decimal('1299.99'),
-                            'stock': 10,
-                            'image_url': 'https://via.placeholder.com/300x200?text=Laptop'
-                        },
-                        {
-                            'name': f'{tenant_name.title()} Headphones',
-                            'description': f'Premium headphones for {tenant_name} customers',
-                            'price': Decimal('299.99'),
-                            'stock': 25,
-                            'image_url': 'https://via.placeholder.com/300x200?text=Headphones'
-                        },
-                        {
-                            'name': f'{tenant_name.title()} Smartphone',
-                            'description': f'Latest smartphone for {tenant_name} customers',
-                            'price': Decimal('899.99'),
-                            'stock': 15,
-                            'image_url': 'https://via.placeholder.com/300x200?text=Smartphone'
-                        }
-                    ]
-                    
-                    for product_data in sample_products:
-                        Product.objects.create(**product_data)
+            # Schema (if missing) and sample products are created in the background
+            job = provisioning.submit(tenant_name, sample_data=True)
                 
             response = JsonResponse({
                 "success": True,
                 "tenant": tenant_name,
-                "message": f"Tenant '{tenant_name}' initialized with sample data"
-            })
+                "job": provisioning.serialize_job(job),
+                "message": f"Tenant '{tenant_name}' is being initialized with sample data"
+            }, status=202)
             response["Access-Control-Allow-Origin"] = "*"
             return response
             
@@ -173,6 +126,7 @@ urlpatterns = [
     # API Management endpoints
     path('api/management/tenants/', api_management.list_tenants),
     path('api/management/tenants/create/', api_management.create_tenant),
+    path('api/management/tenants/jobs/<uuid:job_id>/', api_management.get_provisioning_job),
     path('api/management/tenants/<str:tenant_name>/keys/', api_management.list_api_keys),
     path('api/management/keys/generate/', api_management.generate_api_key),
     path('api/management/keys/<uuid:key_id>/revoke/', api_management.revoke_api_key),
@@ -182,16 +136,23 @@ urlpatterns = [
     path('api/storefront/config/update/', storefront_api.update_storefront_config),
     path('api/storefront/products/', storefront_api.get_products_for_storefront),
     path('api/storefront/orders/create/', storefront_api.create_order_for_storefront),
+    path('api/storefront/orders/queue/<str:ticket>/', storefront_api.get_queued_order),
     
     # API endpoints
     path('api/products/', api.get_products),
     path('api/products/create/', api.create_product),
     path('api/products/<str:product_id>/', api.update_product),
     path('api/products/<str:product_id>/delete/', api.delete_product),
+    path('api/products/<str:product_id>/stock/shards/', api.set_product_stock_shards),
     path('api/orders/', api.get_orders),
     path('api/orders/create/', api.create_order),
+    path('api/orders/status/bulk/', api.bulk_update_order_status),
+    path('api/orders/<str:order_id>/', api.get_order),
     path('api/orders/<str:order_id>/status/', api.update_order_status),
     path('api/statistics/', api.get_statistics),
+    path('api/statistics/uniques/', api.get_unique_counts),
+    path('api/reports/<str:report_name>/', api.get_report),
+    path('api/customers/cohorts/', api.get_customer_cohorts),
     
     path('', tenant_info),
 ] 
\ No newline at end of file
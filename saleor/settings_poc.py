@@ -61,6 +61,7 @@ CORS_ALLOWED_HEADERS = [
     'x-requested-with',
     'x-tenant-id',
     'x-api-key',
+    'idempotency-key',
 ]
 
 ROOT_URLCONF = 'django_project.urls'
@@ -99,4 +100,161 @@ DATABASES = {
 STATIC_URL = '/static/'
 
 # Default primary key field type
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField' 
\ No newline at end of file
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField' 
+# Order numbers are allocated from a per-tenant sequence; a block size > 1
+# lets each worker reserve that many numbers per round trip
+ORDER_NUMBER_BLOCK_SIZE = int(os.environ.get('ORDER_NUMBER_BLOCK_SIZE', '1'))
+
+# Redis settings
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://redis:6379/0')
+
+# Celery settings
+CELERY_BROKER_URL = REDIS_URL
+CELERY_RESULT_BACKEND = REDIS_URL
+CELERY_ACCEPT_CONTENT = ['json']
+CELERY_TASK_SERIALIZER = 'json'
+CELERY_RESULT_SERIALIZER = 'json'
+
+# Tenant provisioning runs on its own queue (run the worker with
+# -Q celery,provisioning); the backend sends its signup jobs there too
+PROVISIONING_QUEUE = 'provisioning'
+# The backend worker's queue, for reporting its jobs' results back
+BACKEND_TASK_QUEUE = 'backend'
+# Unfinished jobs without progress for this long may be resubmitted
+PROVISIONING_STALE_SECONDS = 15 * 60
+CELERY_TASK_ROUTES = {
+    'django_project.tasks.provision_tenant': {'queue': PROVISIONING_QUEUE},
+    'django_project.tasks.provision_schema': {'queue': PROVISIONING_QUEUE},
+    'django_project.tasks.replenish_tenant_pool': {'queue': PROVISIONING_QUEUE},
+}
+
+CELERY_BEAT_SCHEDULE = {
+    # Safety net for the post-checkout pipeline; emits also trigger a drain
+    'process-order-events': {
+        'task': 'django_project.tasks.process_order_events',
+        'schedule': 5.0,
+    },
+    'rebalance-stock-shards': {
+        'task': 'django_project.tasks.rebalance_stock_shards',
+        'schedule': 60.0,
+    },
+    'ensure-order-partitions': {
+        'task': 'django_project.tasks.ensure_order_partitions',
+        'schedule': 24 * 60 * 60,
+    },
+    'archive-old-orders': {
+        'task': 'django_project.tasks.archive_old_orders',
+        'schedule': 24 * 60 * 60,
+    },
+    'snapshot-analytics': {
+        'task': 'django_project.tasks.snapshot_analytics',
+        'schedule': 60 * 60,
+    },
+    'snapshot-analytics-full': {
+        'task': 'django_project.tasks.snapshot_analytics',
+        'schedule': 24 * 60 * 60,
+        'kwargs': {'full': True},
+    },
+    'compute-customer-cohorts': {
+        'task': 'django_project.tasks.compute_customer_cohorts',
+        'schedule': 24 * 60 * 60,
+    },
+    # Enqueues kick the drainer; this picks up queues whose kick was lost
+    'process-checkout-queue': {
+        'task': 'django_project.tasks.process_checkout_queue',
+        'schedule': 5.0,
+    },
+    # Writes kick the relay; the sweep catches events whose flag was lost
+    'relay-outbox': {
+        'task': 'django_project.tasks.relay_outbox',
+        'schedule': 5.0,
+    },
+    'relay-outbox-sweep': {
+        'task': 'django_project.tasks.relay_outbox',
+        'schedule': 5 * 60,
+        'kwargs': {'sweep': True},
+    },
+    'prune-outbox': {
+        'task': 'django_project.tasks.prune_outbox',
+        'schedule': 60 * 60,
+    },
+    'replenish-tenant-pool': {
+        'task': 'django_project.tasks.replenish_tenant_pool',
+        'schedule': 60.0,
+    },
+}
+
+# Email settings
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'orders@katkat.local')
+
+# Post-checkout pipeline
+ORDER_EVENTS_BATCH_SIZE = 500
+ORDER_EVENTS_MAX_ATTEMPTS = 8  # failed batches are retried, then dead-lettered
+ORDER_EVENTS_RETRY_DELAY = 30  # seconds before the first retry, doubled for each one after
+ORDER_EVENTS_RETRY_MAX_DELAY = 30 * 60
+ORDER_CONFIRMATION_SENT_TTL = 7 * 24 * 60 * 60  # how long a sent confirmation is remembered
+ORDER_EVENTS_DRAINER_TTL = 5 * 60  # a drainer silent this long is presumed dead
+WEBHOOK_TIMEOUT = 5
+
+# Inventory
+LOW_STOCK_THRESHOLD = int(os.environ.get('LOW_STOCK_THRESHOLD', '5'))
+LOW_STOCK_ALERT_INTERVAL = 6 * 60 * 60  # seconds between alerts for the same product
+# Sharded stock: shards are evened out once the emptiest holds less than
+# this fraction of the mean
+STOCK_SHARD_REBALANCE_THRESHOLD = 0.5
+
+# Idempotency-Key handling for order creation
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60  # how long a completed response is replayed
+IDEMPOTENCY_LOCK_TTL = 60  # how long an in-flight request holds its key
+
+# New tenant schemas are cloned from this template (and <name>_partitioned)
+TENANT_TEMPLATE_SCHEMA = 'tenant_template'
+
+# Warm pool of unassigned clones that new tenants claim by renaming, kept
+# topped up by tasks.replenish_tenant_pool (sizes per kind of template)
+TENANT_POOL_PREFIX = 'tenant_pool_'
+TENANT_POOL_SIZE = int(os.environ.get('TENANT_POOL_SIZE', '10'))
+TENANT_POOL_PARTITIONED_SIZE = int(os.environ.get('TENANT_POOL_PARTITIONED_SIZE', '2'))
+
+# Partitioned tenants keep this many future monthly partitions ready
+ORDER_PARTITION_MONTHS_AHEAD = 3
+
+# Cold archive of old orders (Parquet files, requires pyarrow)
+ARCHIVE_ROOT = os.environ.get('ARCHIVE_ROOT', str(BASE_DIR / 'archive'))
+ORDER_ARCHIVE_RETENTION_DAYS = int(os.environ.get('ORDER_ARCHIVE_RETENTION_DAYS', '365'))
+ORDER_ARCHIVE_BATCH_SIZE = 5000
+
+# Transactional outbox of product and order changes
+OUTBOX_SINK = os.environ.get('OUTBOX_SINK', 'redis')  # 'redis' streams or 'file' (JSON lines)
+OUTBOX_FILE_ROOT = os.environ.get('OUTBOX_FILE_ROOT', str(BASE_DIR / 'outbox'))
+OUTBOX_STREAM_MAXLEN = 100000  # approximate cap per tenant stream
+OUTBOX_BATCH_SIZE = 500
+OUTBOX_RETENTION_HOURS = int(os.environ.get('OUTBOX_RETENTION_HOURS', '72'))
+
+# Checkout admission control: concurrent checkouts per tenant before new
+# ones are queued in Redis and placed by the Celery drainer
+CHECKOUT_MAX_CONCURRENCY = int(os.environ.get('CHECKOUT_MAX_CONCURRENCY', '20'))
+CHECKOUT_SLOT_TTL = 30  # seconds before a slot that was never released expires
+CHECKOUT_QUEUE_MAX = int(os.environ.get('CHECKOUT_QUEUE_MAX', '10000'))
+CHECKOUT_TICKET_TTL = 60 * 60  # how long queued checkout results can be polled
+CHECKOUT_RETRY_AFTER = 1
+CHECKOUT_DRAINER_TTL = 60
+
+# Tenant statistics are cached and refreshed in the background once older
+# than FRESH (stale-while-revalidate)
+STATISTICS_CACHE_FRESH_SECONDS = 15
+STATISTICS_CACHE_STALE_SECONDS = 10 * 60
+
+# Daily HyperLogLog sketches of unique customers and storefront visitors
+UNIQUES_RETENTION_DAYS = 400
+
+# Parquet snapshots for analytics reports (requires pyarrow, and duckdb to query)
+ANALYTICS_ROOT = os.environ.get('ANALYTICS_ROOT', str(BASE_DIR / 'analytics'))
+ANALYTICS_BATCH_SIZE = 50000  # rows per Parquet row group written
+ANALYTICS_WATERMARK_OVERLAP = 5 * 60  # seconds re-read on each incremental run
+ANALYTICS_DUCKDB_THREADS = int(os.environ.get('ANALYTICS_DUCKDB_THREADS', '2'))
+
+# Nightly customer cohorts (requires pandas and numpy)
+COHORT_MAX_MONTHS = 24  # months of retention tracked per cohort
+COHORT_SNAPSHOTS_KEPT = 30